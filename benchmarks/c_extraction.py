@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares the symbol extraction modes of
+`hotdoc.extensions.c.c_extension.ClangScanner` on a synthetic header set,
+run with:
+
+    python3 -m benchmarks.c_extraction --headers 500 --functions 200
+
+Translation units are parsed once up front, only extraction is timed.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from hotdoc.core.database import Database
+from hotdoc.extensions.c.c_extension import (ClangScanner, CLANG_VERSION,
+                                             EXTRACTION_MODES)
+from hotdoc.extensions.c.tu_cache import TranslationUnitCache
+
+from benchmarks.clang_scan import make_project
+
+
+def run_extraction(filenames, mode, cache_dir):
+    """Returns the scan time and the names of the symbols found, with
+    translation units loaded from the warm cache in @cache_dir."""
+    private_folder = tempfile.mkdtemp(prefix='hotdoc-bench-extraction-')
+    try:
+        database = Database(private_folder)
+        tu_cache = TranslationUnitCache(cache_dir, 1024 ** 3, CLANG_VERSION)
+        scanner = ClangScanner(None, None, database, tu_cache=tu_cache,
+                               extraction=mode)
+        start = time.perf_counter()
+        scanner.scan(filenames, [], False, True, ['*.h'])
+        scan_time = time.perf_counter() - start
+        database.close()
+        return scan_time, set(scanner.symbols)
+    finally:
+        shutil.rmtree(private_folder, ignore_errors=True)
+
+
+def main():
+    """Banana banana"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--headers', type=int, default=500)
+    parser.add_argument('--functions', type=int, default=200)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='hotdoc-bench-headers-')
+    cache_dir = tempfile.mkdtemp(prefix='hotdoc-bench-tu-cache-')
+    try:
+        filenames = make_project(folder, args.headers, args.functions)
+
+        # Warm up the translation unit cache
+        run_extraction(filenames, EXTRACTION_MODES[0], cache_dir)
+
+        print('%-10s %12s %10s %10s' % ('mode', 'scan (s)', 'speedup',
+                                        'symbols'))
+        results = {mode: run_extraction(filenames, mode, cache_dir)
+                   for mode in EXTRACTION_MODES}
+        reference_time, reference_symbols = results['tokens']
+        for mode in EXTRACTION_MODES:
+            scan_time, symbols = results[mode]
+            print('%-10s %12.2f %10.2f %10d' % (
+                mode, scan_time, reference_time / scan_time, len(symbols)))
+
+        missing = reference_symbols - results['visitor'][1]
+        extra = results['visitor'][1] - reference_symbols
+        if missing or extra:
+            print('Symbol sets differ, missing: %s, extra: %s' % (
+                sorted(missing), sorted(extra)))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Times `hotdoc.extensions.c.c_extension.ClangScanner.scan` on a synthetic
+multi-header project with various numbers of parsing threads, without
+translation unit cache, with a cold one and with a warm one, run with:
+
+    python3 -m benchmarks.clang_scan --headers 200 --jobs 1 2 4 8
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from hotdoc.core.database import Database
+from hotdoc.extensions.c.c_extension import ClangScanner, CLANG_VERSION
+from hotdoc.extensions.c.tu_cache import TranslationUnitCache
+
+COMMON_HEADER = '''#ifndef BENCH_COMMON_H
+#define BENCH_COMMON_H
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <stdint.h>
+
+typedef struct _BenchObject BenchObject;
+
+/* Declares types and functions the way G_DECLARE_FINAL_TYPE does */
+#define BENCH_DECLARE_TYPE(TypeName, type_name) \\
+  typedef struct _##TypeName TypeName; \\
+  typedef struct { BenchObject *parent; } TypeName##Class; \\
+  static inline TypeName * type_name##_cast (void *ptr) \\
+  { return (TypeName *) ptr; }
+#endif
+'''
+
+
+def header_text(index, n_functions):
+    """A guarded header declaring @n_functions functions, a struct, an
+    enum and a macro-declared type, including its predecessor every tenth
+    header."""
+    lines = ['#ifndef BENCH_HEADER_%d_H' % index,
+             '#define BENCH_HEADER_%d_H' % index,
+             '#include "common.h"']
+    if index % 10 == 9:
+        lines.append('#include "header-%d.h"' % (index - 1))
+    lines.append('typedef struct { int a; char *b; } BenchStruct%d;' % index)
+    lines.append('typedef enum { BENCH_ENUM_%d_A, BENCH_ENUM_%d_B } '
+                 'BenchEnum%d;' % (index, index, index))
+    lines.append('BENCH_DECLARE_TYPE (BenchType%d, bench_type_%d)' %
+                 (index, index))
+    for i in range(n_functions):
+        lines.append('int bench_function_%d_%d (BenchObject *object, '
+                     'const char *name, size_t len);' % (index, i))
+    lines.append('#endif')
+    return '\n'.join(lines) + '\n'
+
+
+def make_project(folder, n_headers, n_functions):
+    """Writes the synthetic headers to @folder, returns their paths."""
+    with open(os.path.join(folder, 'common.h'), 'w') as _:
+        _.write(COMMON_HEADER)
+
+    filenames = []
+    for i in range(n_headers):
+        path = os.path.join(folder, 'header-%d.h' % i)
+        with open(path, 'w') as _:
+            _.write(header_text(i, n_functions))
+        filenames.append(path)
+    return filenames
+
+
+def run_scan(filenames, jobs, cache_dir=None):
+    """Returns the scan time and the names of the symbols found."""
+    private_folder = tempfile.mkdtemp(prefix='hotdoc-bench-clang-')
+    try:
+        database = Database(private_folder)
+        tu_cache = None
+        if cache_dir is not None:
+            tu_cache = TranslationUnitCache(cache_dir, 1024 ** 3,
+                                            CLANG_VERSION)
+        scanner = ClangScanner(None, None, database, tu_cache=tu_cache)
+        start = time.perf_counter()
+        scanner.scan(filenames, [], False, True, ['*.h'], jobs=jobs)
+        scan_time = time.perf_counter() - start
+        database.close()
+        return scan_time, set(scanner.symbols)
+    finally:
+        shutil.rmtree(private_folder, ignore_errors=True)
+
+
+def main():
+    """Banana banana"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--headers', type=int, default=200)
+    parser.add_argument('--functions', type=int, default=50)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='hotdoc-bench-headers-')
+    try:
+        filenames = make_project(folder, args.headers, args.functions)
+
+        print('%-6s %12s %10s %12s %12s %10s' % (
+            'jobs', 'scan (s)', 'speedup', 'cold (s)', 'warm (s)',
+            'symbols'))
+        reference = None
+        for jobs in args.jobs:
+            scan_time, symbols = run_scan(filenames, jobs)
+            if reference is None:
+                reference = (scan_time, symbols)
+            assert symbols == reference[1], \
+                'jobs=%d found different symbols' % jobs
+
+            cache_dir = tempfile.mkdtemp(prefix='hotdoc-bench-tu-cache-')
+            try:
+                cold_time, cold_symbols = run_scan(filenames, jobs, cache_dir)
+                warm_time, warm_symbols = run_scan(filenames, jobs, cache_dir)
+            finally:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            assert cold_symbols == warm_symbols == reference[1], \
+                'jobs=%d found different symbols with a cache' % jobs
+
+            print('%-6d %12.2f %10.2f %12.2f %12.2f %10d' % (
+                jobs, scan_time, reference[0] / scan_time, cold_time,
+                warm_time, len(symbols)))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
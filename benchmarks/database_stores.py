@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares the available `hotdoc.core.database.Database` stores on a
+synthetic project, run with:
+
+    python3 -m benchmarks.database_stores --symbols 200000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from hotdoc.core.comment import Comment
+from hotdoc.core.database import Database, DATABASE_STORES
+from hotdoc.core.symbols import FunctionSymbol, ParameterSymbol
+from hotdoc.core.links import Link
+
+
+def populate(database, n_symbols):
+    """Create @n_symbols documented functions, one alias every ten."""
+    for i in range(n_symbols):
+        name = 'test_function_%d' % i
+        aliases = ['TestFunction%d' % i] if i % 10 == 0 else []
+        param = ParameterSymbol(
+            argname='param', type_tokens=[Link(None, 'gint', 'gint')])
+        database.get_or_create_symbol(
+            FunctionSymbol, unique_name=name, display_name=name,
+            filename='src/test-%d.c' % (i // 100), parameters=[param],
+            aliases=aliases)
+        database.add_comment(Comment(name=name, filename='src/test.c',
+                                     description='Function number %d' % i))
+
+
+def count_files(folder):
+    """Number of files under @folder."""
+    return sum(len(files) for _, _, files in os.walk(folder))
+
+
+def run_store(store_name, n_symbols, n_lookups):
+    """Returns a dict of timings for @store_name."""
+    private_folder = tempfile.mkdtemp(prefix='hotdoc-bench-db-')
+    try:
+        database = Database(private_folder, store_name)
+        populate(database, n_symbols)
+
+        start = time.perf_counter()
+        database.persist()
+        database.close()
+        persist_time = time.perf_counter() - start
+
+        names = ['test_function_%d' % random.randrange(n_symbols)
+                 for _ in range(n_lookups)]
+        database = Database(private_folder, store_name)
+        start = time.perf_counter()
+        for name in names:
+            assert database.get_symbol(name) is not None
+            assert database.get_comment(name) is not None
+        hit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(n_lookups):
+            database.get_symbol('missing_function_%d' % i)
+        miss_time = time.perf_counter() - start
+        database.close()
+
+        return {'persist': persist_time, 'hits': hit_time,
+                'misses': miss_time, 'files': count_files(private_folder)}
+    finally:
+        shutil.rmtree(private_folder, ignore_errors=True)
+
+
+def main():
+    """Banana banana"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--symbols', type=int, default=200000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--stores', nargs='+',
+                        default=sorted(DATABASE_STORES.keys()))
+    args = parser.parse_args()
+
+    print('%-10s %12s %12s %12s %10s' % ('store', 'persist (s)', 'hits (s)',
+                                         'misses (s)', 'files'))
+    for store_name in args.stores:
+        res = run_store(store_name, args.symbols, args.lookups)
+        print('%-10s %12.2f %12.2f %12.2f %10d' % (
+            store_name, res['persist'], res['hits'], res['misses'],
+            res['files']))
+
+
+if __name__ == '__main__':
+    main()
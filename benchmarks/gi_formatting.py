@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Times formatting the pages of a synthetic GstBase library documented in
+C, Python and JavaScript with the GI extension, run with:
+
+    python3 -m benchmarks.gi_formatting --scale 1.0
+
+The GIRs are those of benchmarks.gir_cache, each class gets its own C
+file, half of the comments link to other symbols. Only the formatting of
+the project is timed, over a full `hotdoc run`.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from hotdoc.core.project import Project
+from hotdoc.run_hotdoc import run
+
+from benchmarks.gir_cache import NAMESPACES, make_girs
+
+CLASS_COMMENT = '''/**
+ * GstBaseClass%(i)d:
+ *
+ * %(description)s
+ */
+'''
+
+METHOD_COMMENT = '''/**
+ * gst_class%(i)d_method_%(i)d_%(j)d:
+ * @self: the object
+ * @value: the value
+ *
+ * %(description)s
+ *
+ * Returns: whether it worked
+ */
+'''
+
+
+def make_sources(folder, n_classes, n_methods=20):
+    """Writes one C file per class of GstBase in @folder, returns their
+    paths."""
+    sources = []
+    for i in range(n_classes):
+        if i % 2:
+            description = 'Derives from #GstBaseClass%d.' % (i - 1)
+        else:
+            description = 'A class.'
+        parts = [CLASS_COMMENT % {'i': i, 'description': description}]
+        for j in range(n_methods):
+            if j % 2:
+                description = ('See gst_class%d_method_%d_%d() and '
+                               '#GstBaseClass%d.' % (i, i, j - 1, i))
+            else:
+                description = 'Does thing %d.' % j
+            parts.append(METHOD_COMMENT % {'i': i, 'j': j,
+                                           'description': description})
+
+        path = os.path.join(folder, 'class%d.c' % i)
+        with open(path, 'w') as _:
+            _.write('\n'.join(parts))
+        sources.append(path)
+
+    return sources
+
+
+def run_project(folder, gir, sources):
+    """Builds the project in @folder, returns the time its formatting
+    took."""
+    with open(os.path.join(folder, 'index.markdown'), 'w') as _:
+        _.write('# Benchmark\n')
+    with open(os.path.join(folder, 'gi-index.markdown'), 'w') as _:
+        _.write('# API reference\n')
+    with open(os.path.join(folder, 'sitemap.txt'), 'w') as _:
+        _.write('index.markdown\n\tgi-index\n')
+
+    args = ['--index', 'index.markdown',
+            '--sitemap', 'sitemap.txt',
+            '--output', 'built_doc',
+            '--project-name', 'bench',
+            '--project-version', '1.0',
+            '--gi-index', 'gi-index.markdown',
+            '--gi-smart-index',
+            '--gi-sources', gir,
+            '--gi-c-sources'] + sources + [
+                '--languages', 'c', 'python', 'javascript',
+                '--disable-incremental-build',
+                'run']
+
+    # Builds happen in a forked child, which reports the time in a file
+    times_path = os.path.join(folder, 'format-time')
+    project_format = Project.format
+
+    def timed_format(project, *args):
+        start = time.perf_counter()
+        project_format(project, *args)
+        with open(times_path, 'w') as _:
+            _.write('%f' % (time.perf_counter() - start))
+
+    cwd = os.getcwd()
+    os.chdir(folder)
+    Project.format = timed_format
+    try:
+        res = run(args)
+    finally:
+        Project.format = project_format
+        os.chdir(cwd)
+
+    if res:
+        raise RuntimeError('hotdoc run failed with %d' % res)
+
+    with open(times_path) as _:
+        return float(_.read())
+
+
+def main():
+    """Banana banana"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='hotdoc-bench-gi-formatting-')
+    try:
+        girs = make_girs(folder, args.scale)
+        n_classes = max(1, int(NAMESPACES[-1][3] * args.scale))
+        sources = make_sources(folder, n_classes)
+        print('%d classes, %d methods' % (n_classes, n_classes * 20))
+
+        print('%-10s %12s' % ('run', 'format (s)'))
+        best = None
+        for i in range(args.repeat):
+            format_time = run_project(folder, girs['GstBase-1.0.gir'],
+                                      sources)
+            best = format_time if best is None else min(best, format_time)
+            print('%-10d %12.3f' % (i, format_time))
+        print('%-10s %12.3f' % ('best', best))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
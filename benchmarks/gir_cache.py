@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Times caching the nodes of a synthetic GIR set shaped like the one a
+GStreamer plugin documents against, GLib, GObject and Gio included by
+Gst and GstBase, without GIR cache, with a cold one and a warm one, run
+with:
+
+    python3 -m benchmarks.gir_cache --scale 1.0
+"""
+
+import argparse
+import importlib
+import os
+import shutil
+import tempfile
+import time
+
+from hotdoc.extensions.gi.gir_cache import GirCache
+
+# Namespace, symbol prefix, included namespace and number of classes,
+# at scale 1.0 the GIRs weigh roughly as much as the real ones
+NAMESPACES = [('GLib', 'g', None, 220),
+              ('GObject', 'g', 'GLib', 80),
+              ('Gio', 'g', 'GObject', 330),
+              ('Gst', 'gst', 'Gio', 200),
+              ('GstBase', 'gst', 'Gst', 60)]
+
+GIR_HEADER = '''<?xml version="1.0"?>
+<repository version="1.2"
+            xmlns="http://www.gtk.org/introspection/core/1.0"
+            xmlns:c="http://www.gtk.org/introspection/c/1.0"
+            xmlns:glib="http://www.gtk.org/introspection/glib/1.0">
+%(include)s
+  <namespace name="%(ns)s" version="1.0"
+             c:identifier-prefixes="%(ns)s"
+             c:symbol-prefixes="%(prefix)s">
+'''
+
+CLASS_TEMPLATE = '''
+    <class name="Class%(i)d" c:type="%(ns)sClass%(i)d"
+           c:symbol-prefix="class%(i)d" glib:type-name="%(ns)sClass%(i)d"
+           %(parent)s>
+%(methods)s
+      <property name="prop-%(i)d" writable="1">
+        <type name="gint" c:type="gint"/>
+      </property>
+      <glib:signal name="signal-%(i)d">
+        <return-value><type name="none" c:type="void"/></return-value>
+      </glib:signal>
+      <virtual-method name="vfunc_%(i)d" invoker="method_%(i)d_0">
+        <return-value><type name="none" c:type="void"/></return-value>
+      </virtual-method>
+      <field name="field_%(i)d"><type name="gint" c:type="gint"/></field>
+    </class>
+    <record name="Class%(i)dClass" c:type="%(ns)sClass%(i)dClass"
+            glib:is-gtype-struct-for="Class%(i)d">
+      <field name="padding"><type name="gpointer" c:type="gpointer"/></field>
+    </record>
+'''
+
+METHOD_TEMPLATE = '''      <method name="method_%(i)d_%(j)d"
+              c:identifier="%(prefix)s_class%(i)d_method_%(i)d_%(j)d">
+        <doc xml:space="preserve">Does thing %(j)d.</doc>
+        <return-value transfer-ownership="none">
+          <type name="gboolean" c:type="gboolean"/>
+        </return-value>
+        <parameters>
+          <instance-parameter name="self" transfer-ownership="none">
+            <type name="Class%(i)d" c:type="%(ns)sClass%(i)d*"/>
+          </instance-parameter>
+          <parameter name="value" transfer-ownership="none">
+            <type name="utf8" c:type="const gchar*"/>
+          </parameter>
+        </parameters>
+      </method>'''
+
+
+def make_girs(folder, scale, n_methods=20):
+    """Writes the GIR set in @folder, returns {basename: path}."""
+    girs = {}
+    for ns, prefix, include, n_classes in NAMESPACES:
+        parts = [GIR_HEADER % {
+            'ns': ns, 'prefix': prefix,
+            'include': ('  <include name="%s" version="1.0"/>' % include
+                        if include else '')}]
+        for i in range(max(1, int(n_classes * scale))):
+            methods = '\n'.join(METHOD_TEMPLATE % {
+                'ns': ns, 'prefix': prefix, 'i': i, 'j': j}
+                                for j in range(n_methods))
+            parts.append(CLASS_TEMPLATE % {
+                'ns': ns, 'i': i, 'methods': methods,
+                'parent': 'parent="Class%d"' % (i - 1) if i else ''})
+        parts.append('  </namespace>\n</repository>\n')
+
+        basename = '%s-1.0.gir' % ns
+        path = os.path.join(folder, basename)
+        with open(path, 'w') as _:
+            _.write(''.join(parts))
+        girs[basename] = path
+
+    return girs
+
+
+def run_setup(girs, cache_dir):
+    """Caches the nodes of GstBase and its includes, the way
+    `GIExtension.parse_config` does, returns the time it took."""
+    node_cache = importlib.reload(
+        importlib.import_module('hotdoc.extensions.gi.node_cache'))
+    gir_cache = GirCache(cache_dir) if cache_dir else None
+    start = time.perf_counter()
+    node_cache.cache_gir(girs['GstBase-1.0.gir'], girs, gir_cache)
+    return time.perf_counter() - start
+
+
+def main():
+    """Banana banana"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=float, default=1.0)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='hotdoc-bench-girs-')
+    try:
+        girs = make_girs(folder, args.scale)
+        size = sum(os.path.getsize(path) for path in girs.values())
+        print('%d GIRs, %.1f MiB' % (len(girs), size / 2 ** 20))
+
+        cache_dir = os.path.join(folder, 'cache')
+        reference = run_setup(girs, None)
+        print('%-10s %10s %10s' % ('cache', 'time (s)', 'speedup'))
+        for name, dir_ in (('none', None), ('cold', cache_dir),
+                           ('warm', cache_dir)):
+            setup_time = reference if dir_ is None else run_setup(girs, dir_)
+            print('%-10s %10.3f %10.2f' % (name, setup_time,
+                                           reference / setup_time))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
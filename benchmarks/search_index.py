@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measures the throughput of `hotdoc.extensions.search.create_index.SearchIndex`
+on a generated site, run with:
+
+    python3 -m benchmarks.search_index --pages 2000 --jobs 1 4 8
+
+Pages are generated and parsed up front, the timings cover tokenizing,
+merging and saving the index.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from lxml import etree
+
+from hotdoc.extensions.search.create_index import SearchIndex
+
+
+WORDS = ['gst_element_%d' % i for i in range(2000)] + [
+    'Buffer', 'pipeline', 'the', 'caps', 'negotiation', 'pad', 'GObject',
+    'signal', 'property', 'state', 'clock', 'latency', 'query', 'event']
+
+
+def make_site(folder, n_pages, n_sections, seed=0):
+    """Writes @n_pages pages of @n_sections sections each in @folder,
+    returns a list of (path, parsed tree) tuples."""
+    rand = random.Random(seed)
+    pages = []
+    for i in range(n_pages):
+        sections = []
+        for j in range(n_sections):
+            paragraphs = ''.join(
+                '<p>%s.</p>' % ' '.join(rand.choice(WORDS)
+                                        for _ in range(40))
+                for _ in range(4))
+            sections.append(
+                '<div id="section-%d"><h2>%s %s</h2>%s</div>' % (
+                    j, rand.choice(WORDS), rand.choice(WORDS), paragraphs))
+
+        html = ('<html><body><div id="main">%s</div></body></html>' %
+                ''.join(sections))
+        path = os.path.join(folder, 'page-%d.html' % i)
+        with open(path, 'w') as _:
+            _.write(html)
+        pages.append((path, etree.HTML(html)))
+
+    return pages
+
+
+def run_index(folder, pages, jobs):
+    """Returns the time it took to index @pages with @jobs processes."""
+    output_dir = os.path.join(folder, 'assets', 'js')
+    private_dir = tempfile.mkdtemp(prefix='hotdoc-bench-search-private-')
+    try:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.makedirs(output_dir)
+        start = time.perf_counter()
+        index = SearchIndex(folder, output_dir, private_dir, jobs=jobs)
+        for path, tree in pages:
+            index.process(path, tree)
+        index.write()
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(private_dir, ignore_errors=True)
+
+
+def main():
+    """Banana banana"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--sections', type=int, default=5)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='hotdoc-bench-search-')
+    try:
+        pages = make_site(folder, args.pages, args.sections)
+
+        print('%-6s %12s %12s %10s' % ('jobs', 'time (s)', 'pages/s',
+                                       'speedup'))
+        reference_time = None
+        for jobs in args.jobs:
+            index_time = run_index(folder, pages, jobs)
+            if reference_time is None:
+                reference_time = index_time
+            print('%-6d %12.2f %12.1f %10.2f' % (
+                jobs, index_time, len(pages) / index_time,
+                reference_time / index_time))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
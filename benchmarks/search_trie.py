@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares building and encoding `hotdoc.extensions.search.trie.Trie` and
+`hotdoc.extensions.search.trie.CompactTrie` on generated tokens, run with:
+
+    python3 -m benchmarks.search_trie --tokens 1000000
+
+Peak memory is measured with tracemalloc, which slows both builders down
+by the same order of magnitude, times are measured in a separate run.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from hotdoc.extensions.search.trie import Trie, CompactTrie
+
+
+PREFIXES = ['gst', 'gtk', 'g', 'GstElement', 'GtkWidget', 'hotdoc', 'clutter']
+LETTERS = 'abcdefghijklmnopqrstuvwxyz_0123456789'
+
+
+def make_tokens(n_tokens, seed=0):
+    """Returns @n_tokens distinct identifier-like tokens."""
+    rand = random.Random(seed)
+    tokens = set()
+    while len(tokens) < n_tokens:
+        tokens.add('%s_%s' % (rand.choice(PREFIXES), ''.join(
+            rand.choice(LETTERS) for _ in range(rand.randint(3, 14)))))
+    return list(tokens)
+
+
+def build_trie(tokens):
+    trie = Trie()
+    for token in tokens:
+        trie.insert(token)
+    return trie.encode()[0]
+
+
+def build_compact_trie(tokens):
+    return CompactTrie.from_words(tokens).encode()[0]
+
+
+def measure(builder, tokens):
+    """Returns the time, peak memory and encoded size of @builder."""
+    start = time.perf_counter()
+    data = builder(tokens)
+    build_time = time.perf_counter() - start
+    del data
+
+    tracemalloc.start()
+    data = builder(tokens)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return build_time, peak, len(data)
+
+
+def main():
+    """Banana banana"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tokens', type=int, default=1000000)
+    parser.add_argument('--no-legacy', action='store_true',
+                        help='Only measure CompactTrie')
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    builders = [('CompactTrie', build_compact_trie)]
+    if not args.no_legacy:
+        builders.insert(0, ('Trie', build_trie))
+
+    print('%-12s %10s %14s %14s' % ('builder', 'time (s)', 'peak (MiB)',
+                                     'size (MiB)'))
+    for name, builder in builders:
+        build_time, peak, size = measure(builder, tokens)
+        print('%-12s %10.2f %14.1f %14.1f' % (
+            name, build_time, peak / 2 ** 20, size / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares the "trie" and "dawg" search vocabulary formats on generated
+tokens, run with:
+
+    python3 -m benchmarks.search_vocabulary --tokens 200000
+
+Sizes are those of trie_index.js as shipped, and gzipped as most servers
+would send it. Lookups go through `CompactTrie`, which walks the arrays
+the same way trie.js does.
+"""
+
+import argparse
+import gzip
+import random
+import time
+
+from hotdoc.extensions.search.trie import CompactTrie
+
+from benchmarks.search_trie import make_tokens
+
+
+def time_per_call(func, args):
+    """Returns the average time of calling @func with each of @args."""
+    start = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return (time.perf_counter() - start) / len(args)
+
+
+def main():
+    """Banana banana"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tokens', type=int, default=200000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--searches', type=int, default=20)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    rand = random.Random(1)
+    # Half of the lookups miss
+    lookups = [token if i % 2 else token + 'x' for i, token in
+               enumerate(rand.sample(tokens, min(args.lookups,
+                                                 len(tokens))))]
+    queries = [token[:-1] for token in rand.sample(tokens, args.searches)]
+
+    print('%-6s %10s %10s %12s %12s %12s %14s' % (
+        'format', 'nodes', 'build (s)', 'js (MiB)', 'gzip (MiB)',
+        'lookup (us)', 'search (ms)'))
+    for name, minimize in (('trie', False), ('dawg', True)):
+        start = time.perf_counter()
+        trie = CompactTrie.from_words(tokens, minimize=minimize)
+        build_time = time.perf_counter() - start
+        _, b64_data = trie.encode()
+        gzipped = gzip.compress(b64_data)
+
+        print('%-6s %10d %10.2f %12.2f %12.2f %12.2f %14.2f' % (
+            name, len(trie), build_time, len(b64_data) / 2 ** 20,
+            len(gzipped) / 2 ** 20,
+            time_per_call(trie.exists, lookups) * 1e6,
+            time_per_call(lambda query, trie=trie: trie.search(query, 1),
+                          queries) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
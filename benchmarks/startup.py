@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measures the startup cost of the hotdoc command, run with:
+
+    python3 -m benchmarks.startup
+
+Reports the import time of each installed extension module, and the
+wall time of introspection commands through the `hotdoc.cli` entry point
+and through the full `hotdoc.run_hotdoc` command-line parser.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from hotdoc.utils.utils import get_extension_manifest
+
+
+def import_time(module):
+    """Cumulative import time of @module in a fresh interpreter, in ms."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        stderr=subprocess.PIPE, stdout=subprocess.DEVNULL,
+        universal_newlines=True)
+    for line in proc.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    return float('nan')
+
+
+def command_time(entry_point, args, repeat):
+    """Average wall time of running hotdoc with @args, in ms."""
+    code = ('import sys; from %s import main; sys.argv = ["hotdoc"] + %r; '
+            'sys.exit(main())' % (entry_point, args))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        subprocess.run([sys.executable, '-c', code],
+                       stdout=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    """Banana banana"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('%-40s %14s' % ('extension module', 'import (ms)'))
+    modules = sorted({info.module for info in get_extension_manifest()})
+    for module in modules:
+        print('%-40s %14.1f' % (module, import_time(module)))
+
+    conf_dir = tempfile.mkdtemp(prefix='hotdoc-bench-startup-')
+    conf_file = os.path.join(conf_dir, 'hotdoc.json')
+    with open(conf_file, 'w') as _:
+        json.dump({'project_name': 'bench', 'project_version': '1.0',
+                   'output': 'built_doc'}, _)
+
+    commands = [['--version'],
+                ['--conf-file', conf_file, '--get-conf-key', 'project_name'],
+                ['--conf-file', conf_file, '--get-conf-path', 'output'],
+                ['--conf-file', conf_file, '--get-private-folder'],
+                ['--has-extension', 'search-extension']]
+
+    print()
+    print('%-50s %12s %12s' % ('command', 'cli (ms)', 'full (ms)'))
+    for command in commands:
+        label = ' '.join(arg if arg != conf_file else 'hotdoc.json'
+                         for arg in command)
+        print('%-50s %12.1f %12.1f' % (
+            label, command_time('hotdoc.cli', command, args.repeat),
+            command_time('hotdoc.run_hotdoc', command, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Entry point of the hotdoc command.
+
+Introspection commands such as `--version`, `--get-conf-key` or
+`--has-extension` are called often by build systems, they are answered
+here without importing the extensions nor the documentation pipeline
+whenever possible, falling back to `hotdoc.run_hotdoc` otherwise.
+"""
+
+import argparse
+import os
+import sys
+
+from hotdoc.core.config import Config, load_config_json
+from hotdoc.core.exceptions import HotdocException
+from hotdoc.utils.setup_utils import VERSION
+from hotdoc.utils.utils import (get_extension_manifest,
+                                get_sanitized_project_name)
+
+
+def __parse_introspection_args(args):
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--extra-extension-path', action='append',
+                        default=[], dest='extra_extension_path')
+    parser.add_argument('--conf-file', dest='conf_file')
+    parser.add_argument('--version', action='store_true')
+    parser.add_argument('--makefile-path', action='store_true')
+    parser.add_argument('--get-conf-key', action='store')
+    parser.add_argument('--get-conf-path', action='store')
+    parser.add_argument('--get-private-folder', action='store_true')
+    parser.add_argument('--has-extension', action='append',
+                        dest='has_extensions', default=[])
+    parser.add_argument('--list-extensions', action='store_true',
+                        dest='list_extensions')
+    parser.add_argument('--project-name', action='store',
+                        dest='project_name')
+    parser.add_argument('--project-version', action='store',
+                        dest='project_version')
+
+    try:
+        known_args, unknown_args = parser.parse_known_args(args)
+    except SystemExit:
+        return None, None
+
+    # Anything else may be an extension argument, or a command
+    if unknown_args:
+        return None, None
+
+    actual_args = {}
+    for key, value in vars(known_args).items():
+        if value != parser.get_default(key):
+            actual_args[key] = value
+
+    return known_args, actual_args
+
+
+def __print_extensions(known_args):
+    # Extension paths may also be listed in the configuration file,
+    # see `hotdoc.run_hotdoc.run`
+    extra_extension_path = list(known_args.extra_extension_path)
+    if known_args.conf_file:
+        try:
+            json_conf = load_config_json(known_args.conf_file)
+        except HotdocException:
+            return None
+        extra_extension_path += json_conf.get('extra_extension_path', [])
+
+    names = [info.extension_name for info in get_extension_manifest(
+        extra_extension_path)]
+
+    if known_args.has_extensions:
+        res = 0
+        for extension_name in known_args.has_extensions:
+            if extension_name in names:
+                print("Extension '%s'... FOUND." % extension_name)
+            else:
+                print("Extension '%s'... NOT FOUND." % extension_name)
+                res = 1
+        return res
+
+    print("Extensions:")
+    for extension in sorted(names):
+        print(" - %s " % extension)
+    return 0
+
+
+# pylint: disable=too-many-return-statements
+def run_introspection(args):
+    """
+    Answers the introspection command in @args if possible.
+
+    Returns:
+        int: the exit code, or `None` if the full command-line parser
+            and the extensions are needed to answer.
+    """
+    known_args, actual_args = __parse_introspection_args(args)
+    if known_args is None:
+        return None
+
+    if known_args.has_extensions or known_args.list_extensions:
+        return __print_extensions(known_args)
+
+    if known_args.version:
+        print(VERSION)
+        return 0
+
+    if known_args.makefile_path:
+        here = os.path.dirname(__file__)
+        print(os.path.abspath(os.path.join(here, 'utils', 'hotdoc.mk')))
+        return 0
+
+    conf_file = known_args.conf_file
+    if conf_file is None and os.path.exists('hotdoc.json'):
+        conf_file = 'hotdoc.json'
+
+    try:
+        json_conf = load_config_json(conf_file) if conf_file else None
+        config = Config(command_line_args=actual_args, conf_file=conf_file,
+                        json_conf=json_conf)
+    except HotdocException:
+        return None
+
+    # Defaults of the extension arguments are not known here
+    if known_args.get_private_folder:
+        project_name = config.get('project_name')
+        project_version = config.get('project_version')
+        if not project_name or not project_version:
+            return None
+        print(os.path.abspath('hotdoc-private-%s' % get_sanitized_project_name(
+            project_name, project_version)))
+        return 0
+
+    if known_args.get_conf_path:
+        path = config.get_path(known_args.get_conf_path, rel_to_cwd=True)
+        if path is None:
+            return None
+        print(path)
+        return 0
+
+    if known_args.get_conf_key:
+        value = config.get(known_args.get_conf_key, None)
+        if value is None:
+            return None
+        print(value)
+        return 0
+
+    return None
+
+
+def main():
+    """
+    Banana banana
+    """
+    res = None
+    if not os.environ.get('HOTDOC_PROFILING'):
+        res = run_introspection(sys.argv[1:])
+
+    if res is None:
+        from hotdoc.run_hotdoc import main as run_main
+        res = run_main()
+
+    return res
@@ -117,6 +117,20 @@ class Config:
         self.__cli = command_line_args or {}
         self.__defaults = defaults or {}
 
+    def reload(self):
+        """
+        Reload the configuration file.
+
+        Returns:
+            Config: a new instance, with the same command line arguments
+                and defaults as this one.
+        """
+        config = Config(command_line_args=self.__cli,
+                        conf_file=self.conf_file,
+                        defaults=self.__defaults)
+        config.__invoke_dir = self.__invoke_dir
+        return config
+
     def __abspath(self, path, from_conf):
         if path is None:
             return None
@@ -19,13 +19,16 @@
 """Banana banana
 """
 import os
+import hashlib
 import pickle
+import sqlite3
+import threading
 
 # pylint: disable=import-error
 # pylint: disable=import-error
 from hotdoc.core.symbols import Symbol
 from hotdoc.utils.signals import Signal
-from hotdoc.utils.loggable import debug
+from hotdoc.utils.loggable import debug, info
 
 
 # pylint: disable=too-few-public-methods
@@ -38,6 +41,172 @@ class ProxySymbol(Symbol):
         Symbol.__init__(self, **kwargs)
 
 
+class PickleFolderStore:
+    """
+    Stores each entry in its own pickle file, with one folder per
+    kind of entry.
+
+    This is the historical layout of the database, it is slow to
+    persist and to query for large projects as it implies at least
+    one file and a few syscalls per entry.
+    """
+    store_name = 'folders'
+
+    def __init__(self, private_folder):
+        self.__folder = private_folder or '/tmp'
+
+    def __get_path(self, kind, name, create_if_required=False):
+        fname = os.path.join(self.__folder, kind, name.lstrip('/'))
+        if create_if_required:
+            os.makedirs(os.path.dirname(fname), exist_ok=True)
+        return fname
+
+    def exists(self):
+        """
+        Whether a previous run persisted entries in this store
+        """
+        return os.path.exists(os.path.join(self.__folder, 'symbols')) and \
+            os.path.exists(os.path.join(self.__folder, 'aliases'))
+
+    def get(self, kind, name):
+        """
+        Returns the pickled data stored for @name, or None
+        """
+        path = self.__get_path(kind, name)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as _:
+            return _.read()
+
+    def put_many(self, kind, entries):
+        """
+        Persist an iterable of (name, pickled data) tuples
+        """
+        os.makedirs(os.path.join(self.__folder, kind), exist_ok=True)
+        for name, data in entries:
+            with open(self.__get_path(kind, name, True), 'wb') as _:
+                _.write(data)
+
+    def delete_many(self, kind, names):
+        """
+        Remove the entries stored for @names
+        """
+        for name in names:
+            try:
+                os.unlink(self.__get_path(kind, name))
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        """
+        Banana banana
+        """
+        pass
+
+
+class SQLiteStore:
+    """
+    Stores all the entries in a single indexed SQLite table, persisting
+    is done in one transaction and lookups are point queries on the
+    primary key.
+    """
+    store_name = 'sqlite'
+
+    def __init__(self, private_folder):
+        self.__path = os.path.join(private_folder or '/tmp',
+                                   'database.sqlite')
+        self.__exists = os.path.exists(self.__path)
+        self.__conn = None
+        self.__conn_pid = None
+        self.__lock = threading.Lock()
+
+    def __get_connection(self):
+        # Connections must not be shared with forked processes
+        if self.__conn_pid != os.getpid():
+            self.__conn = None
+
+        if self.__conn is None:
+            self.__conn_pid = os.getpid()
+            os.makedirs(os.path.dirname(self.__path), exist_ok=True)
+            self.__conn = sqlite3.connect(self.__path,
+                                          check_same_thread=False)
+            # This is a cache, a failed run will trigger a full rebuild
+            # anyway, no need to pay for durability.
+            self.__conn.execute('PRAGMA synchronous = OFF')
+            self.__conn.execute('PRAGMA journal_mode = MEMORY')
+            self.__conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'kind TEXT NOT NULL, name TEXT NOT NULL, data BLOB NOT NULL, '
+                'PRIMARY KEY (kind, name)) WITHOUT ROWID')
+        return self.__conn
+
+    def exists(self):
+        """
+        Whether a previous run persisted entries in this store
+        """
+        return self.__exists
+
+    def get(self, kind, name):
+        """
+        Returns the pickled data stored for @name, or None
+        """
+        if not self.__exists:
+            return None
+
+        with self.__lock:
+            row = self.__get_connection().execute(
+                'SELECT data FROM entries WHERE kind = ? AND name = ?',
+                (kind, name)).fetchone()
+
+        if row is None:
+            return None
+
+        return row[0]
+
+    def put_many(self, kind, entries):
+        """
+        Persist an iterable of (name, pickled data) tuples
+        """
+        with self.__lock:
+            conn = self.__get_connection()
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO entries VALUES (?, ?, ?)',
+                    ((kind, name, data) for name, data in entries))
+        self.__exists = True
+
+    def delete_many(self, kind, names):
+        """
+        Remove the entries stored for @names
+        """
+        if not self.__exists:
+            return
+
+        with self.__lock:
+            conn = self.__get_connection()
+            with conn:
+                conn.executemany(
+                    'DELETE FROM entries WHERE kind = ? AND name = ?',
+                    ((kind, name) for name in names))
+
+    def close(self):
+        """
+        Banana banana
+        """
+        with self.__lock:
+            if self.__conn is not None:
+                self.__conn.close()
+                self.__conn = None
+
+
+ENTRY_KINDS = ('symbols', 'aliases', 'comments', 'sources')
+
+
+DATABASE_STORES = {store.store_name: store for store in (SQLiteStore,
+                                                         PickleFolderStore)}
+
+
 # pylint: disable=too-many-instance-attributes
 class Database:
     """
@@ -47,21 +216,27 @@ class Database:
     `hotdoc.core.symbol.Symbol.unique_name`) to determine what goes into the
     generated documentation and how it is described.
     """
-    def __init__(self, private_folder):
+    def __init__(self, private_folder, store_name='sqlite'):
         self.comment_added_signal = Signal()
         self.comment_updated_signal = Signal()
+        self.symbol_updated_signal = Signal()
 
         self.__comments = {}
         self.__symbols = {}
         self.__aliases = {}
-        self.__symbol_folder = os.path.join(private_folder or '/tmp',
-                                            "symbols")
-        self.__aliases_folder = os.path.join(private_folder or '/tmp',
-                                             "aliases")
-        self.__comments_folder = os.path.join(private_folder or '/tmp',
-                                              "comments")
-        self.__incremental = os.path.exists(self.__symbol_folder) and \
-            os.path.exists(self.__aliases_folder)
+        # The names of the symbols and comments found in each source file
+        self.__sources = {}
+        self.__store = DATABASE_STORES[store_name](private_folder)
+        self.__incremental = self.__store.exists()
+
+        # Entries created or updated during this run, per kind
+        self.__dirty = {kind: set() for kind in ENTRY_KINDS}
+        # Entries removed during this run, per kind
+        self.__tombstones = {kind: set() for kind in ENTRY_KINDS}
+        # The digests of the symbols loaded from the store, symbols
+        # modified in place without a call to update_symbol are
+        # detected with these when persisting
+        self.__loaded_digests = {}
 
     def add_comment(self, comment):
         """
@@ -74,6 +249,10 @@ class Database:
             return
 
         self.__comments[comment.name] = comment
+        self.__dirty['comments'].add(comment.name)
+        self.__tombstones['comments'].discard(comment.name)
+        if comment.filename:
+            self.__add_to_source(comment.filename, 'comments', comment.name)
         if self.__incremental:
             self.__update_symbol_comment(comment)
         else:
@@ -95,14 +274,25 @@ class Database:
                 return comment
 
         if self.__incremental:
-            fname = self.__get_pickle_path(self.__comments_folder, name)
-            if os.path.exists(fname):
-                with open(fname, 'rb') as _:
-                    self.__comments[name] = pickle.load(_)
-                    return self.__comments[name]
+            comment = self.__load('comments', name)
+            if comment:
+                self.__comments[name] = comment
+                return comment
 
         return None
 
+    def remove_comment(self, name):
+        """
+        Remove the comment for @name from the database, the removal will
+        be recorded when persisting.
+
+        Args:
+            name (str): the name of the comment to remove
+        """
+        self.__comments.pop(name, None)
+        self.__dirty['comments'].discard(name)
+        self.__tombstones['comments'].add(name)
+
     def get_or_create_symbol(self, type_, **kwargs):
         """
         Banana banana
@@ -140,34 +330,177 @@ class Database:
             self.__symbols[alias] = symbol
         self.__aliases[unique_name] = aliases
 
+        for name in [unique_name] + aliases:
+            self.__dirty['symbols'].add(name)
+            self.__tombstones['symbols'].discard(name)
+        self.__dirty['aliases'].add(unique_name)
+        self.__tombstones['aliases'].discard(unique_name)
+        if symbol.filename:
+            self.__add_to_source(symbol.filename, 'symbols', unique_name)
+
+        self.symbol_updated_signal(self, unique_name)
         return symbol
 
-    @staticmethod
-    def __get_pickle_path(folder, name, create_if_required=False):
-        fname = os.path.join(folder, name.lstrip('/'))
-        if create_if_required:
-            os.makedirs(os.path.dirname(fname), exist_ok=True)
-        return fname
+    def update_symbol(self, symbol):
+        """
+        Record that @symbol was modified in place, for example when its
+        links were resolved, so that it gets written back when persisting.
+
+        Only symbols created or updated during this run are persisted.
+
+        Args:
+            symbol (hotdoc.core.symbols.Symbol): the modified symbol
+        """
+        unique_name = symbol.unique_name
+        # The aliases are stored with a copy of the symbol
+        for name in [unique_name] + self.__get_aliases(unique_name):
+            self.__symbols[name] = symbol
+            self.__dirty['symbols'].add(name)
+            self.__tombstones['symbols'].discard(name)
+        if symbol.filename:
+            self.__add_to_source(symbol.filename, 'symbols', unique_name)
+        self.symbol_updated_signal(self, unique_name)
+
+    def remove_symbol(self, unique_name):
+        """
+        Remove a symbol and its aliases from the database, the removal
+        will be recorded when persisting.
+
+        Args:
+            unique_name (str): the unique name of the symbol to remove
+        """
+        for name in [unique_name] + self.__get_aliases(unique_name):
+            self.__symbols.pop(name, None)
+            self.__dirty['symbols'].discard(name)
+            self.__tombstones['symbols'].add(name)
+
+        self.__aliases.pop(unique_name, None)
+        self.__dirty['aliases'].discard(unique_name)
+        self.__tombstones['aliases'].add(unique_name)
+        self.symbol_updated_signal(self, unique_name)
+
+    def remove_source(self, filename, symbols=True):
+        """
+        Remove the symbols and comments that were found in @filename,
+        typically because it is not listed in the sources anymore.
+
+        Entries that have since moved to another source file are kept.
+
+        Args:
+            filename (str): the path of the removed source file
+            symbols (bool): whether to remove the symbols as well as
+                the comments
+        """
+        filename = os.path.abspath(filename)
+        entries = self.__get_source(filename)
+
+        for name in entries['symbols'] if symbols else ():
+            symbol = self.get_symbol(name)
+            if symbol and symbol.unique_name == name and \
+                    symbol.filename == filename:
+                self.remove_symbol(name)
+
+        for name in entries['comments']:
+            comment = self.get_comment(name)
+            if comment and comment.name == name and \
+                    comment.filename == filename:
+                self.remove_comment(name)
+
+        self.__sources.pop(filename, None)
+        self.__dirty['sources'].discard(filename)
+        self.__tombstones['sources'].add(filename)
+
+    def __get_source(self, filename):
+        entries = self.__sources.get(filename)
+
+        if entries is None:
+            if self.__incremental:
+                entries = self.__load('sources', filename)
+            if entries is None:
+                entries = {'symbols': set(), 'comments': set()}
+            self.__sources[filename] = entries
+
+        return entries
+
+    def __add_to_source(self, filename, kind, name):
+        names = self.__get_source(filename)[kind]
+        if name not in names:
+            names.add(name)
+            self.__dirty['sources'].add(filename)
+            self.__tombstones['sources'].discard(filename)
+
+    def __load(self, kind, name):
+        if name in self.__tombstones[kind]:
+            return None
+
+        data = self.__store.get(kind, name)
+        if data is None:
+            return None
+
+        if kind == 'symbols':
+            self.__loaded_digests[name] = hashlib.sha1(data).digest()
+
+        return pickle.loads(data)
+
+    def __get_modified_entries(self, kind, entries, counter):
+        for name in self.__dirty[kind]:
+            obj = entries.get(name)
+            if not obj:
+                continue
+
+            counter[kind] += 1
+            yield name, pickle.dumps(obj)
+
+        if kind != 'symbols':
+            return
+
+        for name, digest in self.__loaded_digests.items():
+            obj = entries.get(name)
+            if name in self.__dirty[kind] or not obj:
+                continue
+
+            data = pickle.dumps(obj)
+            if hashlib.sha1(data).digest() != digest:
+                counter[kind] += 1
+                yield name, data
 
     def persist(self):
         """
-        Banana banana
+        Write back the entries that were created, updated or removed
+        during this run.
+
+        Returns:
+            int: the number of entries that were written
         """
-        os.makedirs(self.__symbol_folder, exist_ok=True)
-        os.makedirs(self.__aliases_folder, exist_ok=True)
-        os.makedirs(self.__comments_folder, exist_ok=True)
-        for name, sym in self.__symbols.items():
-            with open(self.__get_pickle_path(self.__symbol_folder, name, True), 'wb') as _:
-                pickle.dump(sym, _)
-        for name, aliases in self.__aliases.items():
-            if aliases:
-                with open(self.__get_pickle_path(self.__aliases_folder, name, True), 'wb') as _:
-                    pickle.dump(aliases, _)
-
-        for name, comment in self.__comments.items():
-            if comment:
-                with open(self.__get_pickle_path(self.__comments_folder, name, True), 'wb') as _:
-                    pickle.dump(comment, _)
+        written = {kind: 0 for kind in ENTRY_KINDS}
+
+        for kind, entries in (('symbols', self.__symbols),
+                              ('aliases', self.__aliases),
+                              ('comments', self.__comments),
+                              ('sources', self.__sources)):
+            self.__store.delete_many(kind, self.__tombstones[kind])
+            self.__store.put_many(kind, self.__get_modified_entries(
+                kind, entries, written))
+
+        info('Persisted %d symbols, %d aliases and %d comments, '
+             'removed %d entries' % (
+                 written['symbols'], written['aliases'], written['comments'],
+                 sum(len(names) for names in self.__tombstones.values())),
+             'database')
+
+        return sum(written.values())
+
+    def close(self):
+        """
+        Release the resources held by the underlying store
+        """
+        self.__store.close()
+
+    def get_aliases(self, unique_name):
+        """
+        Returns the names the symbol named @unique_name is aliased to.
+        """
+        return list(self.__get_aliases(unique_name))
 
     def __get_aliases(self, name):
         aliases = self.__aliases.get(name, [])
@@ -176,10 +509,7 @@ class Database:
             return aliases
 
         if not aliases:
-            path = self.__get_pickle_path(self.__aliases_folder, name)
-            if os.path.exists(path):
-                with open(path, 'rb') as _:
-                    aliases = pickle.load(_)
+            aliases = self.__load('aliases', name) or []
 
         if aliases:
             # Faster look up next time around
@@ -198,10 +528,7 @@ class Database:
             return sym
 
         if not sym:
-            path = os.path.join(self.__symbol_folder, name)
-            if os.path.exists(path):
-                with open(path, 'rb') as _:
-                    sym = pickle.load(_)
+            sym = self.__load('symbols', name)
 
         if sym:
             # Faster look up next time around
@@ -18,6 +18,8 @@
 
 """Base Hotdoc Exceptions"""
 import io
+import pickle
+import traceback
 
 
 class HotdocException(Exception):
@@ -27,6 +29,31 @@ class HotdocException(Exception):
         super(HotdocException, self).__init__(message)
 
 
+def dump_exception(exc):
+    """
+    Serializes @exc so that it can be raised again in another process
+    with `load_exception`.
+
+    Exceptions that cannot be pickled and unpickled are replaced with a
+    `HotdocException` carrying their formatted traceback.
+    """
+    try:
+        data = pickle.dumps(exc)
+        pickle.loads(data)
+        return data
+    # pylint: disable=broad-except
+    except Exception:
+        return pickle.dumps(HotdocException(''.join(
+            traceback.format_exception(type(exc), exc, exc.__traceback__))))
+
+
+def load_exception(data):
+    """
+    Returns the exception serialized with `dump_exception`
+    """
+    return pickle.loads(data)
+
+
 class InvalidPageMetadata(HotdocException):
     """Invalid page metadata"""
 
@@ -20,6 +20,7 @@
 Utilities and baseclasses for extensions
 """
 import os
+import threading
 from collections import OrderedDict
 from collections import defaultdict
 
@@ -88,6 +89,7 @@ class Extension(Configurable):
     paths_arguments = {}
     path_arguments = {}
     written_out_sitemaps = set()
+    __sitemap_lock = threading.Lock()
 
     def __init__(self, app, project):
         """Constructor for `Extension`.
@@ -181,6 +183,14 @@ class Extension(Configurable):
             self.__list_override_pages_cb)
         self.project.tree.update_signal.connect(self.__update_tree_cb)
 
+    def persist(self):
+        """
+        Extension subclasses can implement this to save whatever
+        private state they want to reuse in the next incremental
+        run, it is called once the project has been formatted.
+        """
+        pass
+
     def get_stale_files(self, all_files, prefix=None):
         """
         Shortcut function to `change_tracker.ChangeTracker.get_stale_files`
@@ -655,7 +665,10 @@ class Extension(Configurable):
         """
         Banana banana
         """
-        if opath not in self.written_out_sitemaps:
+        with Extension.__sitemap_lock:
+            if opath in self.written_out_sitemaps:
+                return
+
             Extension.formatted_sitemap = self.formatter.format_navigation(
                 self.app.project)
             if Extension.formatted_sitemap:
@@ -665,7 +678,7 @@ class Extension(Configurable):
                 with open(opath, 'w') as _:
                     _.write(js_wrapper)
 
-        self.written_out_sitemaps.add(opath)
+            self.written_out_sitemaps.add(opath)
 
     # pylint: disable=too-many-locals
     def write_out_page(self, output, page):
@@ -695,8 +708,7 @@ class Extension(Configurable):
         html_subpages = self.formatter.format_subpages(page, subpages)
 
         js_dir = os.path.join(output, 'html', 'assets', 'js')
-        if not os.path.exists(js_dir):
-            os.makedirs(js_dir)
+        os.makedirs(js_dir, exist_ok=True)
         sm_path = os.path.join(js_dir, 'sitemap.js')
         self.write_out_sitemap(sm_path)
 
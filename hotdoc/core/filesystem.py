@@ -20,11 +20,39 @@
 Defines and tests ChangeTracker
 """
 import os
-from collections import defaultdict
+import hashlib
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 from hotdoc.utils.utils import OrderedSet, get_mtime
 
 
+# What is recorded about a file in content mode, size and mtime are -1
+# and digest None for missing files
+FileStamp = namedtuple('FileStamp', ['size', 'mtime', 'digest'])
+
+
+MISSING_FILE_STAMP = FileStamp(-1, -1, None)
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+# Below this number of files to hash, a thread pool is not worth it
+MIN_FILES_FOR_HASHING_POOL = 16
+
+
+def _hash_file(filename):
+    digest = hashlib.sha1()
+    try:
+        with open(filename, 'rb') as _:
+            for chunk in iter(lambda: _.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
 class ChangeTracker(object):
     """
     This class should only be instantiated and used through
@@ -32,13 +60,61 @@ class ChangeTracker(object):
 
     It provides with modification time tracking and some
     other utilities.
+
+    By default, a file is considered modified when its mtime changes.
+    When `hash_contents` is True, the size, mtime and a digest of the
+    contents of files are recorded instead, and a file is only
+    considered modified when its size or digest changed. Files are
+    only hashed when their size or mtime changed, by up to `jobs`
+    threads.
     """
     all_stale_files = set()
 
-    def __init__(self):
+    def __init__(self, hash_contents=False, jobs=1):
         self.exts_mtimes = {}
         self.hard_deps_mtimes = {}
         self.mtimes = defaultdict(defaultdict)
+        self.hash_contents = hash_contents
+        self.jobs = jobs
+
+    # pylint: disable=no-self-use
+    def __get_stamps(self, filenames, previous_stamps):
+        stamps = {}
+        to_hash = []
+
+        for filename in filenames:
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                stamps[filename] = MISSING_FILE_STAMP
+                continue
+
+            prev_stamp = previous_stamps.get(filename)
+            if isinstance(prev_stamp, FileStamp) and \
+                    prev_stamp.size == stat.st_size and \
+                    prev_stamp.mtime == stat.st_mtime:
+                stamps[filename] = prev_stamp
+            else:
+                to_hash.append((filename, stat))
+
+        if self.jobs > 1 and len(to_hash) >= MIN_FILES_FOR_HASHING_POOL:
+            with ThreadPoolExecutor(self.jobs) as pool:
+                digests = list(pool.map(_hash_file,
+                                        [fname for fname, _ in to_hash]))
+        else:
+            digests = [_hash_file(fname) for fname, _ in to_hash]
+
+        for (filename, stat), digest in zip(to_hash, digests):
+            stamps[filename] = FileStamp(stat.st_size, stat.st_mtime, digest)
+
+        return stamps
+
+    # pylint: disable=no-self-use
+    def __stamp_changed(self, stamp, prev_stamp):
+        if not isinstance(prev_stamp, FileStamp):
+            return True
+        return stamp.size != prev_stamp.size or \
+            stamp.digest != prev_stamp.digest
 
     def get_stale_files(self, all_files, fileset_name):
         """
@@ -49,12 +125,22 @@ class ChangeTracker(object):
         previous_mtimes = self.mtimes[fileset_name]
         new_mtimes = defaultdict()
 
+        if self.hash_contents:
+            stamps = self.__get_stamps(all_files, previous_mtimes)
+
         for filename in all_files:
-            mtime = get_mtime(filename)
             prev_mtime = previous_mtimes.pop(filename, None)
-            new_mtimes[filename] = mtime
-            if mtime == prev_mtime:
-                continue
+
+            if self.hash_contents:
+                stamp = stamps[filename]
+                new_mtimes[filename] = stamp
+                if not self.__stamp_changed(stamp, prev_mtime):
+                    continue
+            else:
+                mtime = get_mtime(filename)
+                new_mtimes[filename] = mtime
+                if mtime == prev_mtime:
+                    continue
 
             stale.add(filename)
 
@@ -70,6 +156,13 @@ class ChangeTracker(object):
         """
         Banana banana
         """
+        if self.hash_contents:
+            stamp = self.__get_stamps([filename], self.hard_deps_mtimes)[
+                filename]
+            if stamp != MISSING_FILE_STAMP:
+                self.hard_deps_mtimes[filename] = stamp
+            return
+
         mtime = get_mtime(filename)
 
         if mtime != -1:
@@ -79,6 +172,16 @@ class ChangeTracker(object):
         """
         Banana banana
         """
+        if self.hash_contents:
+            stamps = self.__get_stamps(list(self.hard_deps_mtimes.keys()),
+                                       self.hard_deps_mtimes)
+            for filename, last_stamp in list(self.hard_deps_mtimes.items()):
+                stamp = stamps[filename]
+                if stamp == MISSING_FILE_STAMP or \
+                        self.__stamp_changed(stamp, last_stamp):
+                    return True
+            return False
+
         for filename, last_mtime in list(self.hard_deps_mtimes.items()):
             mtime = get_mtime(filename)
 
@@ -25,6 +25,7 @@ By design, hotdoc only supports html output.
 """
 
 import os
+import sys
 import html
 import re
 import urllib.parse
@@ -32,8 +33,9 @@ from urllib.request import urlretrieve
 import shutil
 import tarfile
 import hashlib
+import threading
 
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 import appdirs
 
@@ -95,6 +97,26 @@ Logger.register_warning_code('download-theme-error', HotdocException,
 HERE = os.path.dirname(__file__)
 
 
+# Pages may be written out from several threads, each of them needs its
+# own XSLT transform and subpages
+_WRITE_OUT_STATE = threading.local()
+
+
+def _get_xml_subpages(_):
+    return _WRITE_OUT_STATE.xml_subpages
+
+
+etree.FunctionNamespace('uri:hotdoc')['subpages'] = _get_xml_subpages
+
+
+def _get_page_transform():
+    transform = getattr(_WRITE_OUT_STATE, 'page_transform', None)
+    if transform is None:
+        transform = etree.XSLT(XSLT_PAGE_TRANSFORM)
+        _WRITE_OUT_STATE.page_transform = transform
+    return transform
+
+
 def _download_progress_cb(blocknum, blocksize, totalsize):
     """Banana Banana"""
     readsofar = blocknum * blocksize
@@ -109,6 +131,94 @@ def _download_progress_cb(blocknum, blocksize, totalsize):
         print("read %d\n" % (readsofar,))
 
 
+# Default memory budget of the page buffer, in MiB
+DEFAULT_PAGE_BUFFER_BUDGET = 256
+
+
+class PageBuffer:
+    """
+    Keeps formatted pages in memory between `Formatter.cache_page` and
+    `Formatter.write_out`.
+
+    Once the contents held exceed @budget bytes of memory, the oldest
+    pages are spilled to their cache path on disk.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.__pages = OrderedDict()
+        self.__size = 0
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def __write(path, contents):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as _:
+            _.write(contents)
+
+    def put(self, path, contents):
+        """
+        Buffer @contents, to be cached at @path
+        """
+        spilled = []
+        with self.__lock:
+            previous = self.__pages.pop(path, None)
+            if previous is not None:
+                self.__size -= sys.getsizeof(previous)
+
+            self.__pages[path] = contents
+            self.__size += sys.getsizeof(contents)
+
+            while self.__size > self.budget:
+                spilled.append(self.__pages.popitem(last=False))
+                self.__size -= sys.getsizeof(spilled[-1][1])
+
+        for spilled_path, spilled_contents in spilled:
+            debug('Spilling %s to disk' % spilled_path, 'formatting')
+            self.__write(spilled_path, spilled_contents)
+
+    def get(self, path):
+        """
+        Returns the contents to be cached at @path, reading them back
+        from disk if they were spilled, and makes sure they are persisted
+        for incremental builds.
+        """
+        with self.__lock:
+            contents = self.__pages.pop(path, None)
+            if contents is not None:
+                self.__size -= sys.getsizeof(contents)
+
+        if contents is None:
+            with open(path, 'r', encoding='utf-8') as _:
+                return _.read()
+
+        # Pages that are not formatted again by the next incremental
+        # build are written out from this cache when their subpages
+        # change, every page thus needs to be cached once
+        self.__write(path, contents)
+        return contents
+
+    def clear(self):
+        """
+        Forget about all the buffered pages
+        """
+        with self.__lock:
+            self.__pages.clear()
+            self.__size = 0
+
+    def flush(self):
+        """
+        Spill all the buffered pages to disk
+        """
+        with self.__lock:
+            pages = list(self.__pages.items())
+            self.__pages.clear()
+            self.__size = 0
+
+        for path, contents in pages:
+            self.__write(path, contents)
+
+
 # pylint: disable=too-few-public-methods
 class TocSection:
     """
@@ -147,6 +257,10 @@ class Formatter(Configurable):
     all_scripts = set()
     all_stylesheets = set()
     get_extra_files_signal = Signal()
+    # Handlers of writing_page_signal may be called from a write-out
+    # thread, but never concurrently
+    writing_page_lock = threading.Lock()
+    page_buffer = PageBuffer(DEFAULT_PAGE_BUFFER_BUDGET * 1024 * 1024)
 
     def __init__(self, extension):
         """
@@ -200,7 +314,6 @@ class Formatter(Configurable):
 
         self.__cache_dir = os.path.join(self.extension.app.private_folder,
                                         'cache')
-        self.__page_transform = etree.XSLT(XSLT_PAGE_TRANSFORM)
 
     def _make_docstring_formatter(self):  # pylint: disable=no-self-use
         return GtkDocStringFormatter()
@@ -405,9 +518,10 @@ class Formatter(Configurable):
                     if id_node is not None:
                         link.text = ''.join([x for x in id_node.itertext()])
                     else:
-                        warn('bad-local-link',
-                             "Empty anchor link to %s in %s points nowhere" %
-                             (href, page.source_file))
+                        self.__warn(
+                            page, 'bad-local-link',
+                            "Empty anchor link to %s in %s points nowhere" %
+                            (href, page.source_file))
                         link.text = "FIXME broken link to %s" % href
                 link.attrib["href"] = rel_path + href
 
@@ -428,8 +542,8 @@ class Formatter(Configurable):
     def __lookup_asset(self, asset, project, page):
         src = asset.attrib.get('src')
         if not src:
-            warn('no-image-src',
-                 'Empty image source in %s' % page.source_file)
+            self.__warn(page, 'no-image-src',
+                        'Empty image source in %s' % page.source_file)
             return
 
         comps = urllib.parse.urlparse(src)
@@ -447,40 +561,42 @@ class Formatter(Configurable):
                 output_folder = os.path.join(
                     self.get_output_folder(page),
                     os.path.dirname(page.link.ref))
-                project.extra_assets[os.path.join(output_folder, src)] = path
-                asset.attrib['src'] = os.path.join(output_folder, src)
+                dest = os.path.join(output_folder, src)
+                project.extra_assets[dest] = path
+                page.extra_assets[dest] = path
+                asset.attrib['src'] = dest
                 return
 
-        warn('bad-image-src',
-             ('In %s, a local assets refers to an unknown source (%s). '
-              'It should be available in one of these locations: %s') %
-             (page.source_file, src, str(folders)))
+        self.__warn(page, 'bad-image-src',
+                    ('In %s, a local assets refers to an unknown source '
+                     '(%s). It should be available in one of these '
+                     'locations: %s') % (page.source_file, src, str(folders)))
+
+    # pylint: disable=no-self-use
+    def __warn(self, page, code, message):
+        # Replayed when the page is up to date and not written out again
+        page.write_out_warnings.append((code, message))
+        warn(code, message)
 
     def write_out(self, page, xml_subpages, output):
-        """Banana banana
+        """Writes out @page, this may be called from several threads
+        at once.
         """
-        # pylint: disable=missing-docstring
-        def subpages(_):
-            return xml_subpages
-
-        namespace = etree.FunctionNamespace('uri:hotdoc')
-        namespace['subpages'] = subpages
-        html_output = os.path.join(output, 'html')
-
         rel_path = os.path.join(self.get_output_folder(page), page.link.ref)
         cached_path = os.path.join(self.__cache_dir, rel_path)
-        full_path = os.path.join(html_output, rel_path)
+        full_path = self.get_output_path(page, output)
 
-        if not os.path.exists(os.path.dirname(full_path)):
-            os.makedirs(os.path.dirname(full_path))
-        with open(cached_path, 'r', encoding='utf-8') as _:
-            doc_root = etree.HTML(_.read())
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        doc_root = etree.HTML(Formatter.page_buffer.get(cached_path))
 
         self.__validate_html(self.extension.project, page, doc_root)
 
-        self.writing_page_signal(self, page, full_path, doc_root)
+        with Formatter.writing_page_lock:
+            self.writing_page_signal(self, page, full_path, doc_root)
+
+        _WRITE_OUT_STATE.xml_subpages = xml_subpages
+        transformed = str(_get_page_transform()(doc_root))
         with open(full_path, 'w', encoding='utf-8') as _:
-            transformed = str(self.__page_transform(doc_root))
             _.write('<!DOCTYPE html>\n%s' % transformed)
 
     def cache_page(self, page):
@@ -490,9 +606,7 @@ class Formatter(Configurable):
         full_path = os.path.join(self.__cache_dir,
                                  self.get_output_folder(page),
                                  page.link.ref)
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        with open(full_path, 'w', encoding='utf-8') as _:
-            _.write(page.detailed_description)
+        Formatter.page_buffer.put(full_path, page.detailed_description)
 
         page.cached_paths.add(full_path)
 
@@ -500,6 +614,13 @@ class Formatter(Configurable):
     def _get_extension(self):
         return "html"
 
+    def get_output_path(self, page, output):
+        """
+        Returns the path @page will be written out to in @output
+        """
+        return os.path.join(output, 'html', self.get_output_folder(page),
+                            page.link.ref)
+
     def get_output_folder(self, page):
         """
         Banana banana
@@ -1003,6 +1124,12 @@ class Formatter(Configurable):
         group.add_argument("--html-number-headings", action="store_true",
                            dest="html_number_headings",
                            help="Enable html headings numbering")
+        group.add_argument("--html-page-buffer-budget", action="store",
+                           type=int, dest="html_page_buffer_budget",
+                           help="Memory budget in MiB for keeping formatted"
+                           " pages in memory until they are written out,"
+                           " 0 to always go through the on-disk cache",
+                           default=DEFAULT_PAGE_BUFFER_BUDGET)
 
     def __download_theme(self, uri):
         sha = urllib.parse.parse_qs(uri.query).get('sha256')
@@ -1048,6 +1175,10 @@ class Formatter(Configurable):
         """Parse @config to setup @self state."""
         html_theme = config.get('html_theme', 'default')
 
+        Formatter.page_buffer = PageBuffer(config.get(
+            'html_page_buffer_budget',
+            DEFAULT_PAGE_BUFFER_BUDGET) * 1024 * 1024)
+
         if html_theme != 'default':
             uri = urllib.parse.urlparse(html_theme)
             if not uri.scheme:
@@ -37,6 +37,9 @@ class Link:
     Banana banana
     """
     resolving_title_signal = Signal()
+    # {id_: title}, when set the titles resolving_title_signal returns
+    # are memoized in it and only looked up afterwards
+    title_table = None
 
     def __init__(self, ref, title, id_):
         self.ref = None
@@ -49,16 +52,30 @@ class Link:
 
         self.id_ = id_
 
-    @property
-    def title(self):
-        """
-        Banana banana
-        """
+    def __resolve_title(self):
         resolved_title = Link.resolving_title_signal(self)
         resolved_title = [elem for elem in resolved_title if elem is not
                           None]
         if resolved_title:
             return str(resolved_title[0])
+        return None
+
+    @property
+    def title(self):
+        """
+        Banana banana
+        """
+        table = Link.title_table
+        if table is None or self.id_ is None:
+            resolved_title = self.__resolve_title()
+        else:
+            try:
+                resolved_title = table[self.id_]
+            except KeyError:
+                resolved_title = table[self.id_] = self.__resolve_title()
+
+        if resolved_title is not None:
+            return resolved_title
         return self._title
 
     @title.setter
@@ -73,17 +90,30 @@ class Link:
         """
         return self.title
 
+    def __resolve_link(self, link_resolver):
+        res = link_resolver.resolving_link_signal(self)
+        if not res:
+            return None, None
+        if res[1]:
+            return res[0], dict_to_html_attrs(res[1])
+        return res[0], None
+
     def get_link(self, link_resolver):
         """
         Banana banana
         """
-        res = link_resolver.resolving_link_signal(self)
-        if not res:
-            return self.ref, None
-        ref = res[0] or self.ref
-        if res[1]:
-            return ref, dict_to_html_attrs(res[1])
-        return ref, None
+        link_resolver.resolved_links += 1
+        table = link_resolver.link_table
+        if table is None or self.id_ is None:
+            ref, attrs = self.__resolve_link(link_resolver)
+        else:
+            try:
+                ref, attrs = table[self.id_]
+            except KeyError:
+                ref, attrs = table[self.id_] = self.__resolve_link(
+                    link_resolver)
+
+        return ref or self.ref, attrs
 
     def __repr__(self):
         return "Link %s -> %s (%s)" % (self.id_, self.ref, self._title)
@@ -98,6 +128,12 @@ class LinkResolver(object):
         self.__doc_db = database
         self.get_link_signal = Signal()
         self.resolving_link_signal = Signal(optimized=True)
+        # {id_: (ref, attrs)}, when set the results of
+        # resolving_link_signal are memoized in it, see Link.title_table
+        self.link_table = None
+        # Number of links resolved through get_link, lets formatters tell
+        # whether what they rendered depends on link resolution
+        self.resolved_links = 0
 
     # pylint: disable=too-many-return-statements
     def get_named_link(self, name):
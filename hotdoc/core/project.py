@@ -21,7 +21,6 @@ Core of the core.
 """
 import os
 import io
-import re
 import linecache
 import shutil
 
@@ -34,7 +33,7 @@ from hotdoc.core.config import Config
 from hotdoc.core.tree import Tree, PageResolutionResult
 from hotdoc.utils.loggable import info, error
 from hotdoc.utils.configurable import Configurable
-from hotdoc.utils.utils import OrderedSet
+from hotdoc.utils.utils import OrderedSet, get_sanitized_project_name
 from hotdoc.utils.signals import Signal
 from hotdoc.parsers.sitemap import SitemapParser
 
@@ -173,6 +172,8 @@ class Project(Configurable):
             return
 
         self.tree.persist()
+        for extension in self.extensions.values():
+            extension.persist()
         for proj in self.subprojects.values():
             proj.persist()
 
@@ -288,9 +289,8 @@ class Project(Configurable):
         if not self.project_version:
             error('invalid-config', 'No project version was provided')
 
-        self.sanitized_name = '%s-%s' % (re.sub(r'\W+', '-',
-                                                self.project_name),
-                                         self.project_version)
+        self.sanitized_name = get_sanitized_project_name(
+            self.project_name, self.project_version)
 
     # pylint: disable=arguments-differ
     def parse_config(self, config, toplevel=False):
@@ -205,3 +205,20 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(
             cfg.get_path('my_cli_path_argument'),
             os.path.join(invoke_dir, 'elsewhere', 'foo.x'))
+
+    def test_reload(self):
+        conf_file = os.path.join(self.__priv_dir, 'test.json')
+        with open(conf_file, 'w') as _:
+            _.write('{"project_name": "foo", "project_version": "0.1"}\n')
+
+        cfg = Config(command_line_args={'project_version': '0.2'},
+                     conf_file=conf_file)
+
+        with open(conf_file, 'w') as _:
+            _.write('{"project_name": "bar", "project_version": "0.1"}\n')
+
+        self.assertEqual(cfg.get('project_name'), 'foo')
+        ncfg = cfg.reload()
+        self.assertEqual(ncfg.get('project_name'), 'bar')
+        # Command line arguments still override the configuration file
+        self.assertEqual(ncfg.get('project_version'), '0.2')
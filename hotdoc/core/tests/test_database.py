@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+# pylint: disable=no-self-use
+# pylint: disable=too-few-public-methods
+import unittest
+import os
+import shutil
+
+from hotdoc.core.comment import Comment
+from hotdoc.core.database import Database, DATABASE_STORES
+from hotdoc.core.symbols import FunctionSymbol
+
+
+class TestDatabaseStores(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(__file__)
+        self.__priv_dir = os.path.abspath(os.path.join(
+            here, 'tmp-private'))
+        self.__remove_tmp_dirs()
+        os.mkdir(self.__priv_dir)
+
+    def tearDown(self):
+        self.__remove_tmp_dirs()
+
+    def __remove_tmp_dirs(self):
+        shutil.rmtree(self.__priv_dir, ignore_errors=True)
+
+    def __check_roundtrip(self, store_name):
+        database = Database(self.__priv_dir, store_name)
+        database.get_or_create_symbol(
+            FunctionSymbol, unique_name='test-symbol', filename='test_a.x',
+            aliases=['test-alias'])
+        database.add_comment(Comment(name='test-symbol',
+                                     description='A test symbol'))
+        database.persist()
+        database.close()
+
+        database = Database(self.__priv_dir, store_name)
+        sym = database.get_symbol('test-symbol')
+        self.assertEqual(type(sym), FunctionSymbol)
+        self.assertEqual(sym.filename, os.path.abspath('test_a.x'))
+        self.assertEqual(database.get_symbol('test-alias').unique_name,
+                         'test-symbol')
+        self.assertEqual(database.get_comment('test-symbol').description,
+                         'A test symbol')
+        self.assertIsNone(database.get_symbol('no-such-symbol'))
+        self.assertIsNone(database.get_comment('no-such-comment'))
+        database.close()
+
+    def test_all_stores(self):
+        for store_name in DATABASE_STORES:
+            self.__remove_tmp_dirs()
+            os.mkdir(self.__priv_dir)
+            self.__check_roundtrip(store_name)
+
+    def test_sqlite_single_file(self):
+        self.__check_roundtrip('sqlite')
+        self.assertEqual(os.listdir(self.__priv_dir), ['database.sqlite'])
+
+    def test_unmodified_not_rewritten(self):
+        for store_name in DATABASE_STORES:
+            self.__remove_tmp_dirs()
+            os.mkdir(self.__priv_dir)
+            self.__check_roundtrip(store_name)
+
+            database = Database(self.__priv_dir, store_name)
+            self.assertIsNotNone(database.get_symbol('test-symbol'))
+            self.assertIsNotNone(database.get_comment('test-symbol'))
+            self.assertEqual(database.persist(), 0)
+            database.close()
+
+    def test_modified_rewritten(self):
+        self.__check_roundtrip('sqlite')
+
+        database = Database(self.__priv_dir, 'sqlite')
+        sym = database.get_symbol('test-symbol')
+        sym.display_name = 'Test symbol'
+        database.update_symbol(sym)
+        # The symbol and its alias
+        self.assertEqual(database.persist(), 2)
+        database.close()
+
+        database = Database(self.__priv_dir, 'sqlite')
+        self.assertEqual(database.get_symbol('test-symbol').display_name,
+                         'Test symbol')
+        self.assertEqual(database.get_symbol('test-alias').display_name,
+                         'Test symbol')
+        database.close()
+
+    def test_modified_in_place_rewritten(self):
+        self.__check_roundtrip('sqlite')
+
+        database = Database(self.__priv_dir, 'sqlite')
+        sym = database.get_symbol('test-alias')
+        # Not marked as modified
+        sym.display_name = 'Test symbol'
+        self.assertEqual(database.persist(), 1)
+        database.close()
+
+        database = Database(self.__priv_dir, 'sqlite')
+        self.assertEqual(database.get_symbol('test-alias').display_name,
+                         'Test symbol')
+        database.close()
+
+    def test_remove_source(self):
+        for store_name in DATABASE_STORES:
+            self.__remove_tmp_dirs()
+            os.mkdir(self.__priv_dir)
+            self.__check_roundtrip(store_name)
+
+            database = Database(self.__priv_dir, store_name)
+            database.get_or_create_symbol(
+                FunctionSymbol, unique_name='test-moved', filename='test_a.x')
+            database.add_comment(Comment(name='test-symbol-b',
+                                         filename='test_a.x'))
+            database.persist()
+            database.close()
+
+            database = Database(self.__priv_dir, store_name)
+            database.get_or_create_symbol(
+                FunctionSymbol, unique_name='test-moved', filename='test_b.x')
+            database.remove_source('test_a.x')
+            database.persist()
+            database.close()
+
+            database = Database(self.__priv_dir, store_name)
+            self.assertIsNone(database.get_symbol('test-symbol'))
+            self.assertIsNone(database.get_symbol('test-alias'))
+            self.assertIsNone(database.get_comment('test-symbol-b'))
+            # Not listed in test_a.x anymore
+            self.assertEqual(database.get_symbol('test-moved').filename,
+                             os.path.abspath('test_b.x'))
+            database.close()
+
+    def test_removed(self):
+        for store_name in DATABASE_STORES:
+            self.__remove_tmp_dirs()
+            os.mkdir(self.__priv_dir)
+            self.__check_roundtrip(store_name)
+
+            database = Database(self.__priv_dir, store_name)
+            database.remove_symbol('test-symbol')
+            database.remove_comment('test-symbol')
+            self.assertIsNone(database.get_symbol('test-symbol'))
+            database.persist()
+            database.close()
+
+            database = Database(self.__priv_dir, store_name)
+            self.assertIsNone(database.get_symbol('test-symbol'))
+            self.assertIsNone(database.get_symbol('test-alias'))
+            self.assertIsNone(database.get_comment('test-symbol'))
+            database.close()
@@ -93,6 +93,7 @@ class TestTree(unittest.TestCase):
         self.project_name = 'test-project'
         self.sanitized_name = 'test-project-0.1'
         self.incremental = False
+        self.jobs = 1
 
         self.tree = Tree(self, self)
 
@@ -658,6 +659,37 @@ class TestTree(unittest.TestCase):
 
         self.tree.persist()
 
+    def test_unchanged_symbols_not_updated(self):
+        sitemap = self.__create_test_layout()
+        self.tree.resolve_symbols(self.database, self.link_resolver)
+        self.tree.persist()
+        self.database.persist()
+
+        self.incremental = True
+        self.database = Database(self.private_folder)
+        self.link_resolver = LinkResolver(self.database)
+        updated = []
+        self.database.symbol_updated_signal.connect(
+            lambda database, unique_name: updated.append(unique_name))
+
+        # page_x is stale, the symbol it lists resolves as before
+        self.__create_md_file(
+            'page_x.markdown',
+            (u'---\n'
+             'symbols: [symbol_3]\n'
+             '...\n'
+             '# Page X, modified\n'))
+        self.__update_test_layout(sitemap)
+        self.__assert_stale(set(['page_x.markdown']))
+        self.tree.resolve_symbols(self.database, self.link_resolver)
+        self.assertEqual(updated, [])
+
+        # Unlisting it moves it to the generated page of its source
+        self.__create_md_file('page_x.markdown', u'# Page X\n')
+        self.__update_test_layout(sitemap)
+        self.tree.resolve_symbols(self.database, self.link_resolver)
+        self.assertEqual(updated, ['symbol_3'])
+
     def test_index_override_incremental(self):
         sitemap = self.__create_test_layout()
         self.tree.persist()
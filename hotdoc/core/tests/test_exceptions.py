@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+import unittest
+import os
+import shutil
+
+from hotdoc.core.exceptions import (HotdocException, HotdocSourceException,
+                                    dump_exception, load_exception)
+
+
+class TwoArgumentsException(HotdocException):
+    def __init__(self, message, detail):
+        super(TwoArgumentsException, self).__init__(
+            '%s: %s' % (message, detail))
+
+
+class TestExceptions(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(__file__)
+        self.__src_dir = os.path.abspath(os.path.join(here, 'tmp-src-files'))
+        shutil.rmtree(self.__src_dir, ignore_errors=True)
+        os.mkdir(self.__src_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.__src_dir, ignore_errors=True)
+
+    def test_source_exception(self):
+        path = os.path.join(self.__src_dir, 'source.c')
+        with open(path, 'w') as _:
+            _.write('int a;\nint b;\n')
+
+        exc = load_exception(dump_exception(HotdocSourceException(
+            'Bad b', filename=path, lineno=1, column=4)))
+        self.assertEqual(type(exc), HotdocSourceException)
+        self.assertEqual(exc.filename, path)
+        self.assertEqual(exc.lineno, 1)
+        self.assertEqual(exc.column, 4)
+        self.assertIn('Bad b', exc.message)
+
+    def test_unpicklable_exception(self):
+        try:
+            raise TwoArgumentsException('Failed', 'no detail')
+        except HotdocException as exc:
+            data = dump_exception(exc)
+
+        exc = load_exception(data)
+        self.assertEqual(type(exc), HotdocException)
+        self.assertIn('TwoArgumentsException: Failed: no detail',
+                      exc.message)
+        self.assertIn('test_unpicklable_exception', exc.message)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+import unittest
+import os
+import shutil
+
+from hotdoc.core.filesystem import ChangeTracker
+from hotdoc.utils.utils import touch
+
+
+class TestChangeTracker(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(__file__)
+        self.__src_dir = os.path.abspath(os.path.join(here, 'tmp-src-files'))
+        shutil.rmtree(self.__src_dir, ignore_errors=True)
+        os.mkdir(self.__src_dir)
+        self.__files = [self.__create_file(name, name)
+                        for name in ('a', 'b', 'c')]
+
+    def tearDown(self):
+        shutil.rmtree(self.__src_dir, ignore_errors=True)
+
+    def __create_file(self, name, contents):
+        path = os.path.join(self.__src_dir, name)
+        with open(path, 'w') as _:
+            _.write(contents)
+        return path
+
+    def test_mtime(self):
+        tracker = ChangeTracker()
+        stale, unlisted = tracker.get_stale_files(self.__files, 'test')
+        self.assertEqual(set(stale), set(self.__files))
+        self.assertEqual(unlisted, set())
+
+        touch(self.__files[0])
+        stale, unlisted = tracker.get_stale_files(self.__files, 'test')
+        self.assertEqual(list(stale), [self.__files[0]])
+
+    def test_content(self):
+        tracker = ChangeTracker(hash_contents=True)
+        stale, unlisted = tracker.get_stale_files(self.__files, 'test')
+        self.assertEqual(set(stale), set(self.__files))
+        self.assertEqual(unlisted, set())
+
+        # Same contents, new mtime
+        touch(self.__files[0])
+        stale, unlisted = tracker.get_stale_files(self.__files, 'test')
+        self.assertEqual(len(stale), 0)
+
+        # Same size, new contents
+        self.__create_file('b', 'x')
+        stale, unlisted = tracker.get_stale_files(self.__files, 'test')
+        self.assertEqual(list(stale), [self.__files[1]])
+
+        os.unlink(self.__files[2])
+        stale, unlisted = tracker.get_stale_files(self.__files, 'test')
+        self.assertEqual(list(stale), [self.__files[2]])
+        stale, unlisted = tracker.get_stale_files(self.__files[:2], 'test')
+        self.assertEqual(len(stale), 0)
+        self.assertEqual(unlisted, {self.__files[2]})
+
+    def test_content_hard_dependency(self):
+        tracker = ChangeTracker(hash_contents=True)
+        tracker.add_hard_dependency(self.__files[0])
+        touch(self.__files[0])
+        self.assertFalse(tracker.hard_dependencies_are_stale())
+        self.__create_file('a', 'aa')
+        self.assertTrue(tracker.hard_dependencies_are_stale())
+
+    def test_content_many_files(self):
+        files = [self.__create_file('f%d' % i, str(i)) for i in range(64)]
+        tracker = ChangeTracker(hash_contents=True, jobs=4)
+        stale, _ = tracker.get_stale_files(files, 'test')
+        self.assertEqual(len(stale), 64)
+        for path in files:
+            touch(path)
+        stale, _ = tracker.get_stale_files(files, 'test')
+        self.assertEqual(len(stale), 0)
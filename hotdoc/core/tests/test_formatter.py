@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+import unittest
+import os
+import sys
+import shutil
+
+from hotdoc.core.formatter import PageBuffer
+
+
+class TestPageBuffer(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(__file__)
+        self.__cache_dir = os.path.abspath(os.path.join(here, 'tmp-cache'))
+        shutil.rmtree(self.__cache_dir, ignore_errors=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.__cache_dir, ignore_errors=True)
+
+    def __path(self, name):
+        return os.path.join(self.__cache_dir, name)
+
+    def test_buffered(self):
+        buf = PageBuffer(1024)
+        buf.put(self.__path('a.html'), 'aaa')
+        self.assertFalse(os.path.exists(self.__path('a.html')))
+        self.assertEqual(buf.get(self.__path('a.html')), 'aaa')
+        # Persisted for incremental builds once handed out
+        self.assertTrue(os.path.exists(self.__path('a.html')))
+
+    def test_spill(self):
+        buf = PageBuffer(sys.getsizeof('aaa') * 2 - 1)
+        buf.put(self.__path('a.html'), 'aaa')
+        buf.put(self.__path('b.html'), 'bbb')
+        self.assertTrue(os.path.exists(self.__path('a.html')))
+        self.assertFalse(os.path.exists(self.__path('b.html')))
+        self.assertEqual(buf.get(self.__path('a.html')), 'aaa')
+        self.assertEqual(buf.get(self.__path('b.html')), 'bbb')
+
+    def test_non_ascii_budget(self):
+        # Pages are accounted for the memory they use, not their length
+        buf = PageBuffer(sys.getsizeof('a' * 1000) * 2)
+        buf.put(self.__path('a.html'), 'a' * 1000)
+        buf.put(self.__path('b.html'), '\U0001F600' * 1000)
+        self.assertTrue(os.path.exists(self.__path('a.html')))
+        self.assertEqual(buf.get(self.__path('b.html')), '\U0001F600' * 1000)
+
+    def test_no_budget(self):
+        buf = PageBuffer(0)
+        buf.put(self.__path('a.html'), 'aaa')
+        self.assertTrue(os.path.exists(self.__path('a.html')))
+        self.assertEqual(buf.get(self.__path('a.html')), 'aaa')
+
+    def test_flush(self):
+        buf = PageBuffer(1024)
+        buf.put(self.__path('sub/a.html'), 'aaa')
+        buf.flush()
+        with open(self.__path('sub/a.html'), 'r') as _:
+            self.assertEqual(_.read(), 'aaa')
@@ -84,6 +84,48 @@ class TestLinkResolver(unittest.TestCase):
         ref, _ = param.get_type_link().get_link(self.link_resolver)
         self.assertEqual(ref, 'test-struct')
 
+    def test_tables(self):
+        resolved = []
+
+        def resolve_link(link):
+            resolved.append(link.id_)
+            if link.id_ == 'foo':
+                return 'translated.html', {'data-foo': 'bar'}
+            return None
+
+        def resolve_title(link):
+            resolved.append(link.id_)
+            if link.id_ == 'foo':
+                return 'Translated'
+            return None
+
+        foo = Link('foo.html', 'Foo', 'foo')
+        bar = Link('bar.html', 'Bar', 'bar')
+        self.link_resolver.resolving_link_signal.connect(resolve_link)
+        Link.resolving_title_signal.connect(resolve_title)
+        try:
+            self.link_resolver.link_table = {}
+            Link.title_table = {}
+            for _ in range(2):
+                self.assertEqual(foo.get_link(self.link_resolver),
+                                 ('translated.html', 'data-foo="bar"'))
+                self.assertEqual(foo.title, 'Translated')
+                self.assertEqual(bar.get_link(self.link_resolver),
+                                 ('bar.html', None))
+                self.assertEqual(bar.title, 'Bar')
+
+            # Only resolved the first time around
+            self.assertEqual(resolved, ['foo', 'foo', 'bar', 'bar'])
+            self.assertEqual(self.link_resolver.resolved_links, 4)
+
+            self.link_resolver.link_table = None
+            Link.title_table = None
+            self.assertEqual(foo.title, 'Translated')
+            self.assertEqual(len(resolved), 5)
+        finally:
+            Link.resolving_title_signal.disconnect(resolve_title)
+            Link.title_table = None
+
 
 class TestLinkUtils(unittest.TestCase):
     def test_dict_to_html_attrs(self):
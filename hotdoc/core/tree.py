@@ -24,6 +24,9 @@ Implements standalone markdown files parsing.
 import io
 import re
 import os
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 import pickle
 from collections import namedtuple, defaultdict, OrderedDict
@@ -39,7 +42,10 @@ from hotdoc.core.symbols import Symbol, StructSymbol, ClassSymbol,\
     InterfaceSymbol, AliasSymbol
 from hotdoc.core.links import Link
 from hotdoc.core.filesystem import ChangeTracker
-from hotdoc.core.exceptions import HotdocSourceException, InvalidPageMetadata
+from hotdoc.core.exceptions import (
+    HotdocException, HotdocSourceException, InvalidPageMetadata,
+    dump_exception, load_exception)
+from hotdoc.core.formatter import Formatter, PageBuffer
 from hotdoc.core.comment import Comment
 # pylint: disable=no-name-in-module
 from hotdoc.parsers import cmark
@@ -72,6 +78,52 @@ yaml.add_constructor(yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
 OverridePage = namedtuple('OverridePage', ['source_file', 'file'])
 
 
+# The page attributes set when formatting, sent back by formatting workers
+FORMATTED_PAGE_ATTRIBUTES = ('title', 'short_description', 'formatted_contents',
+                             'detailed_description', 'build_path', 'meta')
+
+
+FormattedPage = namedtuple('FormattedPage',
+                           ['attributes', 'output_attrs', 'scripts',
+                            'stylesheets', 'journal', 'exception'])
+
+
+# State inherited by forked formatting workers
+_FORMATTING_STATE = None
+
+
+def _format_page_in_worker(index):
+    tree, pages, link_resolver, output, extensions = _FORMATTING_STATE
+    page = pages[index]
+
+    journal_start = len(Logger.journal)
+    scripts = set(Formatter.all_scripts)
+    stylesheets = set(Formatter.all_stylesheets)
+    exception = None
+
+    try:
+        tree.format_page(page, link_resolver, output, extensions)
+    except HotdocException as exc:
+        exception = dump_exception(exc)
+
+    # The formatted page is cached by the parent process
+    Formatter.page_buffer.clear()
+
+    return FormattedPage(
+        {attr: getattr(page, attr) for attr in FORMATTED_PAGE_ATTRIBUTES},
+        {key: dict(value) for key, value in (page.output_attrs or {}).items()},
+        Formatter.all_scripts - scripts,
+        Formatter.all_stylesheets - stylesheets,
+        Logger.journal[journal_start:],
+        exception)
+
+
+def _init_formatting_worker():
+    # Log entries are replayed in order by the parent process
+    Logger.silent = True
+    Formatter.page_buffer = PageBuffer(float('inf'))
+
+
 class TreeNoSuchPageException(HotdocSourceException):
     """
     Raised when a subpage listed in the sitemap file could not be found
@@ -137,6 +189,10 @@ class Page:
         self.build_path = None
         self.project_name = project_name
         self.cached_paths = OrderedSet()
+        # Assets referenced by the written out page, and the warnings
+        # emitted while writing it out, restored when it is up to date
+        self.extra_assets = {}
+        self.write_out_warnings = []
 
         meta = meta or {}
         self.listed_symbols = []
@@ -196,6 +252,8 @@ class Page:
                 'project_name': self.project_name,
                 'pre_sorted': self.pre_sorted,
                 'cached_paths': self.cached_paths,
+                'extra_assets': self.extra_assets,
+                'write_out_warnings': self.write_out_warnings,
                 'render_subpages': self.render_subpages}
 
     def __repr__(self):
@@ -243,8 +301,13 @@ class Page:
         if self.meta.get("auto-sort", True):
             all_syms = sorted(all_syms, key=lambda x: x.unique_name)
         for sym in all_syms:
+            state = pickle.dumps(sym)
             sym.update_children_comments()
             self.__resolve_symbol(sym, link_resolver, page_path)
+            # Symbols resolved as they were in the previous run need
+            # not be persisted nor signaled again
+            if pickle.dumps(sym) != state:
+                database.update_symbol(sym)
             self.symbol_names.add(sym.unique_name)
 
         # Always put symbols with no parent at the end
@@ -414,6 +477,11 @@ class Tree:
         else:
             self.__all_pages = {}
 
+        # Subpages as listed during the previous run, used to figure out
+        # which pages need to be written out again
+        self.__previous_subpages = {
+            page.source_file: list(page.subpages)
+            for page in self.__all_pages.values()}
         self.__placeholders = {}
         self.root = None
         self.__dep_map = project.dependency_map
@@ -742,8 +810,68 @@ class Tree:
         extension = extensions[page.extension_name]
         extension.format_page(page, link_resolver, output)
 
+    # pylint: disable=no-self-use
+    def __merge_formatted_page(self, page, formatted, output, extensions):
+        for entry in formatted.journal:
+            # pylint: disable=protected-access
+            Logger._log(entry.code, entry.message, entry.level, entry.domain)
+
+        if formatted.exception:
+            raise load_exception(formatted.exception)
+
+        for attr, value in formatted.attributes.items():
+            setattr(page, attr, value)
+
+        page.output_attrs = defaultdict(lambda: defaultdict(dict))
+        for key, value in formatted.output_attrs.items():
+            page.output_attrs[key].update(value)
+
+        Formatter.all_scripts.update(formatted.scripts)
+        Formatter.all_stylesheets.update(formatted.stylesheets)
+
+        if output:
+            extensions[page.extension_name].formatter.cache_page(page)
+
+    def __format_parallel(self, pages, link_resolver, output, extensions):
+        # pylint: disable=global-statement
+        global _FORMATTING_STATE
+
+        indices = [i for i, page in enumerate(pages)
+                   if page.is_stale and
+                   page.source_file not in self.project.subprojects]
+
+        _FORMATTING_STATE = (self, pages, link_resolver, output, extensions)
+        try:
+            with multiprocessing.get_context('fork').Pool(
+                    self.app.jobs, _init_formatting_worker) as pool:
+                results = pool.imap(
+                    _format_page_in_worker, indices,
+                    max(1, len(indices) // (self.app.jobs * 4)))
+
+                # Results are merged in walk order, whichever worker
+                # finished first, so the output is that of a serial run
+                to_merge = set(indices)
+                for i, page in enumerate(pages):
+                    if i in to_merge:
+                        self.__merge_formatted_page(page, next(results),
+                                                    output, extensions)
+                    else:
+                        self.format_page(page, link_resolver, output,
+                                         extensions)
+        finally:
+            _FORMATTING_STATE = None
+
     def format(self, link_resolver, output, extensions):
-        """Banana banana
+        """Formats the pages of the tree.
+
+        If the application was configured with more than one job, the
+        stale pages are formatted in forked worker processes.
+
+        Args:
+            link_resolver: links.LinkResolver, object responsible
+                for resolving links.
+            output: str, path to the output directory.
+            extensions: dict, the extensions of the project, by name.
         """
         info('Formatting documentation tree', 'formatting')
         self.__setup_folder(output)
@@ -754,18 +882,108 @@ class Tree:
 
         self.__extensions = extensions
 
-        for page in self.walk():
-            self.format_page(page, link_resolver, output, extensions)
+        pages = list(self.walk())
+        if self.app.jobs > 1 and \
+                'fork' in multiprocessing.get_all_start_methods():
+            self.__format_parallel(pages, link_resolver, output, extensions)
+        else:
+            for page in pages:
+                self.format_page(page, link_resolver, output, extensions)
 
         self.__extensions = None
         link_resolver.get_link_signal.disconnect(self.__get_link_cb)
 
+    def __get_listed_page(self, pagename):
+        proj = self.project.subprojects.get(pagename)
+        if proj:
+            return proj.tree.root
+        return self.__all_pages[pagename]
+
+    def __needs_write_out(self, page, output):
+        if page.is_stale:
+            return True
+
+        if list(page.subpages) != self.__previous_subpages.get(
+                page.source_file):
+            return True
+
+        # Subpage listings display the title and short description of
+        # the subpages
+        for subpage_name in page.subpages:
+            if self.__get_listed_page(subpage_name).is_stale:
+                return True
+
+        formatter = self.project.extensions[page.extension_name].formatter
+        return not os.path.exists(formatter.get_output_path(page, output))
+
+    def __restore_write_out(self, page):
+        self.project.extra_assets.update(page.extra_assets)
+        for code, message in page.write_out_warnings:
+            warn(code, message)
+
     def write_out(self, output):
-        """Banana banana
+        """Writes out the pages of the tree.
+
+        Pages that are not stale, whose listed subpages did not change
+        and whose output already exists are left untouched.
+
+        If the application was configured with more than one job, pages
+        are written out from a pool of threads, see
+        `Formatter.writing_page_lock`.
+
+        Args:
+            output: str, path to the output directory.
         """
-        for page in self.walk():
-            ext = self.project.extensions[page.extension_name]
-            ext.write_out_page(output, page)
+        n_skipped = 0
+        pool = None
+        errors = []
+
+        if self.app.jobs > 1:
+            pool = ThreadPoolExecutor(self.app.jobs)
+            # Bounds the number of pages in flight, and thus memory usage
+            in_flight = threading.BoundedSemaphore(self.app.jobs * 2)
+
+        def _page_written_out(future):
+            if future.exception():
+                errors.append(future.exception())
+            in_flight.release()
+
+        try:
+            for page in self.walk():
+                if errors:
+                    break
+
+                ext = self.project.extensions[page.extension_name]
+
+                if page.source_file in self.project.subprojects:
+                    ext.write_out_page(output, page)
+                    continue
+
+                if not self.__needs_write_out(page, output):
+                    debug('Not writing out page %s, up to date' %
+                          page.link.ref, 'writing')
+                    self.__restore_write_out(page)
+                    n_skipped += 1
+                    continue
+
+                page.extra_assets = {}
+                page.write_out_warnings = []
+                if pool:
+                    in_flight.acquire()
+                    pool.submit(ext.write_out_page, output,
+                                page).add_done_callback(_page_written_out)
+                else:
+                    ext.write_out_page(output, page)
+        finally:
+            if pool:
+                pool.shutdown(wait=True)
+
+        if errors:
+            raise errors[0]
+
+        if n_skipped:
+            info('%d up to date pages were not written out' % n_skipped,
+                 'writing')
 
     def persist(self):
         """
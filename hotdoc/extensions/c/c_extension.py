@@ -16,7 +16,10 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this library.  If not, see <http://www.gnu.org/licenses/>.
 
-import os, sys, linecache, pkgconfig, glob, subprocess
+import os, sys, linecache, pkgconfig, glob, subprocess, threading
+
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 from hotdoc.extensions.c.clang import cindex
 from ctypes import *
@@ -31,6 +34,10 @@ from hotdoc.core.links import Link
 
 from hotdoc.parsers.gtk_doc import GtkDocParser
 from hotdoc.extensions.c.utils import CCommentExtractor
+from hotdoc.extensions.c.tu_cache import (TranslationUnitCache,
+                                          DEFAULT_TU_CACHE_SIZE)
+from hotdoc.extensions.c.inclusion_cache import CodeSampleCache
+from hotdoc.utils.utils import get_mtime
 
 from hotdoc.utils.loggable import (info as core_info, warn, Logger,
     debug as core_debug)
@@ -68,8 +75,13 @@ CLANG_HEADERS_WARNING = (
 '\'llvm-config --version\' and \'llvm-config --prefix\' commands')
 
 
+def get_clang_version():
+    return subprocess.check_output(['llvm-config', '--version']).strip().decode()
+
+CLANG_VERSION = get_clang_version()
+
 def get_clang_headers():
-    version = subprocess.check_output(['llvm-config', '--version']).strip().decode()
+    version = CLANG_VERSION
     prefix = subprocess.check_output(['llvm-config', '--prefix']).strip().decode()
 
     for lib in ['lib', 'lib64']:
@@ -84,8 +96,34 @@ CLANG_HEADERS = get_clang_headers()
 def get_clang_libdir():
     return subprocess.check_output(['llvm-config', '--libdir']).strip().decode()
 
+
+# How symbols are extracted from a parsed file: "visitor" walks the
+# declarations of the file once, "tokens" annotates every token of the
+# file with its cursor, as was done historically.
+EXTRACTION_MODES = ('visitor', 'tokens')
+
+
+class _CursorSet(object):
+    """
+    cindex cursors define __eq__ but not __hash__, bucket them by their
+    libclang hash instead.
+    """
+    def __init__(self):
+        self.__buckets = {}
+
+    def add(self, cursor):
+        """Returns False if @cursor was already added"""
+        bucket = self.__buckets.setdefault(cursor.hash, [])
+        for other in bucket:
+            if other == cursor:
+                return False
+        bucket.append(cursor)
+        return True
+
+
 class ClangScanner(object):
-    def __init__(self, app, project, doc_db):
+    def __init__(self, app, project, doc_db, tu_cache=None,
+                 extraction='visitor'):
         if not cindex.Config.loaded:
             # Let's try and find clang ourselves first
             clang_libdir = get_clang_libdir()
@@ -97,19 +135,24 @@ class ClangScanner(object):
         self.project = project
         self.__doc_db = doc_db
         self.__all_sources = []
+        self.tu_cache = tu_cache
+        self.extraction = extraction
+        self.__filenames_set = set()
+        self.__visited = _CursorSet()
+        self.__definitions = {}
 
     def scan(self, filenames, options, incremental, full_scan,
-             full_scan_patterns, fail_fast=False, all_sources=None):
+             full_scan_patterns, fail_fast=False, all_sources=None, jobs=1):
         if all_sources is None:
             self.__all_sources = []
         else:
             self.__all_sources = all_sources
 
-        index = cindex.Index.create()
         flags = cindex.TranslationUnit.PARSE_INCOMPLETE | cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
 
         info('scanning %d C source files' % len(filenames))
         self.filenames = filenames
+        self.__filenames_set = set(filenames)
 
         # FIXME: er maybe don't do that ?
         args = ["-Wno-attributes"]
@@ -122,63 +165,203 @@ class ClangScanner(object):
 
         header_guarded = set()
 
-        for filename in self.filenames:
-            if filename in self.parsed:
-                continue
-
-            do_full_scan = any(fnmatch(filename, p) for p in full_scan_patterns)
-            if do_full_scan:
-                debug('scanning %s' % filename)
+        full_scan_filenames = [
+            filename for filename in self.filenames
+            if any(fnmatch(filename, p) for p in full_scan_patterns)]
 
-                tu = index.parse(filename, args=args, options=flags)
+        for filename, tu, diagnostics in self.__parse_translation_units(
+                full_scan_filenames, args, flags, jobs):
+            for diag in diagnostics:
+                warn('clang-diagnostic', 'Clang issue : %s' % diag)
 
-                for diag in tu.diagnostics:
-                    s = diag.format()
-                    warn('clang-diagnostic', 'Clang issue : %s' % str(diag))
+            # Cursors are only valid for the translation unit they come from
+            self.__visited = _CursorSet()
+            self.__definitions = {}
+            if self.extraction == 'visitor':
+                cursors_by_file = self.__get_top_level_cursors(tu)
+            else:
+                cursors_by_file = None
 
-                self.__parse_file (filename, tu, full_scan)
-                if (cindex.conf.lib.clang_isFileMultipleIncludeGuarded(tu, tu.get_file(filename))):
-                    header_guarded.add(filename)
+            self.__parse_file (filename, tu, cursors_by_file)
+            if (cindex.conf.lib.clang_isFileMultipleIncludeGuarded(tu, tu.get_file(filename))):
+                header_guarded.add(filename)
 
-                for include in tu.get_includes():
-                    fname = os.path.abspath(str(include.include))
-                    if (cindex.conf.lib.clang_isFileMultipleIncludeGuarded(tu, tu.get_file(fname))):
-                        if fname in self.filenames:
-                            header_guarded.add(fname)
-                    self.__parse_file (fname, tu, full_scan)
+            for include in tu.get_includes():
+                fname = os.path.abspath(str(include.include))
+                if (cindex.conf.lib.clang_isFileMultipleIncludeGuarded(tu, tu.get_file(fname))):
+                    if fname in self.filenames:
+                        header_guarded.add(fname)
+                self.__parse_file (fname, tu, cursors_by_file)
 
         if not full_scan:
             comment_parser = GtkDocParser(self.project)
             CCommentExtractor(self.__doc_db, comment_parser).parse_comments(
-                filenames)
+                filenames, jobs=jobs)
 
         return True
 
+    def __parse_translation_units(self, filenames, args, flags, jobs):
+        """
+        Yields (filename, translation unit, diagnostics) tuples in the
+        order of @filenames, skipping files that were already parsed as
+        part of a previously yielded translation unit.
+
+        With @jobs > 1, up to twice as many translation units are parsed
+        ahead in a thread pool (libclang releases the GIL while parsing),
+        symbol creation still happens on the consuming thread.
+        """
+        if jobs <= 1:
+            index = cindex.Index.create()
+            for filename in filenames:
+                if filename in self.parsed:
+                    continue
+                debug('scanning %s' % filename)
+                yield (filename,) + self.__parse_translation_unit(
+                    index, filename, args, flags)
+            return
+
+        indexes = threading.local()
+
+        def parse(filename):
+            index = getattr(indexes, 'index', None)
+            if index is None:
+                index = indexes.index = cindex.Index.create()
+            return self.__parse_translation_unit(index, filename, args, flags)
+
+        pending = deque()
+        remaining = iter(filenames)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            while True:
+                while len(pending) < jobs * 2:
+                    filename = next(
+                        (f for f in remaining if f not in self.parsed), None)
+                    if filename is None:
+                        break
+                    debug('scanning %s' % filename)
+                    pending.append((filename, executor.submit(parse, filename)))
+
+                if not pending:
+                    break
+
+                filename, future = pending.popleft()
+                tu, diagnostics = future.result()
+                if filename in self.parsed:
+                    continue
+                yield filename, tu, diagnostics
+
+    def __parse_translation_unit(self, index, filename, args, flags):
+        if self.tu_cache is not None:
+            cached = self.tu_cache.load(index, filename, args)
+            if cached is not None:
+                debug('reusing cached translation unit for %s' % filename)
+                return cached
+
+        tu = index.parse(filename, args=args, options=flags)
+        diagnostics = [str(diag) for diag in tu.diagnostics]
+
+        if self.tu_cache is not None:
+            self.tu_cache.store(tu, filename, args, diagnostics)
+
+        return tu, diagnostics
+
     def set_extension(self, extension):
         self.__doc_db = extension
 
-    def __parse_file (self, filename, tu, full_scan):
+    def __parse_file (self, filename, tu, cursors_by_file):
         if filename in self.parsed:
             return
 
         self.parsed.add (filename)
 
-        if filename not in self.filenames:
+        if filename not in self.__filenames_set:
             return
 
         debug('scanning %s' % filename)
 
-        start = tu.get_location (filename, 0)
-        end = tu.get_location (filename, int(os.path.getsize(filename)))
-        extent = cindex.SourceRange.from_locations (start, end)
-        cursors = self.__get_cursors(tu, extent)
+        if cursors_by_file is None:
+            start = tu.get_location (filename, 0)
+            end = tu.get_location (filename, int(os.path.getsize(filename)))
+            extent = cindex.SourceRange.from_locations (start, end)
+            cursors = self.__get_cursors(tu, extent)
 
-        # Happens with empty source files
-        if cursors is None:
+            # Happens with empty source files
+            if cursors is not None:
+                self.__create_symbols (cursors, tu)
             return
 
-        if filename in self.filenames:
-            self.__create_symbols (cursors, tu)
+        decls, expansions = self.__split_macro_expansions(
+            cursors_by_file.get(filename, []))
+        self.__create_symbols (decls, tu)
+
+        # Declarations produced by macros such as G_DECLARE_FINAL_TYPE are
+        # handled the historical way, for the exact same symbols to be
+        # found for them
+        for expansion in expansions:
+            cursors = self.__get_cursors(tu, expansion.extent)
+            if cursors is not None:
+                self.__create_symbols (cursors, tu)
+
+    def __get_top_level_cursors(self, tu):
+        """
+        Visits the top-level cursors of @tu once, returns the ones located
+        in the files we scan, by filename.
+        """
+        cursors_by_file = defaultdict(list)
+        paths = {}
+        for cursor in tu.cursor.get_children():
+            file_ = cursor.location.file
+            if file_ is None:
+                continue
+
+            name = file_.name
+            path = paths.get(name)
+            if path is None:
+                path = paths[name] = os.path.abspath(name)
+
+            if path in self.__filenames_set:
+                cursors_by_file[path].append(cursor)
+
+        return cursors_by_file
+
+    def __split_macro_expansions(self, cursors):
+        """
+        Returns the declarations in @cursors that do not come from a macro
+        expansion, and the macro expansions that produced declarations.
+        Cursors are visited in source order, expansions come before the
+        declarations they produce.
+        """
+        decls = []
+        expansions = []
+        expansion = None
+        expansion_start = expansion_end = -1
+
+        for cursor in cursors:
+            if cursor.kind == cindex.CursorKind.MACRO_INSTANTIATION:
+                expansion = cursor
+                expansion_start = cursor.extent.start.offset
+                expansion_end = cursor.extent.end.offset
+                continue
+
+            if expansion_start <= cursor.location.offset <= expansion_end:
+                if not expansions or expansions[-1] is not expansion:
+                    expansions.append(expansion)
+                continue
+
+            decls.append(cursor)
+
+        return decls, expansions
+
+    def __get_definition(self, node):
+        # The libclang hash of a type reference is that of the
+        # declaration it refers to, the spelling guards against
+        # collisions
+        key = (node.hash, node.spelling)
+        try:
+            return self.__definitions[key]
+        except KeyError:
+            definition = node.get_definition()
+            self.__definitions[key] = definition
+            return definition
 
     # That's the fastest way of obtaining our ast nodes for a given filename
     def __get_cursors (self, tu, extent):
@@ -207,13 +390,18 @@ class ClangScanner(object):
             # investigate further (fortunately this doesn't seem to
             # significantly impact performance ( ~ 5% )
             if node.kind == cindex.CursorKind.TYPE_REF:
-                node = node.get_definition()
+                node = self.__get_definition(node)
                 if not node:
                     continue
 
-                if not str(node.location.file) in self.filenames:
+                if not str(node.location.file) in self.__filenames_set:
                     continue
 
+            # Many tokens and type references lead to the same cursors,
+            # the historical extraction is left untouched
+            if self.extraction == 'visitor' and not self.__visited.add(node):
+                continue
+
             if node.spelling in self.symbols:
                 continue
 
@@ -564,25 +752,57 @@ class CExtension(Extension):
         Extension.__init__(self, app, project)
         self.project = project
         self.flags = []
+        self.tu_cache_size = DEFAULT_TU_CACHE_SIZE
+        self.tu_cache = None
+        self.extraction = EXTRACTION_MODES[0]
+        self.__code_samples = CodeSampleCache()
+        self.__inclusion_scanner = None
+        self.__scanned_inclusions = {}
+        # Only the connected instance resolves inclusions
+        self.__handles_inclusions = not CExtension.connected
         if not CExtension.connected:
             inclusions.include_signal.connect(self.__include_file_cb)
             CExtension.connected = True
         self.scanner = ClangScanner(self.app, self.project, self)
 
+    def __get_code_samples_path(self):
+        return os.path.join(self.app.private_folder, 'c-code-samples.p')
+
+    def __scan_inclusion(self, include_path):
+        # Only scan each source file once per run, whatever the number
+        # of symbols included from it
+        mtime = get_mtime(include_path)
+        if self.__scanned_inclusions.get(include_path) == mtime:
+            return
+
+        if self.__inclusion_scanner is None:
+            self.__inclusion_scanner = ClangScanner(
+                self.app, self.project, self, tu_cache=self.tu_cache,
+                extraction=self.extraction)
+
+        self.__inclusion_scanner.scan([include_path], self.flags,
+                                      self.app.incremental, True,
+                                      ['*.c', '*.h'])
+        self.__scanned_inclusions[include_path] = mtime
+
     def __include_file_cb(self, include_path, line_ranges, symbol_name):
         if not include_path.endswith(".c") or not symbol_name:
             return None
 
         if not line_ranges:
             line_ranges = [(1, -1)]
+
+        sample = self.__code_samples.get_sample(include_path, symbol_name,
+                                                line_ranges)
+        if sample is not None:
+            return sample
+
         symbol = self.app.database.get_symbol(symbol_name)
         if symbol and symbol.filename != include_path:
             symbol = None
 
         if not symbol:
-            scanner = ClangScanner(self.app, self.project, self)
-            scanner.scan([include_path], self.flags,
-                         self.app.incremental, True, ['*.c', '*.h'])
+            self.__scan_inclusion(include_path)
             symbol = self.app.database.get_symbol(symbol_name)
 
             if not symbol:
@@ -591,6 +811,7 @@ class CExtension(Extension):
                      "%s" % (symbol_name, include_path))
                 return None
 
+        lines = self.__code_samples.get_lines(include_path)
         res = ''
         for n, (start, end) in enumerate(line_ranges):
             if n != 0:
@@ -602,10 +823,11 @@ class CExtension(Extension):
             else:
                 end = symbol.extent_end
 
-            with open(include_path, "r") as _:
-                res += "\n".join(_.read().split("\n")[start:end])
+            res += "\n".join(lines[start:end])
 
         if res:
+            self.__code_samples.set_sample(include_path, symbol_name,
+                                           line_ranges, (res, 'c'))
             return res, 'c'
 
         return None
@@ -619,10 +841,33 @@ class CExtension(Extension):
 
     def setup(self):
         super(CExtension, self).setup()
+        if self.tu_cache_size:
+            self.tu_cache = TranslationUnitCache(
+                os.path.join(self.app.private_folder, 'c-tu-cache'),
+                self.tu_cache_size * 1024 * 1024, CLANG_VERSION)
+            self.scanner.tu_cache = self.tu_cache
+
+        self.scanner.extraction = self.extraction
+        if self.__handles_inclusions and self.app.incremental:
+            self.__code_samples = CodeSampleCache.load(
+                self.__get_code_samples_path())
+
         stale, unlisted = self.get_stale_files(self.sources)
+        for source_file in unlisted:
+            self.app.database.remove_source(source_file)
         self.scanner.scan(stale, self.flags,
                           self.app.incremental, False, ['*.h'],
-                          all_sources=self.sources)
+                          all_sources=self.sources, jobs=self.app.jobs)
+
+        if self.tu_cache is not None:
+            n_evicted = self.tu_cache.evict()
+            if n_evicted:
+                debug('evicted %d cached translation units' % n_evicted)
+
+    def persist(self):
+        super(CExtension, self).persist()
+        if self.__handles_inclusions:
+            self.__code_samples.save(self.__get_code_samples_path())
 
     @staticmethod
     def add_arguments (parser):
@@ -635,9 +880,22 @@ class CExtension(Extension):
                 dest="pkg_config_packages", help="Packages the library depends upon")
         group.add_argument ("--extra-c-flags", action="store", nargs="+",
                 dest="extra_c_flags", help="Extra C flags (-D, -U, ..)")
+        group.add_argument ("--c-tu-cache-size", action="store", type=int,
+                dest="c_tu_cache_size", default=DEFAULT_TU_CACHE_SIZE,
+                help="Size in MiB of the on-disk cache of parsed translation"
+                " units, 0 to disable it")
+        group.add_argument ("--c-symbol-extraction", action="store",
+                dest="c_symbol_extraction", choices=EXTRACTION_MODES,
+                default=EXTRACTION_MODES[0],
+                help="How symbols are extracted from parsed files, \"tokens\""
+                " is slower but kept as a fallback")
 
     def parse_config(self, config):
         super(CExtension, self).parse_config(config)
         self.flags = flags_from_config(config)
+        self.tu_cache_size = config.get('c_tu_cache_size',
+                                        DEFAULT_TU_CACHE_SIZE)
+        self.extraction = config.get('c_symbol_extraction',
+                                     EXTRACTION_MODES[0])
         for dir_ in config.get_paths('c_include_directories') or []:
             self.flags.append('-I%s' % dir_)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Defines CodeSampleCache
+"""
+
+import os
+import pickle
+
+from hotdoc.utils.utils import get_mtime
+
+
+class CodeSampleCache:
+    """
+    Remembers the code samples included from C source files with
+    `{{ file.c#symbol[start:end] }}`, keyed on the path and modification
+    time of the source file, the symbol and the line ranges.
+
+    The lines of the source files are also kept around for the duration
+    of a run, so that a file is read and split only once however many
+    samples are included from it.
+    """
+    def __init__(self):
+        self.__samples = {}
+        self.__lines = {}
+
+    def __getstate__(self):
+        # Only samples from files that did not change since are worth
+        # keeping
+        mtimes = {}
+        samples = {}
+        for key, sample in self.__samples.items():
+            path, mtime = key[0], key[1]
+            if path not in mtimes:
+                mtimes[path] = get_mtime(path)
+            if mtimes[path] == mtime:
+                samples[key] = sample
+        return {'samples': samples}
+
+    def __setstate__(self, state):
+        self.__samples = state['samples']
+        self.__lines = {}
+
+    @staticmethod
+    def load(path):
+        """
+        Returns the cache saved at @path, or an empty one.
+        """
+        try:
+            with open(path, 'rb') as _:
+                return pickle.loads(_.read())
+        except (OSError, EOFError, AttributeError, ImportError,
+                pickle.UnpicklingError):
+            return CodeSampleCache()
+
+    def save(self, path):
+        """
+        Banana banana
+        """
+        with open(path, 'wb') as _:
+            _.write(pickle.dumps(self))
+
+    # pylint: disable=no-self-use
+    def __get_key(self, path, symbol_name, line_ranges):
+        path = os.path.abspath(path)
+        return (path, get_mtime(path), symbol_name,
+                tuple(tuple(line_range) for line_range in line_ranges))
+
+    def get_sample(self, path, symbol_name, line_ranges):
+        """
+        Returns a previously set sample, or None
+        """
+        return self.__samples.get(
+            self.__get_key(path, symbol_name, line_ranges))
+
+    def set_sample(self, path, symbol_name, line_ranges, sample):
+        """
+        Banana banana
+        """
+        self.__samples[self.__get_key(path, symbol_name, line_ranges)] = \
+            sample
+
+    def get_lines(self, path):
+        """
+        Returns the lines of @path, without their line terminators.
+        """
+        path = os.path.abspath(path)
+        mtime = get_mtime(path)
+        cached = self.__lines.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(path, 'r') as _:
+            lines = _.read().split('\n')
+        self.__lines[path] = (mtime, lines)
+        return lines
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from hotdoc.extensions.c.utils import CCommentExtractor
+from hotdoc.parsers.gtk_doc import GtkDocParser
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.comments = []
+
+    def add_comment(self, comment):
+        self.comments.append(comment)
+
+
+class FakeProject:
+    def __init__(self):
+        self.tag_validators = {}
+        self.include_paths = []
+
+
+class FakeApp:
+    def __init__(self):
+        self.database = FakeDatabase()
+
+
+class FakeExtension:
+    def __init__(self):
+        self.app = FakeApp()
+        self.project = FakeProject()
+
+
+SOURCE_TEMPLATE = '''
+/**
+ * test_function_%(n)d:
+ * @param: a parameter
+ *
+ * Function number %(n)d.
+ *
+ * Returns: nothing useful
+ */
+int test_function_%(n)d (int param);
+
+#define TEST_MACRO_%(n)d 42
+'''
+
+
+class TestCCommentExtractor(unittest.TestCase):
+    def setUp(self):
+        self.__tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmp_dir)
+
+    def __parse(self, filenames, jobs):
+        extension = FakeExtension()
+        extractor = CCommentExtractor(extension,
+                                      GtkDocParser(extension.project))
+        extractor.parse_comments(filenames, jobs=jobs)
+        return extension.app.database.comments
+
+    def test_parallel_parse(self):
+        filenames = []
+        for i in range(12):
+            path = os.path.join(self.__tmp_dir, 'test-%d.h' % i)
+            with open(path, 'w') as _:
+                _.write(SOURCE_TEMPLATE % {'n': i})
+            filenames.append(path)
+
+        # An empty file has nothing to decode
+        path = os.path.join(self.__tmp_dir, 'empty.h')
+        open(path, 'w').close()
+        filenames.append(path)
+
+        serial = self.__parse(filenames, 1)
+        parallel = self.__parse(filenames, 4)
+
+        self.assertEqual([c.name for c in serial],
+                         ['test_function_%d' % i for i in range(12)])
+        self.assertEqual(
+            [(c.name, c.filename, c.lineno, c.description) for c in serial],
+            [(c.name, c.filename, c.lineno, c.description)
+             for c in parallel])
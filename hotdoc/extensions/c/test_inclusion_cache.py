@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from hotdoc.extensions.c.inclusion_cache import CodeSampleCache
+
+
+class TestCodeSampleCache(unittest.TestCase):
+    def setUp(self):
+        self.__tmp_dir = tempfile.mkdtemp()
+        self.__cache_path = os.path.join(self.__tmp_dir, 'samples.p')
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmp_dir)
+
+    def __write(self, name, contents, mtime):
+        path = os.path.join(self.__tmp_dir, name)
+        with open(path, 'w') as _:
+            _.write(contents)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_samples(self):
+        path = self.__write('foo.c', 'int foo;\n', 1)
+        cache = CodeSampleCache()
+        self.assertIsNone(cache.get_sample(path, 'foo', [(1, -1)]))
+
+        cache.set_sample(path, 'foo', [(1, -1)], ('int foo;', 'c'))
+        self.assertEqual(cache.get_sample(path, 'foo', [(1, -1)]),
+                         ('int foo;', 'c'))
+        self.assertIsNone(cache.get_sample(path, 'foo', [(1, 2)]))
+        self.assertIsNone(cache.get_sample(path, 'bar', [(1, -1)]))
+
+        self.__write('foo.c', 'int foo;\n', 2)
+        self.assertIsNone(cache.get_sample(path, 'foo', [(1, -1)]))
+
+    def test_persist(self):
+        foo = self.__write('foo.c', 'int foo;\n', 1)
+        bar = self.__write('bar.c', 'int bar;\n', 1)
+        cache = CodeSampleCache()
+        cache.set_sample(foo, 'foo', [(1, -1)], ('int foo;', 'c'))
+        cache.set_sample(bar, 'bar', [(1, -1)], ('int bar;', 'c'))
+        self.__write('bar.c', 'int bar;\n', 2)
+        cache.save(self.__cache_path)
+
+        cache = CodeSampleCache.load(self.__cache_path)
+        self.assertEqual(cache.get_sample(foo, 'foo', [(1, -1)]),
+                         ('int foo;', 'c'))
+
+        # Outdated samples are not saved at all
+        self.__write('bar.c', 'int bar;\n', 1)
+        self.assertIsNone(cache.get_sample(bar, 'bar', [(1, -1)]))
+
+    def test_load_missing(self):
+        cache = CodeSampleCache.load(self.__cache_path)
+        self.assertIsNone(cache.get_sample(self.__cache_path, 'foo', []))
+
+    def test_lines(self):
+        path = self.__write('foo.c', 'int foo;\nint bar;\n', 1)
+        cache = CodeSampleCache()
+        self.assertEqual(cache.get_lines(path), ['int foo;', 'int bar;', ''])
+
+        self.__write('foo.c', 'int baz;\n', 2)
+        self.assertEqual(cache.get_lines(path), ['int baz;', ''])
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+
+from hotdoc.extensions.c.tu_cache import TranslationUnitCache
+
+
+FakeInclude = namedtuple('FakeInclude', ['include'])
+
+
+class FakeTranslationUnit:
+    def __init__(self, includes, contents=b'ast'):
+        self.includes = includes
+        self.contents = contents
+
+    def get_includes(self):
+        return [FakeInclude(include) for include in self.includes]
+
+    def save(self, filename):
+        with open(filename, 'wb') as _:
+            _.write(self.contents)
+
+
+class FakeIndex:
+    def read(self, path):
+        with open(path, 'rb') as _:
+            return FakeTranslationUnit([], _.read())
+
+
+class TestTranslationUnitCache(unittest.TestCase):
+    def setUp(self):
+        self.__tmp_dir = tempfile.mkdtemp()
+        self.__src_dir = os.path.join(self.__tmp_dir, 'src')
+        os.mkdir(self.__src_dir)
+        self.__cache_dir = os.path.join(self.__tmp_dir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmp_dir)
+
+    def __write(self, name, contents):
+        path = os.path.join(self.__src_dir, name)
+        with open(path, 'w') as _:
+            _.write(contents)
+        return path
+
+    def __new_cache(self, max_size=1024 * 1024, version='4.0.0'):
+        return TranslationUnitCache(self.__cache_dir, max_size, version)
+
+    def __store(self, cache, filename, includes, args=None):
+        cache.store(FakeTranslationUnit(includes, b'ast of ' +
+                                        filename.encode()),
+                    filename, args or [], ['a diagnostic'])
+
+    def test_reload(self):
+        header = self.__write('foo.h', 'int foo(void);')
+        cache = self.__new_cache()
+        self.assertIsNone(cache.load(FakeIndex(), header, []))
+        self.__store(cache, header, [])
+
+        tu, diagnostics = self.__new_cache().load(FakeIndex(), header, [])
+        self.assertEqual(tu.contents, b'ast of ' + header.encode())
+        self.assertEqual(diagnostics, ['a diagnostic'])
+
+    def test_key(self):
+        header = self.__write('foo.h', 'int foo(void);')
+        self.__store(self.__new_cache(), header, [], ['-DFOO'])
+
+        cache = self.__new_cache()
+        self.assertIsNotNone(cache.load(FakeIndex(), header, ['-DFOO']))
+        self.assertIsNone(cache.load(FakeIndex(), header, ['-DBAR']))
+        self.assertIsNone(self.__new_cache(version='5.0.0').load(
+            FakeIndex(), header, ['-DFOO']))
+
+        self.__write('foo.h', 'int foo(int bar);')
+        self.assertIsNone(self.__new_cache().load(
+            FakeIndex(), header, ['-DFOO']))
+
+    def test_modified_include(self):
+        included = self.__write('bar.h', 'typedef int bar;')
+        header = self.__write('foo.h', '#include "bar.h"\nbar foo(void);')
+        self.__store(self.__new_cache(), header, [included])
+        self.assertIsNotNone(self.__new_cache().load(FakeIndex(), header, []))
+
+        self.__write('bar.h', 'typedef char bar;')
+        self.assertIsNone(self.__new_cache().load(FakeIndex(), header, []))
+
+    def test_evict(self):
+        headers = [self.__write('foo%d.h' % i, 'int foo%d(void);' % i)
+                   for i in range(3)]
+        cache = self.__new_cache()
+        seen = set()
+        for i, header in enumerate(headers):
+            self.__store(cache, header, [])
+            for name in set(os.listdir(self.__cache_dir)) - seen:
+                os.utime(os.path.join(self.__cache_dir, name), (i, i))
+                seen.add(name)
+
+        entry_size = sum(
+            os.path.getsize(os.path.join(self.__cache_dir, name))
+            for name in seen) // 3
+        cache = self.__new_cache(max_size=entry_size * 2 + 1)
+        self.assertEqual(cache.evict(), 1)
+
+        # The least recently used entry went away
+        self.assertIsNone(cache.load(FakeIndex(), headers[0], []))
+        self.assertIsNotNone(cache.load(FakeIndex(), headers[1], []))
+        self.assertIsNotNone(cache.load(FakeIndex(), headers[2], []))
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Defines TranslationUnitCache
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+
+from hotdoc.core.filesystem import _hash_file
+from hotdoc.extensions.c.clang.cindex import (TranslationUnitLoadError,
+                                              TranslationUnitSaveError)
+from hotdoc.utils.loggable import debug
+
+
+# In MiB
+DEFAULT_TU_CACHE_SIZE = 512
+
+
+class TranslationUnitCache:
+    """
+    Stores serialized clang translation units on disk, so that headers
+    which did not change since the previous run can be reloaded instead
+    of parsed again.
+
+    Entries are keyed on the path and contents of the parsed file, the
+    clang arguments and the clang version. As a translation unit also
+    depends on the files it includes, the digests of those are recorded
+    next to the AST and checked when loading.
+
+    The diagnostics of the original parse are recorded as well, as they
+    are not reliably available from a deserialized translation unit.
+
+    Methods may be called concurrently from multiple parsing threads.
+    """
+    def __init__(self, cache_dir, max_size, clang_version):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.__clang_version = clang_version
+        self.__digests = {}
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def __get_digest(self, filename):
+        # Files are not expected to change during a run, and most
+        # translation units share a lot of headers
+        try:
+            return self.__digests[filename]
+        except KeyError:
+            digest = _hash_file(filename)
+            self.__digests[filename] = digest
+            return digest
+
+    def __get_key(self, filename, args):
+        digest = self.__get_digest(filename)
+        if digest is None:
+            return None
+
+        key = hashlib.sha1()
+        key.update(self.__clang_version.encode())
+        key.update(b'\0' + os.path.abspath(filename).encode())
+        key.update(b'\0' + digest.encode())
+        for arg in args:
+            key.update(b'\0' + arg.encode())
+        return key.hexdigest()
+
+    def __get_paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.ast', base + '.json'
+
+    def load(self, index, filename, args):
+        """
+        Returns a (translation unit, diagnostics) tuple, with diagnostics
+        a list of strings, or None if @filename has no valid entry.
+        """
+        key = self.__get_key(filename, args)
+        if key is None:
+            return None
+
+        ast_path, meta_path = self.__get_paths(key)
+        try:
+            with open(meta_path, 'r') as _:
+                meta = json.load(_)
+        except (OSError, ValueError):
+            return None
+
+        for dep, digest in meta['dependencies'].items():
+            if self.__get_digest(dep) != digest:
+                debug('%s changed, not reusing cached translation unit for %s'
+                      % (dep, filename), domain='c-extension')
+                return None
+
+        try:
+            tu = index.read(ast_path)
+        except TranslationUnitLoadError:
+            self.__remove(key)
+            return None
+
+        # Eviction is least recently used first
+        for path in (ast_path, meta_path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+        return tu, meta['diagnostics']
+
+    def store(self, tu, filename, args, diagnostics):
+        """
+        Serializes @tu, parsed from @filename with @args. Failures to save
+        are not fatal, the unit will simply be parsed again next time.
+        """
+        key = self.__get_key(filename, args)
+        if key is None:
+            return
+
+        dependencies = {}
+        for dep in [filename] + [str(include.include)
+                                 for include in tu.get_includes()]:
+            dep = os.path.abspath(dep)
+            digest = self.__get_digest(dep)
+            if digest is None:
+                return
+            dependencies[dep] = digest
+
+        ast_path, meta_path = self.__get_paths(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            tu.save(tmp_path)
+            os.replace(tmp_path, ast_path)
+        except TranslationUnitSaveError as exc:
+            debug('Could not cache translation unit for %s: %s' %
+                  (filename, exc), domain='c-extension')
+            os.unlink(tmp_path)
+            return
+
+        with open(meta_path, 'w') as _:
+            json.dump({'dependencies': dependencies,
+                       'diagnostics': diagnostics}, _)
+
+    def __remove(self, key):
+        for path in self.__get_paths(key):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in
+        its maximum size, returns the number of removed entries.
+        """
+        entries = {}
+        total_size = 0
+        for name in os.listdir(self.cache_dir):
+            key, ext = os.path.splitext(name)
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            if ext == '.tmp':
+                continue
+
+            size, mtime = entries.get(key, (0, 0))
+            entries[key] = (size + stat.st_size, max(mtime, stat.st_mtime))
+            total_size += stat.st_size
+
+        n_removed = 0
+        for key, (size, _) in sorted(entries.items(),
+                                     key=lambda item: item[1][1]):
+            if total_size <= self.max_size:
+                break
+            self.__remove(key)
+            total_size -= size
+            n_removed += 1
+
+        return n_removed
@@ -1,20 +1,99 @@
+import io
 import os
+import multiprocessing
 from collections import namedtuple
 import cchardet
 from hotdoc.parsers.c_comment_scanner.c_comment_scanner import extract_comments
 
 from hotdoc.core.symbols import *
-from hotdoc.utils.loggable import debug
+from hotdoc.core.exceptions import (HotdocException, dump_exception,
+                                     load_exception)
+from hotdoc.utils.loggable import debug, Logger
 
 
 RawMacro = namedtuple('RawMacro', ['raw', 'filename'])
 
 
+# What a comment parsing worker sends back for a file, journal holds
+# the log entries emitted while parsing, for the parent to replay them
+ParsedCommentFile = namedtuple('ParsedCommentFile',
+                               ['comments', 'raw_macros', 'journal',
+                                'exception'])
+
+
+# Set by the parent process before forking comment parsing workers
+_PARSING_STATE = None
+
+
 def unicode_dammit(data):
-    encoding = cchardet.detect(data)['encoding']
+    # Nothing is detected for empty data
+    encoding = cchardet.detect(data)['encoding'] or 'utf-8'
     return data.decode(encoding, errors='replace')
 
 
+def _extract_file_comments(filename, comment_parser, include_paths):
+    """
+    Returns the comment blocks of @filename parsed with @comment_parser,
+    and its raw macros.
+    """
+    with open(filename, 'rb') as f:
+        debug('Getting comments in %s' % filename)
+        data = unicode_dammit(f.read())
+
+    comments = []
+    raw_macros = []
+    header = filename.endswith('.h')
+    skip_next_symbol = header
+
+    # Only split on \n, as readlines() on the raw data did
+    lines = io.StringIO(data, newline='\n').readlines()
+
+    # FIXME Use the lexer for that!
+    if skip_next_symbol:
+        skip_next_symbol = not any(l.startswith("#pragma once")
+                                   for l in lines)
+
+    cs = extract_comments(data)
+    for c in cs:
+        if c[3]:
+            line = lines[c[1] - 1]
+
+            comment = (len(line) - len(line.lstrip(' '))
+                       ) * ' ' + c[0]
+            block = comment_parser.parse_comment(comment,
+                                                 filename, c[1], c[2], include_paths)
+            if block is not None:
+                comments.append(block)
+        elif not skip_next_symbol:
+            if header:
+                raw_macros.append(RawMacro(c, filename))
+        else:
+            skip_next_symbol = False
+
+    return comments, raw_macros
+
+
+def _parse_comments_in_worker(filename):
+    comment_parser, include_paths = _PARSING_STATE
+    journal_start = len(Logger.journal)
+    comments, raw_macros = [], []
+    exception = None
+
+    try:
+        comments, raw_macros = _extract_file_comments(
+            filename, comment_parser, include_paths)
+    except HotdocException as exc:
+        exception = dump_exception(exc)
+
+    return ParsedCommentFile(comments, raw_macros,
+                             Logger.journal[journal_start:], exception)
+
+
+def _init_parsing_worker():
+    # Log entries are replayed in order by the parent process
+    Logger.silent = True
+
+
 class CCommentExtractor:
     def __init__(self, extension, comment_parser):
         self.extension = extension
@@ -23,37 +102,50 @@ class CCommentExtractor:
         self.__raw_comment_parser = comment_parser
         self.__raw_macros = []
 
-    def parse_comments(self, filenames):
-        for filename in filenames:
-            with open(filename, 'rb') as f:
-                debug('Getting comments in %s' % filename)
-                lines = []
-                header = filename.endswith('.h')
-                skip_next_symbol = header
-                # FIXME Use the lexer for that!
-                for l in f.readlines():
-                    l = unicode_dammit(l)
-                    lines.append(l)
-                    if skip_next_symbol and l.startswith("#pragma once"):
-                        skip_next_symbol = False
-
-                cs = extract_comments(''.join(lines))
-                for c in cs:
-                    if c[3]:
-                        line = lines[c[1] - 1]
-
-                        comment = (len(line) - len(line.lstrip(' '))
-                                   ) * ' ' + c[0]
-                        block = self.__raw_comment_parser.parse_comment(comment,
-                                                                        filename, c[1], c[2], self.project.include_paths)
-                        if block is not None:
-                            self.app.database.add_comment(block)
-                    elif not skip_next_symbol:
-                        if header:
-                            self.__raw_macros.append(RawMacro(c, filename))
-                            # self.__create_macro_from_raw_text(c, filename, filter_names)
-                    else:
-                        skip_next_symbol = False
+    def parse_comments(self, filenames, jobs=1):
+        """
+        Adds the comments found in @filenames to the database, in order.
+
+        With @jobs > 1, files are decoded and their comments parsed in
+        forked worker processes, results are streamed back in the order
+        of @filenames so the database ends up the same as after a serial
+        run. Files are parsed serially where fork is not available.
+        """
+        if jobs <= 1 or len(filenames) < 2 or \
+                'fork' not in multiprocessing.get_all_start_methods():
+            for filename in filenames:
+                comments, raw_macros = _extract_file_comments(
+                    filename, self.__raw_comment_parser,
+                    self.project.include_paths)
+                self.__add_comments(comments, raw_macros)
+            return
+
+        # pylint: disable=global-statement
+        global _PARSING_STATE
+        _PARSING_STATE = (self.__raw_comment_parser,
+                          self.project.include_paths)
+        try:
+            with multiprocessing.get_context('fork').Pool(
+                    jobs, _init_parsing_worker) as pool:
+                for parsed in pool.imap(
+                        _parse_comments_in_worker, filenames,
+                        max(1, len(filenames) // (jobs * 4))):
+                    for entry in parsed.journal:
+                        # pylint: disable=protected-access
+                        Logger._log(entry.code, entry.message, entry.level,
+                                    entry.domain)
+
+                    if parsed.exception:
+                        raise load_exception(parsed.exception)
+
+                    self.__add_comments(parsed.comments, parsed.raw_macros)
+        finally:
+            _PARSING_STATE = None
+
+    def __add_comments(self, comments, raw_macros):
+        for comment in comments:
+            self.app.database.add_comment(comment)
+        self.__raw_macros.extend(raw_macros)
 
     def create_macro_symbols(self, filter_names=None):
         filter_names = filter_names or {}
@@ -171,6 +171,8 @@ class DBusExtension(Extension):
     def setup (self):
         super(DBusExtension, self).setup()
         stale, unlisted = self.get_stale_files(self.sources)
+        for source_file in unlisted:
+            self.app.database.remove_source(source_file)
 
         if not stale:
             return
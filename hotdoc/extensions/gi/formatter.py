@@ -28,6 +28,7 @@ import lxml.etree
 from hotdoc.extensions.gi.fundamentals import FUNDAMENTALS
 from hotdoc.extensions.gi.node_cache import ALL_GI_TYPES, is_introspectable
 from hotdoc.extensions.gi.symbols import GIClassSymbol, GIStructSymbol
+from hotdoc.extensions.gi.utils import OUTPUT_LANGUAGES
 from hotdoc.extensions.gi.annotation_parser import GIAnnotationParser
 
 
@@ -58,38 +59,35 @@ class GIFormatter(Formatter):
         for csym in symbol.get_children_symbols():
             self.__add_attrs(csym, **kwargs)
 
-    def __wrap_in_language(self, symbol, c_doc, python_doc, js_doc):
+    def __wrap_in_language(self, symbol, docs):
         template = self.get_template('symbol_language_wrapper.html')
         res = template.render(
                 {'symbol': symbol,
-                 'c_doc': c_doc,
-                 'python_doc': python_doc,
-                 'js_doc': js_doc})
+                 'c_doc': docs['c'],
+                 'python_doc': docs['python'],
+                 'js_doc': docs['javascript']})
         return res
 
     def _format_symbol (self, symbol):
         if isinstance(symbol, (QualifiedSymbol, FieldSymbol, EnumMemberSymbol)):
             return Formatter._format_symbol(self, symbol)
 
-        self.extension.setup_language('c', None)
-        self.__add_attrs(symbol, language='c')
+        # Children symbols are formatted from within their parent's
+        # language, which is restored afterwards
+        prev_language = self.extension.setup_language(None)
+        docs = {}
+        for language in OUTPUT_LANGUAGES:
+            if language != 'c' and not is_introspectable(symbol.unique_name,
+                                                          language):
+                docs[language] = None
+                continue
 
-        c_out = Formatter._format_symbol(self, symbol)
-        python_out = None
-        js_out = None
+            self.extension.setup_language(language)
+            self.__add_attrs(symbol, language=language)
+            docs[language] = Formatter._format_symbol(self, symbol)
 
-        self.extension.setup_language('python', 'c')
-        if is_introspectable(symbol.unique_name, 'python'):
-            self.__add_attrs(symbol, language='python')
-            python_out = Formatter._format_symbol(self, symbol)
-
-        self.extension.setup_language('javascript', 'python')
-        if is_introspectable(symbol.unique_name, 'javascript'):
-            self.__add_attrs(symbol, language='javascript')
-            js_out = Formatter._format_symbol(self, symbol)
-
-        self.extension.setup_language(None, 'javascript')
-        return self.__wrap_in_language(symbol, c_out, python_out, js_out)
+        self.extension.setup_language(prev_language)
+        return self.__wrap_in_language(symbol, docs)
 
     def _format_flags (self, flags):
         template = self.engine.get_template('gi_flags.html')
@@ -286,7 +284,13 @@ class GIFormatter(Formatter):
         return out
 
     def _format_comment(self, comment, link_resolver):
-        ast = comment.extension_attrs['gi-extension']['ast']
+        attrs = comment.extension_attrs['gi-extension']
+        out = attrs.get('html')
+        if out is not None:
+            return out
+
+        ast = attrs['ast']
+        resolved_links = link_resolver.resolved_links
 
         if not comment.description:
             out = u''
@@ -298,7 +302,12 @@ class GIFormatter(Formatter):
                 comment, link_resolver)
             out = self._docstring_formatter.ast_to_html(
                 ast, link_resolver)
-            comment.extension_attrs['gi-extension']['ast'] = ast
+            attrs['ast'] = ast
+
+        # Only links differ from one language to the next, comments
+        # without any are rendered once for all of them
+        if link_resolver.resolved_links == resolved_links:
+            attrs['html'] = out
 
         return out
 
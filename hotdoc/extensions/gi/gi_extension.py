@@ -47,8 +47,9 @@ from hotdoc.extensions.gi.flags import *
 from hotdoc.extensions.gi.utils import *
 from hotdoc.extensions.gi.node_cache import (
     SMART_FILTERS, make_translations, get_translation, get_klass_parents,
-    get_klass_children, cache_nodes, type_description_from_node,
-    is_introspectable)
+    get_klass_children, cache_gir, type_description_from_node,
+    is_introspectable, add_translations)
+from hotdoc.extensions.gi.gir_cache import GirCache, GirScan, GirScanCache
 from hotdoc.extensions.gi.gtkdoc_links import GTKDOC_HREFS
 from hotdoc.extensions.gi.symbols import GIClassSymbol, GIStructSymbol
 
@@ -72,6 +73,10 @@ ALL_GIRS = {}
 ALIASED_LINKS = {l: {} for l in OUTPUT_LANGUAGES}
 
 
+# Index of each language in the tuples of translated links
+LANGUAGE_INDEXES = {l: i for i, l in enumerate(OUTPUT_LANGUAGES)}
+
+
 DEFAULT_PAGE = "Miscellaneous.default_page"
 
 
@@ -103,6 +108,21 @@ class GIExtension(Extension):
         self.__class_gtype_structs = {}
         self.__default_page = DEFAULT_PAGE
         self.created_symbols = set()
+        self.__gir_scans = GirScanCache()
+        self.__stale_girs = set()
+        self.__gir_roots = {}
+        self.__current_scan = None
+        self.__changed_comments = set()
+        # Language links are translated to, None outside of symbols
+        self.__current_language = None
+        # {id_: ((ref, title) per language)}
+        self.__link_translations = {}
+        # {language: (link table, title table)}, see
+        # LinkResolver.link_table, only installed while formatting pages
+        self.__link_tables = None
+        # {id_: ids of the links aliased to it}, see ALIASED_LINKS
+        self.__aliasing_links = None
+        self.__formatting = False
         self.__raw_comment_parser = GtkDocParser(self.project)
         self.__c_comment_extractor = CCommentExtractor(
             self, self.__raw_comment_parser)
@@ -142,11 +162,30 @@ class GIExtension(Extension):
             self.languages.insert(0, 'c')
         if not self.languages:
             self.languages = OUTPUT_LANGUAGES
+        gir_cache = GirCache(os.path.join(self.app.private_folder,
+                                          'gi-gir-cache'))
+
+        if self.app.incremental:
+            self.__gir_scans = GirScanCache.load(self.__get_gir_scans_path())
+        stale, unlisted = self.get_stale_files(self.sources, prefix='gi-girs')
+        for gir_file in unlisted:
+            self.__gir_scans.remove_scan(gir_file)
+        self.__stale_girs = {gir_file for gir_file in self.sources
+                             if gir_file in stale or
+                             self.__gir_scans.get_scan(gir_file) is None}
+
+        # GIRs that will be scanned are only parsed once, here
         for gir_file in self.sources:
-            gir_root = etree.parse(gir_file).getroot()
-            cache_nodes(gir_root, ALL_GIRS)
+            gir_root = None
+            if gir_file in self.__stale_girs:
+                gir_root = self.__get_gir_root(gir_file)
+            cache_gir(gir_file, ALL_GIRS, gir_cache, gir_root)
 
     def __formatting_page(self, formatter, page):
+        # Symbols are resolved by now, the link tables are then only
+        # cleared if some symbol changes
+        if self.__link_tables is None:
+            self.__create_link_tables()
         if ALL_GIRS:
             page.meta['extra']['gi-languages'] = ['c', 'python', 'javascript']
 
@@ -161,7 +200,7 @@ class GIExtension(Extension):
         super(GIExtension, self).setup()
 
         self.app.link_resolver.resolving_link_signal.connect_after(
-            self.__translate_link_ref, 'default')
+            self.__translate_link_ref)
         if not self.sources:
             return
 
@@ -171,13 +210,20 @@ class GIExtension(Extension):
 
     def format_page(self, page, link_resolver, output):
         link_resolver.get_link_signal.connect(self.search_online_links)
+        Link.resolving_title_signal.connect(self.__translate_link_title)
+        if self.__link_tables is None:
+            self.__create_link_tables()
+        self.__formatting = True
+        self.__install_link_tables()
 
-        prev_l = None
         page.meta['extra']['gi-languages'] = ','.join(self.languages)
         page.meta['extra']['gi-language'] = 'c'
         Extension.format_page(self, page, link_resolver, output)
         page.meta['extra']['gi-language'] = self.languages[0]
 
+        self.__formatting = False
+        self.__install_link_tables()
+        Link.resolving_title_signal.disconnect(self.__translate_link_title)
         link_resolver.get_link_signal.disconnect(self.search_online_links)
 
     def write_out_page(self, output, page):
@@ -185,6 +231,10 @@ class GIExtension(Extension):
         page.meta['extra']['gi-language'] = 'c'
         Extension.write_out_page(self, output, page)
 
+    def persist(self):
+        super(GIExtension, self).persist()
+        self.__gir_scans.save(self.__get_gir_scans_path())
+
     def get_or_create_symbol(self, *args, **kwargs):
         args = list(args)
         node = None
@@ -193,7 +243,7 @@ class GIExtension(Extension):
         aliases = kwargs.get('aliases', [])
 
         unique_name = kwargs.get('unique_name', kwargs.get('display_name'))
-        comment = self.app.database.get_comment(unique_name)
+        comment = self.__get_comment(unique_name)
         if comment:
             if 'attributes' in comment.annotations:
                 if comment.annotations['attributes'].argument.get('doc.skip') is not None:
@@ -214,11 +264,16 @@ class GIExtension(Extension):
 
         if res:
             self.created_symbols.add(res.unique_name)
+            if self.__current_scan:
+                self.__current_scan.symbols.add(res.unique_name)
 
         if node is not None and res:
-            make_translations(res.unique_name, node)
+            translations = None
+            if self.__current_scan:
+                translations = self.__current_scan.translations
+            make_translations(res.unique_name, node, translations)
             for alias in aliases:
-                make_translations(alias, node)
+                make_translations(alias, node, translations)
 
         return res
 
@@ -267,11 +322,39 @@ class GIExtension(Extension):
 
     # setup-time private methods
 
+    def __get_gir_scans_path(self):
+        return os.path.join(self.app.private_folder,
+                            'gi-scans-%s.p' % self.project.sanitized_name)
+
+    def __get_gir_root(self, gir_file):
+        root = self.__gir_roots.get(gir_file)
+        if root is None:
+            root = etree.parse(gir_file).getroot()
+            self.__gir_roots[gir_file] = root
+        return root
+
+    @staticmethod
+    def __summarize_comment(comment):
+        # What symbols created from a GIR depend on in a comment
+        if not comment:
+            return None, False
+        attributes = comment.annotations.get('attributes')
+        skipped = attributes is not None and \
+            attributes.argument.get('doc.skip') is not None
+        return comment.filename, skipped
+
+    def __get_comment(self, name):
+        comment = self.app.database.get_comment(name)
+        if self.__current_scan:
+            self.__current_scan.comments[name] = \
+                self.__summarize_comment(comment)
+        return comment
+
     def __get_symbol_filename(self, unique_name):
         if self.__current_output_filename:
             return self.__current_output_filename
 
-        comment = self.app.database.get_comment(unique_name)
+        comment = self.__get_comment(unique_name)
         if comment and comment.filename:
             return '%s.h' % os.path.splitext(comment.filename)[0]
 
@@ -599,19 +682,14 @@ class GIExtension(Extension):
         ns = klass_node.getparent()
         gtype_struct = klass_node.attrib.get(glib_ns('type-struct'))
 
-        klass_comment = self.app.database.get_comment('%s%s' %
-                                                      (ns.attrib['name'], gtype_struct))
+        klass_comment_name = '%s%s' % (ns.attrib['name'], gtype_struct)
 
         unique_name, name, klass_name = get_symbol_names(node)
 
-        # Virtual methods are documented in the class comment
-        if klass_comment:
-            param_comment = klass_comment.params.get(name)
-            if (param_comment):
-                self.app.database.add_comment(
-                    Comment(name=unique_name,
-                            meta={'description': param_comment.description},
-                            annotations=param_comment.annotations))
+        self.__add_vfunc_comment(unique_name, klass_comment_name, name)
+        if self.__current_scan:
+            self.__current_scan.vfunc_comments.append(
+                (unique_name, klass_comment_name, name))
 
         parameters, retval = self.__create_parameters_and_retval(node)
         symbol = self.get_or_create_symbol(VFunctionSymbol, node,
@@ -627,6 +705,18 @@ class GIExtension(Extension):
 
         return symbol
 
+    def __add_vfunc_comment(self, unique_name, klass_comment_name, name):
+        klass_comment = self.app.database.get_comment(klass_comment_name)
+
+        # Virtual methods are documented in the class comment
+        if klass_comment:
+            param_comment = klass_comment.params.get(name)
+            if (param_comment):
+                self.app.database.add_comment(
+                    Comment(name=unique_name,
+                            meta={'description': param_comment.description},
+                            annotations=param_comment.annotations))
+
     def __create_alias_symbol(self, node, gi_name, parent_name):
         name = get_symbol_names(node)[0]
 
@@ -641,9 +731,14 @@ class GIExtension(Extension):
             if fund_type:
                 # The alias name is now conciderd as a FUNDAMENTAL type.
                 FUNDAMENTALS[lang][name] = fund_type
+                if self.__current_scan:
+                    self.__current_scan.fundamentals[lang][name] = fund_type
             else:
                 if alias_link:
                     ALIASED_LINKS[lang][name] = alias_link[0]
+                    if self.__current_scan:
+                        self.__current_scan.aliased_links[lang][name] = \
+                            alias_link[0]
 
         return self.get_or_create_symbol(AliasSymbol, node,
                                          aliased_type=aliased_type,
@@ -651,6 +746,11 @@ class GIExtension(Extension):
                                          filename=filename,
                                          parent_name=parent_name)
 
+    def __add_class_struct(self, name, klass_symbol):
+        self.__class_gtype_structs[name] = klass_symbol
+        if self.__current_scan and klass_symbol:
+            self.__current_scan.class_structs[name] = klass_symbol.unique_name
+
     def __create_structure(self, symbol_type, node, gi_name):
         if node.attrib.get(glib_ns('fundamental')) == '1':
             self.debug('%s is a fundamental type, not an actual '
@@ -677,7 +777,7 @@ class GIExtension(Extension):
                                              filename)
             class_struct = node.attrib.get(glib_ns('type-struct'))
             if class_struct:
-                self.__class_gtype_structs[class_struct] = res
+                self.__add_class_struct(class_struct, res)
         elif symbol_type == GIStructSymbol:
             # If we are working with a Class structure,
             class_symbol = self.__class_gtype_structs.get(node.attrib['name'])
@@ -686,7 +786,7 @@ class GIExtension(Extension):
 
                 # Class struct should never be renderer on their own,
                 # smart_key will lookup the value in that dict
-                self.__class_gtype_structs[unique_name] = class_symbol
+                self.__add_class_struct(unique_name, class_symbol)
             res = self.__create_struct_symbol(node, unique_name, filename,
                                               class_symbol.unique_name if class_symbol else None)
 
@@ -696,7 +796,7 @@ class GIExtension(Extension):
             res = self.__create_interface_symbol(node, unique_name, filename)
             class_struct = node.attrib.get(glib_ns('type-struct'))
             if class_struct:
-                self.__class_gtype_structs[class_struct] = res
+                self.__add_class_struct(class_struct, res)
 
         for cnode in node:
             if cnode.tag in [core_ns('record'), core_ns('union')]:
@@ -793,7 +893,18 @@ class GIExtension(Extension):
         self.app.database.add_comment(block)
 
         stale_c, unlisted = self.get_stale_files(self.c_sources)
-        self.__c_comment_extractor.parse_comments(stale_c)
+        # Symbols come from the GIRs, only the comments go away
+        for source_file in unlisted:
+            self.app.database.remove_source(source_file, symbols=False)
+        self.app.database.comment_updated_signal.connect(
+            self.__comment_updated_cb)
+        self.__c_comment_extractor.parse_comments(stale_c,
+                                                   jobs=self.app.jobs)
+        self.app.database.comment_updated_signal.disconnect(
+            self.__comment_updated_cb)
+
+    def __comment_updated_cb(self, database, comment):
+        self.__changed_comments.add(comment.name)
 
     def __create_macro_symbols(self):
         self.__c_comment_extractor.create_macro_symbols(SMART_FILTERS)
@@ -832,10 +943,51 @@ class GIExtension(Extension):
             for cnode in node:
                 self.__scan_node(cnode)
 
+    def __scan_is_stale(self, scan):
+        for name in scan.comments.keys() & self.__changed_comments:
+            comment = self.app.database.get_comment(name)
+            if self.__summarize_comment(comment) != scan.comments[name]:
+                return True
+        return False
+
+    def __restore_scan(self, scan):
+        self.created_symbols |= scan.symbols
+        add_translations(scan.translations)
+        for lang in OUTPUT_LANGUAGES:
+            FUNDAMENTALS[lang].update(scan.fundamentals[lang])
+            ALIASED_LINKS[lang].update(scan.aliased_links[lang])
+        for name, klass_name in scan.class_structs.items():
+            self.__class_gtype_structs[name] = \
+                self.app.database.get_symbol(klass_name)
+        for unique_name, klass_comment_name, name in scan.vfunc_comments:
+            if klass_comment_name in self.__changed_comments:
+                self.__add_vfunc_comment(unique_name, klass_comment_name,
+                                         name)
+
     def __scan_sources(self):
+        # GIRs which did not change are not scanned again, unless a
+        # comment changed where one of their symbols goes
         for gir_file in self.sources:
-            root = etree.parse(gir_file).getroot()
-            self.__scan_node(root)
+            if gir_file in self.__stale_girs:
+                continue
+
+            scan = self.__gir_scans.get_scan(gir_file)
+            if self.__scan_is_stale(scan):
+                self.__stale_girs.add(gir_file)
+            else:
+                self.debug('Reusing the symbols of %s' % gir_file)
+                self.__restore_scan(scan)
+
+        for gir_file in self.sources:
+            if gir_file not in self.__stale_girs:
+                continue
+
+            self.__current_scan = GirScan()
+            self.__scan_node(self.__get_gir_root(gir_file))
+            add_translations(self.__current_scan.translations)
+            self.__gir_scans.set_scan(gir_file, self.__current_scan)
+            self.__current_scan = None
+            del self.__gir_roots[gir_file]
 
     # Format-time private methods
     def __translate_ref(self, link, language):
@@ -864,11 +1016,13 @@ class GIExtension(Extension):
             return fund._title
 
         if language != 'c' and not is_introspectable(link.id_, language):
+            if link._title is None:
+                return None
             return link._title + ' (not introspectable)'
 
         aliased_link = ALIASED_LINKS[language].get(link.id_)
         if aliased_link:
-            return self.__translate_link_title(aliased_link, language)
+            return self.__translate_title(aliased_link, language)
 
         translated = get_translation(link.id_, language)
         if translated:
@@ -879,46 +1033,89 @@ class GIExtension(Extension):
 
         return None
 
-    def __translate_link_ref(self, link, language):
-        if language == 'default':
-            actual_language = 'c'
+    def __create_link_tables(self):
+        self.__link_translations = {}
+        self.__link_tables = {l: ({}, {}) for l in [None] + OUTPUT_LANGUAGES}
+        self.__aliasing_links = defaultdict(set)
+        for aliased_links in ALIASED_LINKS.values():
+            for name, link in aliased_links.items():
+                self.__aliasing_links[link.id_].add(name)
+        self.app.database.symbol_updated_signal.connect(
+            self.__symbol_updated_cb)
+
+    def __symbol_updated_cb(self, database, unique_name):
+        # Translations also depend on the symbols links are aliased to
+        stale = set()
+        names = [unique_name] + database.get_aliases(unique_name)
+        while names:
+            name = names.pop()
+            if name not in stale:
+                stale.add(name)
+                names.extend(self.__aliasing_links.get(name, ()))
+
+        # Removed in place as the tables might be installed
+        for name in stale:
+            self.__link_translations.pop(name, None)
+            for link_table, title_table in self.__link_tables.values():
+                link_table.pop(name, None)
+                title_table.pop(name, None)
+
+    def __install_link_tables(self):
+        if self.__formatting:
+            link_table, title_table = self.__link_tables[
+                self.__current_language]
         else:
-            actual_language = language
+            link_table = title_table = None
+
+        self.app.link_resolver.link_table = link_table
+        Link.title_table = title_table
+
+    def __get_link_translations(self, link):
+        translations = self.__link_translations.get(link.id_)
+        if translations is None:
+            translations = tuple(
+                (self.__translate_ref(link, language),
+                 self.__translate_title(link, language))
+                for language in OUTPUT_LANGUAGES)
+            # Not memoized before the symbols are resolved
+            if self.__link_tables is not None and link.id_ is not None:
+                self.__link_translations[link.id_] = translations
+        return translations
+
+    def __translate_link_ref(self, link):
+        translations = self.__get_link_translations(link)
+
+        if self.__current_language is not None:
+            ref = translations[LANGUAGE_INDEXES[self.__current_language]][0]
+            if ref is None:
+                return None
+            return ref, {}
 
-        ref = self.__translate_ref(link, actual_language)
+        ref = translations[LANGUAGE_INDEXES['c']][0]
         if ref is None:
             return None
 
-        extra_attrs = {}
-        if language == 'default':
-            extra_attrs['data-gi-href-python'] = self.__translate_ref(
-                link, 'python') or ref
-            extra_attrs['data-gi-href-javascript'] = self.__translate_ref(
-                link, 'javascript') or ref
-            extra_attrs['data-gi-title-python'] = self.__translate_title(
-                link, 'python')
-            extra_attrs['data-gi-title-javascript'] = self.__translate_title(
-                link, 'javascript')
+        python_ref, python_title = translations[LANGUAGE_INDEXES['python']]
+        js_ref, js_title = translations[LANGUAGE_INDEXES['javascript']]
+        extra_attrs = {'data-gi-href-python': python_ref or ref,
+                       'data-gi-href-javascript': js_ref or ref,
+                       'data-gi-title-python': python_title,
+                       'data-gi-title-javascript': js_title}
         return ref, extra_attrs
 
-    def __translate_link_title(self, link, language):
-        return self.__translate_title(link, language)
+    def __translate_link_title(self, link):
+        if self.__current_language is None:
+            return None
 
-    def setup_language(self, language, prev_l):
-        if prev_l:
-            Link.resolving_title_signal.disconnect(self.__translate_link_title,
-                                                   prev_l)
-            self.app.link_resolver.resolving_link_signal.disconnect(
-                self.__translate_link_ref, prev_l)
-        else:
-            self.app.link_resolver.resolving_link_signal.disconnect(
-                self.__translate_link_ref, 'default')
-
-        if language is not None:
-            Link.resolving_title_signal.connect(self.__translate_link_title,
-                                                language)
-            self.app.link_resolver.resolving_link_signal.connect(
-                self.__translate_link_ref, language)
-        else:
-            self.app.link_resolver.resolving_link_signal.connect_after(
-                self.__translate_link_ref, 'default')
+        translations = self.__get_link_translations(link)
+        return translations[LANGUAGE_INDEXES[self.__current_language]][1]
+
+    def setup_language(self, language):
+        """
+        Sets the language links are translated to, None for the
+        default translation, and returns the previous one.
+        """
+        prev_language = self.__current_language
+        self.__current_language = language
+        self.__install_link_tables()
+        return prev_language
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Defines GirCache and GirScanCache
+"""
+
+import os
+import pickle
+import hashlib
+import tempfile
+
+from hotdoc.core.filesystem import _hash_file
+from hotdoc.extensions.gi.utils import OUTPUT_LANGUAGES
+from hotdoc.utils.loggable import debug
+
+
+# Bumped whenever what is derived from a GIR changes
+GIR_CACHE_VERSION = 1
+
+
+class GirCache:
+    """
+    Stores the tables derived from GIR files on disk, so that GIRs which
+    did not change since the previous run, such as the large system
+    GIRs every project includes, are not parsed again.
+
+    There is one entry per GIR path, it records the digest of the GIR
+    contents it was derived from and is only used if it still matches.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def __get_path(self, gir_file):
+        key = hashlib.sha1(os.path.abspath(gir_file).encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + '.p')
+
+    def load(self, gir_file):
+        """
+        Returns the tables stored for @gir_file and its digest, the
+        tables are None if @gir_file changed since they were stored.
+        """
+        digest = _hash_file(gir_file)
+        try:
+            with open(self.__get_path(gir_file), 'rb') as _:
+                version, cached_digest, tables = pickle.loads(_.read())
+        except (OSError, EOFError, ValueError, AttributeError, ImportError,
+                pickle.UnpicklingError):
+            version = cached_digest = tables = None
+
+        if (version != GIR_CACHE_VERSION or digest is None or
+                cached_digest != digest):
+            self.misses += 1
+            return None, digest
+
+        debug('Reusing cached tables for %s' % gir_file, 'gi-extension')
+        self.hits += 1
+        return tables, digest
+
+    def store(self, gir_file, digest, tables):
+        """
+        Stores the @tables derived from @gir_file, whose contents had
+        @digest
+        """
+        if digest is None:
+            return
+
+        # Written to a temporary file first, so that concurrent builds
+        # sharing a private folder never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as _:
+            _.write(pickle.dumps((GIR_CACHE_VERSION, digest, tables),
+                                 pickle.HIGHEST_PROTOCOL))
+        os.replace(tmp_path, self.__get_path(gir_file))
+
+
+class GirScan:
+    """
+    What scanning a GIR of the documented project contributed, besides
+    the symbols persisted in the database, so that it can be restored
+    in the next run instead of scanning the GIR again.
+    """
+    def __init__(self):
+        # Unique names of the created symbols
+        self.symbols = set()
+        # {language: {unique_name: title}}, see node_cache.make_translations
+        self.translations = {l: {} for l in OUTPUT_LANGUAGES}
+        # {language: {alias name: Link or fundamental}}
+        self.aliased_links = {l: {} for l in OUTPUT_LANGUAGES}
+        self.fundamentals = {l: {} for l in OUTPUT_LANGUAGES}
+        # {class structure name: unique name of its class symbol}
+        self.class_structs = {}
+        # {name: (filename, skipped)} of the comments that determined
+        # where symbols land, or whether they were created at all
+        self.comments = {}
+        # [(unique_name, class comment name, parameter name)] of the
+        # virtual methods, documented in the comment of their class
+        self.vfunc_comments = []
+
+
+class GirScanCache:
+    """
+    Remembers the GirScan of each GIR of a project from one run to the
+    next, a GIR only needs scanning again if it changed, or if one of
+    the comments its scan depends on changed.
+    """
+    def __init__(self):
+        self.__scans = {}
+
+    @staticmethod
+    def load(path):
+        """
+        Returns the cache saved at @path, or an empty one.
+        """
+        try:
+            with open(path, 'rb') as _:
+                return pickle.loads(_.read())
+        except (OSError, EOFError, AttributeError, ImportError,
+                pickle.UnpicklingError):
+            return GirScanCache()
+
+    def save(self, path):
+        """
+        Banana banana
+        """
+        with open(path, 'wb') as _:
+            _.write(pickle.dumps(self))
+
+    def get_scan(self, gir_file):
+        """
+        Returns the GirScan stored for @gir_file, or None
+        """
+        return self.__scans.get(gir_file)
+
+    def set_scan(self, gir_file, scan):
+        """
+        Banana banana
+        """
+        self.__scans[gir_file] = scan
+
+    def remove_scan(self, gir_file):
+        """
+        Banana banana
+        """
+        self.__scans.pop(gir_file, None)
@@ -1,5 +1,5 @@
 import os
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from lxml import etree
 import networkx as nx
 from hotdoc.core.symbols import QualifiedSymbol
@@ -13,21 +13,30 @@ Logger.register_warning_code('missing-gir-include', BadInclusionException,
                              'gi-extension')
 
 
+# What cache_nodes derives from a single GIR, independently from the
+# others: translations maps languages to {unique_name: title}, hierarchy
+# is a list of (parent, child) edges and includes a list of
+# (name, version) tuples
+GirTables = namedtuple('GirTables', ['translations', 'gi_types',
+                                     'smart_filters', 'hierarchy',
+                                     'includes'])
+
+
 '''
 Names of boilerplate GObject macros we don't want to expose
 '''
 SMART_FILTERS = set()
 
 
-def __generate_smart_filters(id_prefixes, sym_prefixes, node):
-    sym_prefix = node.attrib['{%s}symbol-prefix' % NS_MAP['c']]
-    SMART_FILTERS.add(('%s_IS_%s' % (sym_prefixes, sym_prefix)).upper())
-    SMART_FILTERS.add(('%s_TYPE_%s' % (sym_prefixes, sym_prefix)).upper())
-    SMART_FILTERS.add(('%s_%s' % (sym_prefixes, sym_prefix)).upper())
-    SMART_FILTERS.add(('%s_%s_CLASS' % (sym_prefixes, sym_prefix)).upper())
-    SMART_FILTERS.add(('%s_IS_%s_CLASS' % (sym_prefixes, sym_prefix)).upper())
-    SMART_FILTERS.add(('%s_%s_GET_CLASS' % (sym_prefixes, sym_prefix)).upper())
-    SMART_FILTERS.add(('%s_%s_GET_IFACE' % (sym_prefixes, sym_prefix)).upper())
+def _generate_smart_filters(id_prefixes, sym_prefixes, attrib, smart_filters):
+    sym_prefix = attrib['{%s}symbol-prefix' % NS_MAP['c']]
+    smart_filters.add(('%s_IS_%s' % (sym_prefixes, sym_prefix)).upper())
+    smart_filters.add(('%s_TYPE_%s' % (sym_prefixes, sym_prefix)).upper())
+    smart_filters.add(('%s_%s' % (sym_prefixes, sym_prefix)).upper())
+    smart_filters.add(('%s_%s_CLASS' % (sym_prefixes, sym_prefix)).upper())
+    smart_filters.add(('%s_IS_%s_CLASS' % (sym_prefixes, sym_prefix)).upper())
+    smart_filters.add(('%s_%s_GET_CLASS' % (sym_prefixes, sym_prefix)).upper())
+    smart_filters.add(('%s_%s_GET_IFACE' % (sym_prefixes, sym_prefix)).upper())
 
 
 __HIERARCHY_GRAPH = nx.DiGraph()
@@ -73,63 +82,77 @@ def get_field_c_name(node):
     return '.'.join(components)
 
 
-def make_translations(unique_name, node):
-    '''
-    Compute and store the title that should be displayed
-    when linking to a given unique_name, eg in python
-    when linking to test_greeter_greet() we want to display
-    Test.Greeter.greet
-    '''
-    introspectable = not node.attrib.get('introspectable') == '0'
+def _store_translations(unique_name, tag, attrib, gi_components,
+                         field_components, translations):
+    introspectable = not attrib.get('introspectable') == '0'
 
-    if node.tag == core_ns('member'):
-        __TRANSLATED_NAMES['c'][unique_name] = unique_name
+    if tag == core_ns('member'):
+        translations['c'][unique_name] = unique_name
         if introspectable:
-            components = get_gi_name_components(node)
+            components = list(gi_components)
             components[-1] = components[-1].upper()
             gi_name = '.'.join(components)
-            __TRANSLATED_NAMES['python'][unique_name] = gi_name
-            __TRANSLATED_NAMES['javascript'][unique_name] = gi_name
-    elif c_ns('identifier') in node.attrib:
-        __TRANSLATED_NAMES['c'][unique_name] = unique_name
+            translations['python'][unique_name] = gi_name
+            translations['javascript'][unique_name] = gi_name
+    elif c_ns('identifier') in attrib:
+        translations['c'][unique_name] = unique_name
         if introspectable:
-            components = get_gi_name_components(node)
+            components = list(gi_components)
             gi_name = '.'.join(components)
-            __TRANSLATED_NAMES['python'][unique_name] = gi_name
+            translations['python'][unique_name] = gi_name
             components[-1] = 'prototype.%s' % components[-1]
-            __TRANSLATED_NAMES['javascript'][unique_name] = '.'.join(components)
-    elif c_ns('type') in node.attrib:
-        components = get_gi_name_components(node)
-        gi_name = '.'.join(components)
-        __TRANSLATED_NAMES['c'][unique_name] = unique_name
+            translations['javascript'][unique_name] = '.'.join(components)
+    elif c_ns('type') in attrib:
+        gi_name = '.'.join(gi_components)
+        translations['c'][unique_name] = unique_name
         if introspectable:
-            __TRANSLATED_NAMES['javascript'][unique_name] = gi_name
-            __TRANSLATED_NAMES['python'][unique_name] = gi_name
-    elif node.tag == core_ns('field'):
-        components = []
-        get_field_c_name_components(node, components)
-        display_name = '.'.join(components[1:])
-        __TRANSLATED_NAMES['c'][unique_name] = display_name
+            translations['javascript'][unique_name] = gi_name
+            translations['python'][unique_name] = gi_name
+    elif tag == core_ns('field'):
+        display_name = '.'.join(field_components[1:])
+        translations['c'][unique_name] = display_name
         if introspectable:
-            __TRANSLATED_NAMES['javascript'][unique_name] = display_name
-            __TRANSLATED_NAMES['python'][unique_name] = display_name
-    elif node.tag == core_ns('virtual-method'):
-        display_name = node.attrib['name']
-        __TRANSLATED_NAMES['c'][unique_name] = display_name
+            translations['javascript'][unique_name] = display_name
+            translations['python'][unique_name] = display_name
+    elif tag == core_ns('virtual-method'):
+        display_name = attrib['name']
+        translations['c'][unique_name] = display_name
         if introspectable:
-            __TRANSLATED_NAMES['javascript'][unique_name] = 'vfunc_%s' % display_name
-            __TRANSLATED_NAMES['python'][unique_name] = 'do_%s' % display_name
-    elif node.tag == core_ns('property'):
-        display_name = node.attrib['name']
-        __TRANSLATED_NAMES['c'][unique_name] = display_name
+            translations['javascript'][unique_name] = 'vfunc_%s' % display_name
+            translations['python'][unique_name] = 'do_%s' % display_name
+    elif tag == core_ns('property'):
+        display_name = attrib['name']
+        translations['c'][unique_name] = display_name
         if introspectable:
-            __TRANSLATED_NAMES['javascript'][unique_name] = display_name
-            __TRANSLATED_NAMES['python'][unique_name] = display_name.replace('-', '_')
+            translations['javascript'][unique_name] = display_name
+            translations['python'][unique_name] = display_name.replace('-', '_')
     else:
-        __TRANSLATED_NAMES['c'][unique_name] = node.attrib.get('name')
+        translations['c'][unique_name] = attrib.get('name')
         if introspectable:
-            __TRANSLATED_NAMES['python'][unique_name] = node.attrib.get('name')
-            __TRANSLATED_NAMES['javascript'][unique_name] = node.attrib.get('name')
+            translations['python'][unique_name] = attrib.get('name')
+            translations['javascript'][unique_name] = attrib.get('name')
+
+
+def make_translations(unique_name, node, translations=None):
+    '''
+    Compute and store the title that should be displayed
+    when linking to a given unique_name, eg in python
+    when linking to test_greeter_greet() we want to display
+    Test.Greeter.greet
+
+    Titles are stored in translations if passed, in the global
+    tables otherwise
+    '''
+    if translations is None:
+        translations = __TRANSLATED_NAMES
+
+    field_components = []
+    if node.tag == core_ns('field'):
+        get_field_c_name_components(node, field_components)
+
+    _store_translations(unique_name, node.tag, node.attrib,
+                        get_gi_name_components(node), field_components,
+                        translations)
 
 
 def get_translation(unique_name, language):
@@ -139,15 +162,15 @@ def get_translation(unique_name, language):
     return __TRANSLATED_NAMES[language].get(unique_name)
 
 
-def __update_hierarchies(cur_ns, node, gi_name):
-    parent_name = node.attrib.get('parent')
+def _update_hierarchies(cur_ns, attrib, gi_name, hierarchy):
+    parent_name = attrib.get('parent')
     if not parent_name:
         return
 
     if not '.' in parent_name:
         parent_name = '%s.%s' % (cur_ns, parent_name)
 
-    __HIERARCHY_GRAPH.add_edge(parent_name, gi_name)
+    hierarchy.append((parent_name, gi_name))
 
 
 def __get_parent_link_recurse(gi_name, res):
@@ -190,64 +213,227 @@ def get_klass_children(gi_name):
     return res
 
 
-def cache_nodes(gir_root, all_girs):
+class GirIndexer:
     '''
-    Identify and store all the gir symbols the symbols we will document
-    may link to, or be typed with
+    Parser target computing the GirTables of a gir in a single pass over
+    its elements, without building its tree
+    '''
+    # Kinds of nodes titles are stored for, in the order the titles are
+    # merged: when several nodes store a title for the same unique_name,
+    # the last kind wins, then the last node in document order
+    (IDENTIFIERS, TYPES, FIELDS, PROPERTIES, SIGNALS,
+     VIRTUAL_METHODS) = range(6)
+
+    NS_TAG = core_ns('namespace')
+    INCLUDE_TAG = core_ns('include')
+    ID_KEY = c_ns('identifier')
+    TYPE_KEY = c_ns('type')
+    TYPE_NAME_KEY = '{%s}type-name' % NS_MAP['glib']
+    STRUCT_FOR_KEY = '{%s}is-gtype-struct-for' % NS_MAP['glib']
+    TYPELESS_TAGS = (core_ns('type'), core_ns('array'))
+    KLASS_TAGS = (core_ns('class'), core_ns('interface'))
+    FIELD_TAG = core_ns('field')
+    PROPERTY_TAG = core_ns('property')
+    SIGNAL_TAG = glib_ns('signal')
+    VIRTUAL_METHOD_TAG = core_ns('virtual-method')
+    MEMBER_TAGS = (FIELD_TAG, PROPERTY_TAG, SIGNAL_TAG, VIRTUAL_METHOD_TAG)
+
+    def __init__(self):
+        self.__passes = [{l: {} for l in OUTPUT_LANGUAGES}
+                         for _ in range(self.VIRTUAL_METHODS + 1)]
+        self.__gi_types = {}
+        self.__smart_filters = set()
+        self.__hierarchy = []
+        self.__includes = []
+        self.__ns_attrib = None
+
+        # (ordinal of the parent, class name): c:type of its class
+        # structure, which usually comes after the class and its
+        # virtual methods
+        self.__klass_structures = {}
+        # ((ordinal of the namespace, class name), name, titles)
+        self.__virtual_methods = []
+
+        # (tag, attrib, ordinal) of the open elements, outermost first
+        self.__stack = []
+        self.__ordinal = 0
+
+    def __get_gi_name_components(self):
+        # get_gi_name_components for the innermost open element
+        _, attrib, _ = self.__stack[-1]
+        components = [attrib['name']] if 'name' in attrib else []
+        for i in range(len(self.__stack) - 2, -1, -1):
+            _, attrib, _ = self.__stack[i]
+            if 'name' not in attrib:
+                break
+            components.insert(0, attrib['name'])
+        return components
+
+    def __get_field_c_name_components(self):
+        # get_field_c_name_components for the innermost open element
+        components = []
+        for i in range(len(self.__stack) - 1, 0, -1):
+            _, attrib, _ = self.__stack[i]
+            component = attrib.get(self.TYPE_KEY, attrib.get('name'))
+            if component:
+                components.insert(0, component)
+            if self.__stack[i - 1][0] == self.NS_TAG:
+                break
+        return components
+
+    def __get_klass_name(self, attrib):
+        # get_klass_name, from the attributes of the class
+        return (attrib.get(self.TYPE_KEY) or
+                attrib.get(self.TYPE_NAME_KEY))
+
+    def start(self, tag, attrib):
+        '''
+        Banana banana
+        '''
+        stack = self.__stack
+        self.__ordinal += 1
+        stack.append((tag, attrib, self.__ordinal))
+
+        if len(stack) == 1:
+            return
+
+        if len(stack) == 2:
+            if tag == self.NS_TAG and self.__ns_attrib is None:
+                self.__ns_attrib = attrib
+            elif tag == self.INCLUDE_TAG:
+                self.__includes.append((attrib['name'], attrib['version']))
+
+        if self.STRUCT_FOR_KEY in attrib:
+            self.__klass_structures.setdefault(
+                (stack[-2][2], attrib[self.STRUCT_FOR_KEY]),
+                attrib.get(self.TYPE_KEY))
+
+        # Most elements, such as parameters, types and docs, need no title
+        has_id = self.ID_KEY in attrib
+        has_type = self.TYPE_KEY in attrib and tag not in self.TYPELESS_TAGS
+        if not (has_id or has_type or tag in self.MEMBER_TAGS):
+            return
+
+        gi_components = self.__get_gi_name_components()
+        if tag == self.FIELD_TAG:
+            field_components = self.__get_field_c_name_components()
+        else:
+            field_components = []
+
+        def store(unique_name, kind, translations=None):
+            if translations is None:
+                translations = self.__passes[kind]
+            _store_translations(unique_name, tag, attrib, gi_components,
+                                field_components, translations)
+
+        if has_id:
+            store(attrib[self.ID_KEY], self.IDENTIFIERS)
+
+        if has_type:
+            name = attrib[self.TYPE_KEY]
+            store(name, self.TYPES)
+            gi_name = '.'.join(gi_components)
+            self.__gi_types[gi_name] = self.__get_klass_name(attrib)
+            if tag in self.KLASS_TAGS:
+                ns_attrib = self.__ns_attrib
+                _update_hierarchies(ns_attrib.get('name'), attrib, gi_name,
+                                    self.__hierarchy)
+                store('%s::%s' % (name, name), self.TYPES)
+                _generate_smart_filters(
+                    ns_attrib['{%s}identifier-prefixes' % NS_MAP['c']],
+                    ns_attrib['{%s}symbol-prefixes' % NS_MAP['c']],
+                    attrib, self.__smart_filters)
+
+        if tag == self.FIELD_TAG:
+            store('.'.join(field_components), self.FIELDS)
+        elif tag == self.PROPERTY_TAG:
+            store('%s:%s' % (self.__get_klass_name(stack[-2][1]),
+                             attrib['name']), self.PROPERTIES)
+        elif tag == self.SIGNAL_TAG:
+            store('%s::%s' % (self.__get_klass_name(stack[-2][1]),
+                              attrib['name']), self.SIGNALS)
+        elif tag == self.VIRTUAL_METHOD_TAG:
+            # The unique name depends on the class structure, store the
+            # titles under a placeholder until it is known
+            titles = {l: {} for l in OUTPUT_LANGUAGES}
+            store(None, self.VIRTUAL_METHODS, titles)
+            self.__virtual_methods.append(
+                ((stack[-3][2], stack[-2][1]['name']), attrib['name'],
+                 titles))
+
+    def end(self, tag):
+        '''
+        Banana banana
+        '''
+        self.__stack.pop()
+
+    def close(self):
+        '''
+        Returns the GirTables of the indexed gir
+        '''
+        vmethod_translations = self.__passes[self.VIRTUAL_METHODS]
+        for key, name, titles in self.__virtual_methods:
+            unique_name = '%s::%s' % (self.__klass_structures[key], name)
+            for language, title in titles.items():
+                if None in title:
+                    vmethod_translations[language][unique_name] = title[None]
+
+        translations = {l: {} for l in OUTPUT_LANGUAGES}
+        for pass_translations in self.__passes:
+            for language, titles in pass_translations.items():
+                translations[language].update(titles)
+
+        return GirTables(translations, self.__gi_types, self.__smart_filters,
+                         self.__hierarchy, self.__includes)
+
+
+def extract_tables(gir_root):
+    '''
+    Returns the GirTables of gir_root, which do not depend on any
+    other gir and can thus be cached
+    '''
+    indexer = GirIndexer()
+    for event, node in etree.iterwalk(gir_root, events=('start', 'end')):
+        # Comments and processing instructions
+        if not isinstance(node.tag, str):
+            continue
+        if event == 'start':
+            indexer.start(node.tag, node.attrib)
+        else:
+            indexer.end(node.tag)
+    return indexer.close()
+
+
+def extract_file_tables(gir_file):
+    '''
+    Like extract_tables, for the gir at gir_file, which is indexed while
+    it is read and never held in memory
+    '''
+    parser = etree.XMLParser(target=GirIndexer())
+    with open(gir_file, 'rb') as _:
+        for chunk in iter(lambda: _.read(65536), b''):
+            parser.feed(chunk)
+    return parser.close()
+
+
+def add_translations(translations):
+    '''
+    Store in the global tables the titles make_translations
+    computed in translations
     '''
-    ns_node = gir_root.find('./{%s}namespace' % NS_MAP['core'])
-    id_prefixes = ns_node.attrib['{%s}identifier-prefixes' % NS_MAP['c']]
-    sym_prefixes = ns_node.attrib['{%s}symbol-prefixes' % NS_MAP['c']]
-
-    id_key = '{%s}identifier' % NS_MAP['c']
-    for node in gir_root.xpath(
-            './/*[@c:identifier]',
-            namespaces=NS_MAP):
-        make_translations (node.attrib[id_key], node)
-
-    id_type = c_ns('type')
-    class_tag = core_ns('class')
-    interface_tag = core_ns('interface')
-    for node in gir_root.xpath(
-            './/*[not(self::core:type) and not (self::core:array)][@c:type]',
-            namespaces=NS_MAP):
-        name = node.attrib[id_type]
-        make_translations (name, node)
-        gi_name = '.'.join(get_gi_name_components(node))
-        ALL_GI_TYPES[gi_name] = get_klass_name(node)
-        if node.tag in (class_tag, interface_tag):
-            __update_hierarchies (ns_node.attrib.get('name'), node, gi_name)
-            make_translations('%s::%s' % (name, name), node)
-            __generate_smart_filters(id_prefixes, sym_prefixes, node)
-
-    for field in gir_root.xpath('.//self::core:field', namespaces=NS_MAP):
-        unique_name = get_field_c_name(field)
-        make_translations(unique_name, field)
-
-    for node in gir_root.xpath(
-            './/core:property',
-            namespaces=NS_MAP):
-        name = '%s:%s' % (get_klass_name(node.getparent()),
-                          node.attrib['name'])
-        make_translations (name, node)
-
-    for node in gir_root.xpath(
-            './/glib:signal',
-            namespaces=NS_MAP):
-        name = '%s::%s' % (get_klass_name(node.getparent()),
-                           node.attrib['name'])
-        make_translations (name, node)
-
-    for node in gir_root.xpath(
-            './/core:virtual-method',
-            namespaces=NS_MAP):
-        name = get_symbol_names(node)[0]
-        make_translations (name, node)
-
-    for inc in gir_root.findall('./core:include',
-            namespaces = NS_MAP):
-        inc_name = inc.attrib["name"]
-        inc_version = inc.attrib["version"]
+    for language, titles in translations.items():
+        __TRANSLATED_NAMES[language].update(titles)
+
+
+def __merge_tables(tables):
+    add_translations(tables.translations)
+    ALL_GI_TYPES.update(tables.gi_types)
+    SMART_FILTERS.update(tables.smart_filters)
+    __HIERARCHY_GRAPH.add_edges_from(tables.hierarchy)
+
+
+def __cache_includes(tables, all_girs, gir_cache):
+    for inc_name, inc_version in tables.includes:
         gir_file = __find_gir_file('%s-%s.gir' % (inc_name, inc_version), all_girs)
         if not gir_file:
             warn('missing-gir-include', "Couldn't find a gir for %s-%s.gir" %
@@ -257,9 +443,41 @@ def cache_nodes(gir_root, all_girs):
         if gir_file in __PARSED_GIRS:
             continue
 
-        __PARSED_GIRS.add(gir_file)
-        inc_gir_root = etree.parse(gir_file).getroot()
-        cache_nodes(inc_gir_root, all_girs)
+        cache_gir(gir_file, all_girs, gir_cache)
+
+
+def cache_nodes(gir_root, all_girs, gir_cache=None):
+    '''
+    Identify and store all the gir symbols the symbols we will document
+    may link to, or be typed with
+    '''
+    tables = extract_tables(gir_root)
+    __merge_tables(tables)
+    __cache_includes(tables, all_girs, gir_cache)
+
+
+def cache_gir(gir_file, all_girs, gir_cache=None, gir_root=None):
+    '''
+    Like cache_nodes, for the gir at gir_file, which is only parsed
+    if gir_cache has no up to date tables for it, and not at all if
+    the caller already parsed it as gir_root
+    '''
+    __PARSED_GIRS.add(gir_file)
+
+    tables = digest = None
+    if gir_cache is not None:
+        tables, digest = gir_cache.load(gir_file)
+
+    if tables is None:
+        if gir_root is not None:
+            tables = extract_tables(gir_root)
+        else:
+            tables = extract_file_tables(gir_file)
+        if gir_cache is not None:
+            gir_cache.store(gir_file, digest, tables)
+
+    __merge_tables(tables)
+    __cache_includes(tables, all_girs, gir_cache)
 
 
 def __type_tokens_from_gitype (cur_ns, ptype_name):
@@ -1,8 +1,22 @@
+import os
+import shutil
+import tempfile
 import unittest
 import importlib
+import lxml.html
 from lxml import etree
 CACHE_MODULE = importlib.import_module('hotdoc.extensions.gi.node_cache')
+from hotdoc.extensions.gi.gir_cache import GirCache, GirScan, GirScanCache
 from hotdoc.extensions.gi.utils import core_ns, unnest_type
+from hotdoc.extensions.gi.gi_extension import GIExtension
+from hotdoc.extensions.gi.utils import OUTPUT_LANGUAGES
+from hotdoc.core.config import Config
+from hotdoc.core.database import Database
+from hotdoc.core.links import Link, LinkResolver
+from hotdoc.core.project import CoreExtension
+from hotdoc.parsers.sitemap import SitemapParser
+from hotdoc.tests.fixtures import HotdocTest
+from hotdoc.utils.utils import OrderedSet
 
 GIR_TEMPLATE = \
 '''
@@ -150,3 +164,360 @@ class TestNodeCaching(unittest.TestCase):
         self.assertEqual(type_desc.gi_name, 'utf8')
         self.assertEqual(type_desc.c_name, 'gchar***')
         self.assertEqual(type_desc.nesting_depth, 2)
+
+    def test_file_tables(self):
+        gir_file = os.path.join(os.path.dirname(__file__), 'test_sources',
+                                'test', 'Test-1.0.gir')
+        tables = CACHE_MODULE.extract_file_tables(gir_file)
+        self.assertEqual(
+            tables, CACHE_MODULE.extract_tables(etree.parse(gir_file).getroot()))
+
+        # The class structure is only defined after the virtual methods
+        translations = tables.translations
+        self.assertEqual(translations['python']['TestGreeterClass::do_nothing'],
+                         'do_do_nothing')
+        self.assertNotIn('TestGreeterClass::do_greet', translations['python'])
+        self.assertEqual(translations['c']['TestGreeterClass.parent_class'],
+                         'parent_class')
+        self.assertEqual(translations['javascript']['TestGreeter::greeted'],
+                         'greeted')
+
+
+class TestGirCache(unittest.TestCase):
+    def setUp(self):
+        importlib.reload(CACHE_MODULE)
+        self.__tmp_dir = tempfile.mkdtemp()
+        self.__gir_file = os.path.join(self.__tmp_dir, 'Test-1.0.gir')
+        with open(self.__gir_file, 'w') as _:
+            _.write(GIR_TEMPLATE % TEST_GREETER_GREET)
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmp_dir)
+
+    def __cache_gir(self):
+        importlib.reload(CACHE_MODULE)
+        gir_cache = GirCache(os.path.join(self.__tmp_dir, 'cache'))
+        CACHE_MODULE.cache_gir(self.__gir_file, {}, gir_cache)
+        self.assertEqual(
+            CACHE_MODULE.get_translation('test_greeter_greet', 'python'),
+            'Test.greet')
+        return gir_cache
+
+    def test_reuse(self):
+        gir_cache = self.__cache_gir()
+        self.assertEqual((gir_cache.hits, gir_cache.misses), (0, 1))
+
+        gir_cache = self.__cache_gir()
+        self.assertEqual((gir_cache.hits, gir_cache.misses), (1, 0))
+
+        with open(self.__gir_file, 'a') as _:
+            _.write('\n')
+        gir_cache = self.__cache_gir()
+        self.assertEqual((gir_cache.hits, gir_cache.misses), (0, 1))
+
+    def test_roundtrip(self):
+        root = etree.parse(self.__gir_file).getroot()
+        tables = CACHE_MODULE.extract_tables(root)
+        gir_cache = GirCache(os.path.join(self.__tmp_dir, 'cache'))
+        self.assertEqual(gir_cache.load(self.__gir_file)[0], None)
+
+        _, digest = gir_cache.load(self.__gir_file)
+        gir_cache.store(self.__gir_file, digest, tables)
+        self.assertEqual(gir_cache.load(self.__gir_file), (tables, digest))
+        self.assertEqual(tables.includes, [('GObject', '2.0')])
+
+    def test_scans(self):
+        path = os.path.join(self.__tmp_dir, 'gi-scans.p')
+        scans = GirScanCache.load(path)
+        self.assertIsNone(scans.get_scan(self.__gir_file))
+
+        scan = GirScan()
+        scan.symbols.add('test_greeter_greet')
+        scan.translations['python']['test_greeter_greet'] = 'Test.greet'
+        scan.comments['test_greeter_greet'] = ('test-greeter.c', False)
+        scans.set_scan(self.__gir_file, scan)
+        scans.save(path)
+
+        scan = GirScanCache.load(path).get_scan(self.__gir_file)
+        self.assertEqual(scan.symbols, {'test_greeter_greet'})
+        self.assertEqual(scan.translations['python'],
+                         {'test_greeter_greet': 'Test.greet'})
+        self.assertEqual(scan.comments,
+                         {'test_greeter_greet': ('test-greeter.c', False)})
+
+        scans.remove_scan(self.__gir_file)
+        self.assertIsNone(scans.get_scan(self.__gir_file))
+
+
+TEST_GREETER_CLASS = \
+'''
+<class name="Greeter"
+       c:symbol-prefix="greeter"
+       c:type="TestGreeter"
+       glib:type-name="TestGreeter"
+       glib:get-type="test_greeter_get_type"
+       glib:type-struct="GreeterClass">
+  <virtual-method name="do_nothing">
+    <return-value transfer-ownership="none">
+      <type name="none" c:type="void"/>
+    </return-value>
+    <parameters>
+      <instance-parameter name="greeter" transfer-ownership="none">
+        <type name="Greeter" c:type="TestGreeter*"/>
+      </instance-parameter>
+    </parameters>
+  </virtual-method>
+  %s
+</class>
+<record name="GreeterClass"
+        c:type="TestGreeterClass"
+        glib:is-gtype-struct-for="Greeter">
+  <field name="parent_class" readable="0" private="1">
+    <type name="GObject.ObjectClass" c:type="GObjectClass"/>
+  </field>
+</record>
+''' % TEST_GREETER_GREET
+
+TEST_GREETER_COMMENT = \
+'''
+/**
+ * TestGreeter:
+ *
+ * Greets with test_greeter_greet().
+ */
+'''
+
+TEST_GREETER_CLASS_COMMENT = \
+'''
+/**
+ * TestGreeterClass:
+ * @do_nothing: %s
+ */
+'''
+
+TEST_GREETER_GREET_COMMENT = \
+'''
+/**
+ * test_greeter_greet:%s
+ *
+ * Greets.
+ */
+'''
+
+
+class GIExtensionTest(HotdocTest):
+    def setUp(self):
+        super(GIExtensionTest, self).setUp()
+        self.project_name = 'test'
+        self.include_paths = []
+        self.tag_validators = {}
+        self.subprojects = {}
+        self.extensions = {}
+        self.is_toplevel = True
+        self.updated_symbols = set()
+        self.gir_file = self._create_src_file(
+            'Test-1.0.gir', [GIR_TEMPLATE % TEST_GREETER_CLASS])
+        self._create_c_file('test-greeter.c', TEST_GREETER_COMMENT,
+                            TEST_GREETER_CLASS_COMMENT % 'Does nothing.',
+                            TEST_GREETER_GREET_COMMENT % '')
+        self._create_c_file('test-other-file.c')
+
+    def get_page_for_symbol(self, unique_name):
+        return self.dependency_map.get(unique_name)
+
+    def get_private_folder(self):
+        return self.private_folder
+
+    def get_generated_doc_folder(self):
+        return os.path.join(self.private_folder, 'generated')
+
+    def get_base_doc_folder(self):
+        return self._md_dir
+
+    def _create_c_file(self, name, *comments):
+        return self._create_src_file(name, comments)
+
+    def __symbol_updated_cb(self, database, unique_name):
+        self.updated_symbols.add(unique_name)
+
+    def _setup_extension(self):
+        importlib.reload(CACHE_MODULE)
+        self.database = Database(self.private_folder)
+        self.link_resolver = LinkResolver(self.database)
+        self.updated_symbols = set()
+        self.database.symbol_updated_signal.connect(self.__symbol_updated_cb)
+
+        ext = GIExtension(self, self)
+        self.extensions = {ext.extension_name: ext}
+        config = Config(command_line_args={
+            'gi_sources': [self.gir_file],
+            'gi_c_sources': [os.path.join(self._src_dir, '*.c')],
+            'gi_smart_index': True})
+        ext.parse_toplevel_config(config)
+        ext.parse_config(config)
+        ext.setup()
+
+        return ext
+
+    def _persist(self, ext):
+        ext.persist()
+        self.database.persist()
+        self.incremental = True
+
+
+class TestGirScans(GIExtensionTest):
+    def __setup_extension(self):
+        ext = self._setup_extension()
+        self._persist(ext)
+        return ext
+
+    def test_unchanged_gir_restored(self):
+        ext = self.__setup_extension()
+        self.assertIn('test_greeter_greet', self.updated_symbols)
+        created_symbols = ext.created_symbols
+
+        ext = self.__setup_extension()
+        self.assertEqual(ext.created_symbols, created_symbols)
+        self.assertEqual(self.updated_symbols, set())
+        self.assertIsNotNone(self.database.get_symbol('test_greeter_greet'))
+
+    def test_comment_moved(self):
+        self.__setup_extension()
+        self.assertEqual(
+            self.database.get_symbol('test_greeter_greet').filename,
+            os.path.join(self._src_dir, 'test-greeter.h'))
+
+        self._create_c_file('test-greeter.c',
+                            TEST_GREETER_CLASS_COMMENT % 'Does nothing.',
+                            TEST_GREETER_GREET_COMMENT % '')
+        self._create_c_file('test-other-file.c', TEST_GREETER_COMMENT)
+        self.__setup_extension()
+        self.assertIn('test_greeter_greet', self.updated_symbols)
+        self.assertEqual(
+            self.database.get_symbol('test_greeter_greet').filename,
+            os.path.join(self._src_dir, 'test-other-file.h'))
+
+    def test_comment_skipped(self):
+        ext = self.__setup_extension()
+        self.assertIn('test_greeter_greet', ext.created_symbols)
+
+        self._create_c_file('test-greeter.c', TEST_GREETER_COMMENT,
+                            TEST_GREETER_CLASS_COMMENT % 'Does nothing.',
+                            TEST_GREETER_GREET_COMMENT %
+                            ' (attributes doc.skip=true)')
+        ext = self.__setup_extension()
+        self.assertNotIn('test_greeter_greet', ext.created_symbols)
+
+    def test_vfunc_comment_updated(self):
+        self.__setup_extension()
+        self.assertEqual(
+            self.database.get_comment(
+                'TestGreeterClass::do_nothing').description,
+            'Does nothing.')
+
+        self._create_c_file('test-greeter.c', TEST_GREETER_COMMENT,
+                            TEST_GREETER_CLASS_COMMENT % 'Does something.',
+                            TEST_GREETER_GREET_COMMENT % '')
+        self.__setup_extension()
+        # The class comment does not change where symbols go
+        self.assertNotIn('TestGreeterClass::do_nothing',
+                         self.updated_symbols)
+        self.assertEqual(
+            self.database.get_comment(
+                'TestGreeterClass::do_nothing').description,
+            'Does something.')
+
+
+class TestGIFormatter(GIExtensionTest):
+    def setUp(self):
+        super(TestGIFormatter, self).setUp()
+        self.include_paths = OrderedSet([self._md_dir])
+        self._create_md_file('index.markdown', '# Index\n')
+        self.__sitemap = SitemapParser().parse(self._create_sitemap(
+            'sitemap.txt', 'index.markdown\n\tgi-index'))
+
+    def __format(self):
+        ext = self._setup_extension()
+        core_ext = CoreExtension(self, self)
+        core_ext.parse_toplevel_config(Config())
+        core_ext.parse_config(Config())
+        self.extensions[core_ext.extension_name] = core_ext
+
+        self.tree.parse_sitemap(self.__sitemap)
+        self.tree.resolve_symbols(self.database, self.link_resolver)
+        self.tree.format(self.link_resolver, self._output_dir,
+                         self.extensions)
+        return ext
+
+    def __get_languages(self, unique_name):
+        # The outermost documentation of the symbol in each language
+        root = lxml.html.fromstring(
+            self.database.get_symbol(unique_name).detailed_description)
+        res = {}
+        for language in OUTPUT_LANGUAGES:
+            res[language] = root.xpath(
+                '//div[contains(@class, "gi-symbol-%s") and '
+                'not(ancestor::div[contains(@class, "gi-symbol")])]' %
+                language)
+        return res
+
+    def test_languages(self):
+        self.__format()
+
+        languages = self.__get_languages('test_greeter_greet')
+        for language in OUTPUT_LANGUAGES:
+            self.assertEqual(len(languages[language]), 1)
+
+    def test_nested_symbol_language(self):
+        self.__format()
+
+        # The class structure is formatted within the class, the links
+        # of the class comment are still translated to each language
+        titles = {}
+        for language, divs in self.__get_languages('TestGreeter').items():
+            links = divs[0].xpath(
+                './/div[@class="class_details"]//a')
+            titles[language] = links[0].text
+        self.assertEqual(titles, {'c': 'test_greeter_greet',
+                                  'python': 'Test.Greeter.greet',
+                                  'javascript': 'Test.Greeter.prototype.greet'})
+
+    def test_comment_html_reused(self):
+        self.__format()
+
+        # Rendered once for all languages, no link in there
+        comment = self.database.get_comment('test_greeter_greet')
+        self.assertEqual(comment.extension_attrs['gi-extension']['html'],
+                         '<p>Greets.</p>\n')
+
+        comment = self.database.get_comment('TestGreeter')
+        self.assertNotIn('html', comment.extension_attrs['gi-extension'])
+
+    def test_untitled_link(self):
+        self.__format()
+
+        # Not introspectable, and without a title to annotate
+        link = self.link_resolver.get_named_link('https://www.gnome.org')
+        self.assertEqual(link.get_link(self.link_resolver)[0],
+                         'https://www.gnome.org')
+
+    def test_updated_symbol_translations(self):
+        self.__format()
+
+        resolved = set()
+
+        def _resolving_title(link):
+            resolved.add(link.id_)
+
+        Link.resolving_title_signal.connect(_resolving_title)
+        try:
+            self.database.update_symbol(
+                self.database.get_symbol('test_greeter_greet'))
+            self.tree.format(self.link_resolver, self._output_dir,
+                             self.extensions)
+        finally:
+            Link.resolving_title_signal.disconnect(_resolving_title)
+
+        # Only the translations of the updated symbol are computed again
+        self.assertIn('test_greeter_greet', resolved)
+        self.assertNotIn('TestGreeter', resolved)
@@ -186,9 +186,17 @@ class LicenseExtension(Extension):
              'content_designation': designation})
         page.output_attrs['html']['extra_footer_html'].insert(0, formatted)
 
-        LicenseExtension.installed_assets.add(license_.plain_text_path)
+        # Recorded on the page, which may be formatted in another process
+        assets = page.output_attrs['license'].setdefault('assets', set())
+        assets.add(license_.plain_text_path)
         if license_.logo_path:
-            LicenseExtension.installed_assets.add(license_.logo_path)
+            assets.add(license_.logo_path)
+
+    def __formatted_cb(self, project):
+        for page in project.tree.walk():
+            if page.output_attrs:
+                LicenseExtension.installed_assets.update(
+                    page.output_attrs['license'].get('assets', ()))
 
     def __formatting_page_cb(self, formatter, page):
         # hotdoc doesn't claim a copyright
@@ -227,6 +235,7 @@ class LicenseExtension(Extension):
         for ext in self.project.extensions.values():
             ext.formatter.formatting_page_signal.connect(
                 self.__formatting_page_cb)
+        self.project.formatted_signal.connect(self.__formatted_cb)
 
         if not LicenseExtension.connected:
             Formatter.get_extra_files_signal.connect(
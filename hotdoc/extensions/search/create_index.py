@@ -23,21 +23,58 @@ import os
 import shutil
 import json
 import glob
-import threading
+import gzip
+import pickle
 import multiprocessing
+import unicodedata
 
-from concurrent import futures
 from collections import defaultdict, namedtuple, OrderedDict
 
 import lxml.html
+from lxml import etree
 
 from hotdoc.core.exceptions import InvalidOutputException
 from hotdoc.utils.loggable import info as core_info, Logger
 
-from hotdoc.extensions.search.trie import Trie
+from hotdoc.extensions.search.trie import CompactTrie
 
 
-ContextualizedURL = namedtuple('ContextualizedURL', ['url', 'context'])
+ContextualizedURL = namedtuple('ContextualizedURL',
+                               ['url', 'context', 'prioritized'])
+
+
+# The partial index of a single page, postings maps tokens to a tuple
+# of (prioritized, unprioritized) lists of ContextualizedURL
+PageIndex = namedtuple('PageIndex', ['url', 'postings'])
+
+
+# Bumped whenever the layout of the pickled index changes
+INDEX_VERSION = 3
+
+
+# scan_dir, stop_words, fragments_dir, bundle_fragments in indexing
+# workers
+_INDEXING_STATE = None
+
+
+# "tokens" writes one JSONP file per token, "sharded" groups the posting
+# lists of tokens sharing a prefix in gzipped JSON shards
+INDEX_FORMATS = ('tokens', 'sharded')
+
+
+# "sections" writes one JSONP file per section, "pages" bundles the
+# fragments of each page in a single JSONP file
+FRAGMENT_FORMATS = ('sections', 'pages')
+
+
+# "trie" ships the trie of all the tokens to the browser, "dawg" the
+# smaller minimized trie where common suffixes are shared
+VOCABULARY_FORMATS = ('trie', 'dawg')
+
+
+# Maximum number of postings in a shard, unless its tokens cannot be
+# split further
+DEFAULT_SHARD_SIZE = 20000
 
 
 def info(message):
@@ -59,7 +96,13 @@ TITLE_SELECTOR = (
     'self::h4 or self::h5 or self::h6]'
 )
 
-TOK_REGEX = re.compile(r'[a-zA-Z_][a-zA-Z0-9_\.]*[a-zA-Z0-9_]*')
+# Words start with a letter or an underscore, in any script
+TOK_REGEX = re.compile(r'[^\W\d][\w\.]*\w*', re.UNICODE)
+
+# The "tokens" format writes a file named after each token, lowercasing
+# may make a token longer, this leaves room for it below the usual 255
+# bytes limit of file names
+MAX_TOKEN_SIZE = 160
 
 
 def get_sections(root, selector='./div[@id]'):
@@ -71,6 +114,8 @@ def parse_content(section, stop_words, selector='.//p'):
         context = {'gi-language': 'default'}
         text = lxml.html.tostring(elem, method="text",
                                   encoding='unicode')
+        # Search queries are typed in the composed form
+        text = unicodedata.normalize('NFC', text)
 
         id_ = None
         while id_ is None and elem is not None:
@@ -89,7 +134,8 @@ def parse_content(section, stop_words, selector='.//p'):
 
         for token in tokens:
             original_token = token + ' '
-            if token.lower() in stop_words:
+            if token.lower() in stop_words or \
+                    len(token.encode('utf-8')) > MAX_TOKEN_SIZE:
                 yield (None, original_token, id_, context)
                 continue
             if token.endswith('.'):
@@ -102,20 +148,65 @@ def parse_content(section, stop_words, selector='.//p'):
 
 
 def write_fragment(fragments_dir, url, text):
+    """
+    Writes the fragment of the section at @url, its folder must exist.
+    """
     dest = os.path.join(fragments_dir, url + '.fragment')
     dest = dest.replace('#', '-')
-    os.makedirs(os.path.dirname(dest), exist_ok=True)
-    _ = open(dest, 'w')
+    with open(dest, 'w') as _:
+        _.write('fragment_downloaded_cb(%s);' %
+                json.dumps({"url": url, "fragment": text}))
+
+
+def utf16_length(text):
+    # Offsets are meant for String.substr, which counts UTF-16 code units
+    return len(text.encode('utf-16-le')) // 2
+
+
+def write_fragments_bundle(fragments_dir, page_url, fragments):
+    """
+    Writes the (section url, text) @fragments of the page at @page_url
+    in a single file, the text of all the sections concatenated with
+    the offset and length of each section, its folder must exist.
+    """
+    sections = OrderedDict()
+    offset = 0
+    for url, text in fragments:
+        length = utf16_length(text)
+        sections[url] = [offset, length]
+        offset += length
+
+    dest = os.path.join(fragments_dir, page_url + '.fragments')
+    with open(dest, 'w') as _:
+        _.write('fragments_downloaded_cb(%s);' % json.dumps(
+            {"url": page_url, "sections": sections,
+             "text": ''.join(text for _, text in fragments)}))
+
+
+def write_fragments(fragments_dir, page_url, fragments, bundle=False):
+    """
+    Writes the (section url, text) @fragments of the page at @page_url,
+    bundled in a single file if @bundle is True.
+    """
+    if not fragments:
+        return
 
-    _.write("fragment_downloaded_cb(")
-    _.write(json.dumps({"url": url, "fragment": text}))
-    _.write(");")
-    _.close()
+    os.makedirs(os.path.dirname(os.path.join(fragments_dir, page_url)),
+                exist_ok=True)
+
+    if bundle:
+        write_fragments_bundle(fragments_dir, page_url, fragments)
+        return
+
+    for url, text in fragments:
+        write_fragment(fragments_dir, url, text)
 
 
 # pylint: disable=too-many-locals
 # pylint: disable=too-many-branches
-def parse_file(root_dir, root, filename, stop_words, fragments_dir):
+# pylint: disable=too-many-arguments
+def parse_file(root_dir, root, filename, stop_words, fragments_dir,
+               bundle_fragments=False):
     if root.attrib.get('id') == 'main':
         initial = root
     else:
@@ -127,11 +218,12 @@ def parse_file(root_dir, root, filename, stop_words, fragments_dir):
         initial = initial[0]
 
     url = os.path.relpath(filename, root_dir)
+    # The text of all the sections of the page, written out at the end
+    subsections = OrderedDict()
 
     sections = get_sections(initial, SECTIONS_SELECTOR)
     for section in sections:
         section_url = '%s#%s' % (url, section.attrib.get('id', '').strip())
-        subsections = defaultdict(str)
 
         for tok, text, id_, context in parse_content(section, stop_words,
                                                      selector=TITLE_SELECTOR):
@@ -140,7 +232,7 @@ def parse_file(root_dir, root, filename, stop_words, fragments_dir):
             else:
                 section_id = section_url
 
-            subsections[section_id] += text
+            subsections.setdefault(section_id, []).append(text)
 
             if tok is None:
                 continue
@@ -155,7 +247,7 @@ def parse_file(root_dir, root, filename, stop_words, fragments_dir):
             else:
                 section_id = section_url
 
-            subsections[section_id] += text
+            subsections.setdefault(section_id, []).append(text)
 
             if tok is None:
                 continue
@@ -164,10 +256,106 @@ def parse_file(root_dir, root, filename, stop_words, fragments_dir):
             if any(c.isupper() for c in tok):
                 yield tok.lower(), section_id, False, context
 
-        for section_id, section_text in subsections.items():
-            write_fragment(fragments_dir,
-                           section_id,
-                           section_text)
+    write_fragments(fragments_dir, url,
+                    [(section_id, ''.join(texts))
+                     for section_id, texts in subsections.items()],
+                    bundle=bundle_fragments)
+
+
+def index_page(scan_dir, root, filename, stop_words, fragments_dir,
+               bundle_fragments=False):
+    """
+    Tokenizes the page at @filename, parsed as @root, writes its
+    fragments and returns its PageIndex.
+    """
+    postings = {}
+    for token, section_url, prioritize, context in parse_file(
+            scan_dir, root, filename, stop_words, fragments_dir,
+            bundle_fragments):
+        try:
+            token_postings = postings[token]
+        except KeyError:
+            token_postings = postings[token] = ([], [])
+        token_postings[not prioritize].append(
+            ContextualizedURL(section_url, context, prioritize))
+
+    return PageIndex(os.path.relpath(filename, scan_dir), postings)
+
+
+def _index_page_in_worker(args):
+    filename, html = args
+    scan_dir, stop_words, fragments_dir, bundle_fragments = _INDEXING_STATE
+    return index_page(scan_dir, etree.HTML(html), filename, stop_words,
+                      fragments_dir, bundle_fragments)
+
+
+def dedup_urls(contextualized_urls):
+    """
+    Returns an OrderedDict mapping the urls in @contextualized_urls to
+    their merged contexts, and the set of prioritized urls.
+    """
+    deduped = OrderedDict()
+    prioritized = set()
+    for url in contextualized_urls:
+        if url.prioritized:
+            prioritized.add(url.url)
+        try:
+            context = deduped[url.url]
+            for key_, val_ in url.context.items():
+                try:
+                    vset = context[key_]
+                    vset.add(val_)
+                except KeyError:
+                    context[key_] = set([val_])
+        except KeyError:
+            deduped[url.url] = \
+                {k: set([v]) for k, v in url.context.items()}
+
+    return deduped, prioritized
+
+
+def shard_tokens(tokens, sizes, max_size, depth=1):
+    """
+    Groups the sorted @tokens by prefix, starting with prefixes of @depth
+    letters and using longer ones for groups whose total size, looked up
+    in @sizes, exceeds @max_size.
+
+    Returns a list of (prefix, tokens) tuples, the group of a token is the
+    one with the longest prefix of that token.
+    """
+    groups = OrderedDict()
+    for token in tokens:
+        groups.setdefault(token[:depth], []).append(token)
+
+    res = []
+    for prefix, group in groups.items():
+        if (sum(sizes[token] for token in group) > max_size and
+                any(len(token) > depth for token in group)):
+            res.extend(shard_tokens(group, sizes, max_size, depth + 1))
+        else:
+            res.append((prefix, group))
+
+    return res
+
+
+def delta_encode(ids):
+    """
+    Returns the sorted @ids, each but the first one as the difference
+    with the previous one.
+    """
+    res = []
+    previous = 0
+    for id_ in sorted(ids):
+        res.append(id_ - previous)
+        previous = id_
+    return res
+
+
+def write_gzipped_json(path, obj):
+    # A fixed mtime keeps the output reproducible
+    with open(path, 'wb') as _:
+        with gzip.GzipFile(fileobj=_, mode='wb', mtime=0) as gzipped:
+            gzipped.write(json.dumps(obj, separators=(',', ':')).encode())
 
 
 def prepare_folder(dest):
@@ -188,94 +376,210 @@ def prepare_folder(dest):
 # pylint: disable=too-many-instance-attributes
 class SearchIndex(object):
 
-    def __init__(self, scan_dir, output_dir, private_dir):
+    """
+    Builds the search index of the pages passed to `process`.
+
+    Tokenizing a page yields its own PageIndex, which is then merged in
+    the full index in the order pages were processed. With @jobs > 1,
+    pages are only serialized as they are written out, and tokenized in
+    forked worker processes by `write`, nothing is shared between the
+    workers. The pool only exists there, so no helper threads are around
+    when other pools fork.
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, scan_dir, output_dir, private_dir,
+                 index_format=INDEX_FORMATS[0],
+                 shard_size=DEFAULT_SHARD_SIZE, incremental=False, jobs=1,
+                 fragments_format=FRAGMENT_FORMATS[0],
+                 vocabulary_format=VOCABULARY_FORMATS[0]):
         self.__scan_dir = scan_dir
         self.__output_dir = output_dir
         self.__private_dir = private_dir
+        self.__index_format = index_format
+        self.__shard_size = shard_size
+        self.__bundle_fragments = fragments_format == 'pages'
+        self.__minimize_trie = vocabulary_format == 'dawg'
 
         prepare_folder(self.__search_dir)
         prepare_folder(self.__fragments_dir)
 
-        self.__indices_lock = threading.Lock()
-        self.__full_index = defaultdict(list)
-        self.__new_index = defaultdict(list)
-        self.__trie = Trie()
+        # Maps tokens to (prioritized, unprioritized) lists of
+        # ContextualizedURL
+        self.__full_index = {}
+        # Tokens of each page, to remove its postings when it is rewritten
+        self.__page_tokens = defaultdict(set)
+        # Tokens whose postings changed during this run
+        self.__dirty_tokens = set()
+        # Tokens that appeared in or disappeared from the index during
+        # this run, the trie only needs rebuilding if there are any
+        self.__added_tokens = set()
+        self.__removed_tokens = set()
+        # How the previous run wrote the index out, None if unknown
+        self.__previous_formats = None
+
+        if incremental:
+            self.__load()
 
-        self.__filler = futures.ThreadPoolExecutor(
-            max_workers=multiprocessing.cpu_count() * 5)
         here = os.path.dirname(__file__)
         with open(os.path.join(here, 'stopwords.txt'), 'r') as _:
             self.__stop_words = set(_.read().split())
 
-        self.__futures = []
-        self.__connected_all_projects = False
+        self.__jobs = jobs
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            self.__jobs = 1
+        # (path, html) of the pages left to index in worker processes
+        self.__pending = []
 
     def process(self, path, lxml_tree):
-        self.__futures.append(self.__filler.submit(self.fill, path, lxml_tree))
+        """
+        Indexes the page written at @path, this must not be called
+        concurrently.
+        """
+        if self.__jobs <= 1:
+            self.fill(path, lxml_tree)
+            return
+
+        self.__remove_fragments(path)
+        self.__pending.append(
+            (path, etree.tostring(lxml_tree, encoding='unicode',
+                                  method='html')))
 
     def write(self):
-        for future in self.__futures:
-            # Make sure all the filling is done.
-            future.result()
+        if self.__pending:
+            self.__index_pending()
         self.save()
 
+    def __index_pending(self):
+        # pylint: disable=global-statement
+        global _INDEXING_STATE
+        _INDEXING_STATE = (self.__scan_dir, self.__stop_words,
+                           self.__fragments_dir, self.__bundle_fragments)
+        try:
+            with multiprocessing.get_context('fork').Pool(
+                    self.__jobs) as pool:
+                for page_index in pool.imap(
+                        _index_page_in_worker, self.__pending,
+                        max(1, len(self.__pending) // (self.__jobs * 4))):
+                    self.__merge(page_index)
+        finally:
+            _INDEXING_STATE = None
+        self.__pending = []
+
     @property
     def __search_dir(self):
         return os.path.join(self.__output_dir, 'search')
 
+    @property
+    def __shards_dir(self):
+        return os.path.join(self.__search_dir, 'shards')
+
     @property
     def __fragments_dir(self):
         return os.path.join(self.__search_dir, 'hotdoc_fragments')
 
-    def __get_fragments(self, filenames):
-        fragments = set()
+    @property
+    def __index_path(self):
+        return os.path.join(self.__private_dir, 'search.index.p')
 
-        for filename in filenames:
-            url = os.path.relpath(filename, self.__scan_dir)
-            for fragment in glob.glob(
-                    os.path.join(self.__fragments_dir, url) + '*'):
-                fragments.add(os.path.relpath(fragment,
-                                              self.__fragments_dir)[:-9])
-                os.unlink(fragment)
+    @property
+    def __trie_path(self):
+        return os.path.join(self.__private_dir, 'search.trie')
+
+    def __load(self):
+        try:
+            with open(self.__index_path, 'rb') as _:
+                version, full_index, page_tokens, formats = pickle.loads(
+                    _.read())
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            version = None
+
+        if version != INDEX_VERSION:
+            info('No previous search index, building it from scratch')
+            return
 
-        return fragments
+        self.__full_index.update(full_index)
+        self.__page_tokens.update(page_tokens)
+        self.__previous_formats = formats
 
-    def fill(self, filename, lxml_tree):
-        for token, section_url, prioritize, context in parse_file(
-                self.__scan_dir,
-                lxml_tree,
-                filename,
-                self.__stop_words,
-                self.__fragments_dir):
-
-            self.__indices_lock.acquire()
-            contextualized_url = ContextualizedURL(section_url, context)
-            if not prioritize:
-                self.__full_index[token].append(contextualized_url)
-                self.__new_index[token].append(contextualized_url)
-            else:
-                self.__full_index[token].insert(0, contextualized_url)
-                self.__new_index[token].insert(0, contextualized_url)
-            self.__indices_lock.release()
+    @property
+    def __formats(self):
+        return (self.__index_format, self.__minimize_trie)
+
+    def __remove_fragments(self, filename):
+        url = os.path.relpath(filename, self.__scan_dir)
+        path = os.path.join(self.__fragments_dir, url)
+        # Section urls are url#id, written with '#' replaced by '-'
+        for fragment in glob.glob(glob.escape(path) + '-*.fragment'):
+            os.unlink(fragment)
+
+        try:
+            os.unlink(path + '.fragments')
+        except OSError:
+            pass
+
+    def __remove_page(self, url):
+        for token in self.__page_tokens.pop(url, ()):
+            postings = self.__full_index.get(token)
+            if postings is None:
+                continue
 
-    def save(self):
-        self.__indices_lock.acquire()
-        for key, value in sorted(self.__new_index.items()):
-            self.__trie.insert(key)
+            postings = tuple(
+                [contextualized_url for contextualized_url in urls
+                 if contextualized_url.url.split('#', 1)[0] != url]
+                for urls in postings)
+            if any(postings):
+                self.__full_index[token] = postings
+            else:
+                del self.__full_index[token]
+                if token in self.__added_tokens:
+                    self.__added_tokens.remove(token)
+                else:
+                    self.__removed_tokens.add(token)
+            self.__dirty_tokens.add(token)
+
+    def __merge(self, page_index):
+        self.__remove_page(page_index.url)
+
+        for token, (prioritized, unprioritized) in \
+                page_index.postings.items():
+            try:
+                postings = self.__full_index[token]
+            except KeyError:
+                postings = self.__full_index[token] = ([], [])
+                if token in self.__removed_tokens:
+                    self.__removed_tokens.remove(token)
+                else:
+                    self.__added_tokens.add(token)
+            postings[0].extend(prioritized)
+            postings[1].extend(unprioritized)
+            self.__dirty_tokens.add(token)
+
+        self.__page_tokens[page_index.url] = set(page_index.postings)
 
-            deduped = OrderedDict()
-            for url in value:
+    def fill(self, filename, lxml_tree):
+        """
+        Indexes the page at @filename in the current process.
+        """
+        self.__remove_fragments(filename)
+        self.__merge(index_page(self.__scan_dir, lxml_tree, filename,
+                                self.__stop_words, self.__fragments_dir,
+                                self.__bundle_fragments))
+
+    def __get_urls(self, token):
+        prioritized, unprioritized = self.__full_index[token]
+        return prioritized + unprioritized
+
+    def __save_tokens(self, tokens):
+        for key in sorted(tokens):
+            path = os.path.join(self.__search_dir, key)
+            if key not in self.__full_index:
                 try:
-                    context = deduped[url.url]
-                    for key_, val_ in url.context.items():
-                        try:
-                            vset = context[key_]
-                            vset.add(val_)
-                        except KeyError:
-                            context[key_] = set([val_])
-                except KeyError:
-                    deduped[url.url] = \
-                        {k: set([v]) for k, v in url.context.items()}
+                    os.unlink(path)
+                except OSError:
+                    pass
+                continue
+
+            deduped, _ = dedup_urls(self.__get_urls(key))
 
             urls = []
             for url, context in deduped.items():
@@ -285,10 +589,111 @@ class SearchIndex(object):
 
             metadata = {'token': key, 'urls': urls}
 
-            with open(os.path.join(self.__search_dir, key), 'w') as _:
+            with open(path, 'w') as _:
                 _.write('urls_downloaded_cb(%s);' % json.dumps(metadata))
 
-        self.__trie.to_file(os.path.join(self.__private_dir, 'search.trie'),
-                            os.path.join(self.__output_dir, 'trie_index.js'))
+    # pylint: disable=too-many-locals
+    def __save_sharded(self):
+        postings = {}
+        all_urls = set()
+        for token in self.__full_index:
+            postings[token] = dedup_urls(self.__get_urls(token))
+            all_urls |= set(postings[token][0])
+
+        # Sorting gathers the sections of a page, for small deltas
+        urls = sorted(all_urls)
+        url_ids = {url: id_ for id_, url in enumerate(urls)}
+        contexts = []
+        context_ids = {}
+
+        shutil.rmtree(self.__shards_dir, ignore_errors=True)
+        os.makedirs(self.__shards_dir)
+
+        tokens = sorted(postings)
+        sizes = {token: len(postings[token][0]) for token in tokens}
+        manifest = {}
+
+        for shard_id, (prefix, shard_tokens_) in enumerate(
+                shard_tokens(tokens, sizes, self.__shard_size)):
+            shard = {}
+            for token in shard_tokens_:
+                deduped, prioritized = postings[token]
+                ids = [[], []]
+                token_contexts = {}
+                for url, context in deduped.items():
+                    context = {key_: sorted(val_)
+                               for key_, val_ in context.items()}
+                    serialized = json.dumps(context, sort_keys=True)
+                    context_id = context_ids.get(serialized)
+                    if context_id is None:
+                        context_id = context_ids[serialized] = len(contexts)
+                        contexts.append(context)
+
+                    ids[url not in prioritized].append(url_ids[url])
+                    token_contexts[url_ids[url]] = context_id
+
+                entry = {'p': delta_encode(ids[0]),
+                         'u': delta_encode(ids[1])}
+                ordered_contexts = [token_contexts[id_] for id_ in
+                                    sorted(ids[0]) + sorted(ids[1])]
+                if any(ordered_contexts):
+                    entry['c'] = ordered_contexts
+                shard[token] = entry
+
+            write_gzipped_json(
+                os.path.join(self.__shards_dir, '%d.json.gz' % shard_id),
+                shard)
+            manifest[prefix] = shard_id
+
+        write_gzipped_json(os.path.join(self.__search_dir, 'urls.json.gz'),
+                           {'urls': urls, 'contexts': contexts})
+
+        with open(os.path.join(self.__search_dir, 'manifest.json'),
+                  'w') as _:
+            json.dump({'version': 1, 'shards': manifest}, _,
+                      sort_keys=True)
+
+        info('Wrote %d search index shards for %d tokens' %
+             (len(manifest), len(tokens)))
 
-        self.__indices_lock.release()
+    def save(self):
+        # Pages that went away since the previous run
+        for url in list(self.__page_tokens):
+            if not os.path.exists(os.path.join(self.__scan_dir, url)):
+                self.__remove_page(url)
+                self.__remove_fragments(os.path.join(self.__scan_dir, url))
+
+        # The output of the previous run can only be updated if it was
+        # written the same way, and is still around
+        trie_js_path = os.path.join(self.__output_dir, 'trie_index.js')
+        rewrite = (self.__previous_formats != self.__formats or
+                   not os.path.exists(trie_js_path) or
+                   not os.path.exists(self.__trie_path))
+
+        if self.__index_format == 'sharded':
+            info('Updating %d tokens in the search index' %
+                 len(self.__dirty_tokens))
+            self.__save_sharded()
+        elif rewrite:
+            info('Writing the %d tokens of the search index' %
+                 len(self.__full_index))
+            self.__save_tokens(set(self.__full_index))
+        else:
+            info('Updating %d tokens in the search index' %
+                 len(self.__dirty_tokens))
+            self.__save_tokens(self.__dirty_tokens)
+
+        if rewrite or self.__added_tokens or self.__removed_tokens:
+            # Rebuilding the trie from the sorted tokens is linear
+            CompactTrie.from_words(
+                self.__full_index, minimize=self.__minimize_trie).to_file(
+                    self.__trie_path, trie_js_path)
+
+        with open(self.__index_path, 'wb') as _:
+            _.write(pickle.dumps((INDEX_VERSION, self.__full_index,
+                                  dict(self.__page_tokens), self.__formats)))
+
+        self.__dirty_tokens = set()
+        self.__added_tokens = set()
+        self.__removed_tokens = set()
+        self.__previous_formats = self.__formats
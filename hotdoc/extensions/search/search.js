@@ -19,6 +19,176 @@
  * Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
  */
 
+/*
+ * Loader for the index written with --search-index-format=sharded.
+ *
+ * @root is the url of the search folder, for example "assets/js/search".
+ * The manifest and url table are fetched on the first lookup, then only
+ * the shard holding the looked up token.
+ */
+function ShardedSearchIndex(root) {
+	this.root = root;
+	this.manifest = null;
+	this.url_table = null;
+	this.shards = {};
+}
+
+ShardedSearchIndex.prototype.fetch_json = function(path, gzipped) {
+	return fetch(this.root + '/' + path).then(function(response) {
+		if (!response.ok) {
+			throw new Error('Could not fetch ' + path);
+		}
+
+		/* The server may have done the decompressing already */
+		if (!gzipped || response.headers.get('Content-Encoding') == 'gzip') {
+			return response.json();
+		}
+
+		var stream = response.body.pipeThrough(new DecompressionStream('gzip'));
+		return new Response(stream).json();
+	});
+};
+
+ShardedSearchIndex.prototype.get_manifest = function() {
+	if (this.manifest === null) {
+		this.manifest = this.fetch_json('manifest.json', false);
+	}
+	return this.manifest;
+};
+
+ShardedSearchIndex.prototype.get_url_table = function() {
+	if (this.url_table === null) {
+		this.url_table = this.fetch_json('urls.json.gz', true);
+	}
+	return this.url_table;
+};
+
+ShardedSearchIndex.prototype.get_shard = function(shard_id) {
+	if (!(shard_id in this.shards)) {
+		this.shards[shard_id] = this.fetch_json('shards/' + shard_id + '.json.gz', true);
+	}
+	return this.shards[shard_id];
+};
+
+/* The shard of a token is the one with the longest prefix of that token */
+function get_shard_id(manifest, token) {
+	for (var len = token.length; len > 0; len--) {
+		var prefix = token.substring(0, len);
+		if (prefix in manifest.shards) {
+			return manifest.shards[prefix];
+		}
+	}
+	return undefined;
+}
+
+function delta_decode(deltas) {
+	var res = [];
+	var previous = 0;
+	for (var i = 0; i < deltas.length; i++) {
+		previous += deltas[i];
+		res.push(previous);
+	}
+	return res;
+}
+
+/*
+ * Resolves to the same object urls_downloaded_cb is called with for the
+ * "tokens" format, { token: token, urls: [{ url: url, context: context }] },
+ * prioritized urls first, or to null if the token is not indexed.
+ */
+ShardedSearchIndex.prototype.lookup = function(token) {
+	var self = this;
+
+	return this.get_manifest().then(function(manifest) {
+		var shard_id = get_shard_id(manifest, token);
+		if (shard_id === undefined) {
+			return null;
+		}
+
+		return Promise.all([self.get_shard(shard_id), self.get_url_table()]);
+	}).then(function(res) {
+		if (res === null || !(token in res[0])) {
+			return null;
+		}
+
+		var entry = res[0][token];
+		var url_table = res[1];
+		var ids = delta_decode(entry.p).concat(delta_decode(entry.u));
+		var urls = [];
+
+		for (var i = 0; i < ids.length; i++) {
+			var context_id = entry.c ? entry.c[i] : 0;
+			urls.push({
+				url: url_table.urls[ids[i]],
+				context: url_table.contexts[context_id]
+			});
+		}
+
+		return {token: token, urls: urls};
+	});
+};
+
+/*
+ * Loader for the snippets written with --search-fragments-format=pages.
+ *
+ * @root is the url of the fragments folder, for example
+ * "assets/js/search/hotdoc_fragments". All the snippets of a page are
+ * downloaded with a single script request, works from file:// urls too.
+ */
+function PageFragments(root) {
+	this.root = root;
+	this.pages = {};
+}
+
+var page_fragments_callbacks = {};
+
+function fragments_downloaded_cb(data) {
+	var callbacks = page_fragments_callbacks[data.url] || [];
+	delete page_fragments_callbacks[data.url];
+	for (var i = 0; i < callbacks.length; i++) {
+		callbacks[i](data);
+	}
+}
+
+PageFragments.prototype.get_page = function(page_url) {
+	var self = this;
+
+	if (!(page_url in this.pages)) {
+		this.pages[page_url] = new Promise(function(resolve, reject) {
+			if (!(page_url in page_fragments_callbacks)) {
+				page_fragments_callbacks[page_url] = [];
+			}
+			page_fragments_callbacks[page_url].push(resolve);
+
+			var script = document.createElement('script');
+			script.type = 'text/javascript';
+			script.onerror = function() {
+				delete self.pages[page_url];
+				reject(new Error('Could not load the fragments of ' + page_url));
+			};
+			script.src = self.root + '/' + page_url + '.fragments';
+			document.getElementsByTagName('head')[0].appendChild(script);
+		});
+	}
+
+	return this.pages[page_url];
+};
+
+/*
+ * Resolves to the same object fragment_downloaded_cb is called with for
+ * the "sections" format, { url: url, fragment: text }, or to null.
+ */
+PageFragments.prototype.lookup = function(url) {
+	return this.get_page(url.split('#')[0]).then(function(page) {
+		var section = page.sections[url];
+		if (section === undefined) {
+			return null;
+		}
+
+		return {url: url, fragment: page.text.substr(section[0], section[1])};
+	});
+};
+
 var trie = undefined;
 var head = document.getElementsByTagName('head')[0];
 var script = document.createElement('script');
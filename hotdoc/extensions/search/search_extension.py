@@ -22,7 +22,9 @@ import os
 import shutil
 from hotdoc.core.extension import Extension
 from hotdoc.utils.setup_utils import symlink
-from hotdoc.extensions.search.create_index import SearchIndex
+from hotdoc.extensions.search.create_index import (
+    SearchIndex, INDEX_FORMATS, FRAGMENT_FORMATS, VOCABULARY_FORMATS,
+    DEFAULT_SHARD_SIZE)
 
 DESCRIPTION =\
     """
@@ -36,6 +38,10 @@ HERE = os.path.dirname(__file__)
 class SearchExtension(Extension):
     extension_name = 'search'
     connected = False
+    index_format = INDEX_FORMATS[0]
+    shard_size = DEFAULT_SHARD_SIZE
+    fragments_format = FRAGMENT_FORMATS[0]
+    vocabulary_format = VOCABULARY_FORMATS[0]
 
     __connected_all_projects = False
     __index = None
@@ -59,7 +65,13 @@ class SearchExtension(Extension):
 
         if not SearchExtension.__index:
             SearchExtension.__index = SearchIndex(
-                output, dest, self.app.project.get_private_folder())
+                output, dest, self.app.project.get_private_folder(),
+                index_format=SearchExtension.index_format,
+                shard_size=SearchExtension.shard_size,
+                incremental=self.app.incremental,
+                jobs=self.app.jobs,
+                fragments_format=SearchExtension.fragments_format,
+                vocabulary_format=SearchExtension.vocabulary_format)
             for ext in self.app.project.extensions.values():
                 ext.formatter.writing_page_signal.connect(
                     self.__writing_page_cb)
@@ -82,9 +94,6 @@ class SearchExtension(Extension):
 
     def __build_index(self, app):  # pylint: disable=unused-argument
         # pylint: disable=too-many-locals
-        if self.app.incremental:
-            return
-
         output = os.path.join(self.app.output, 'html')
         assets_path = os.path.join(output, 'assets')
         dest = os.path.join(assets_path, 'js')
@@ -117,6 +126,47 @@ class SearchExtension(Extension):
     def __formatting_page(self, formatter, page):
         page.output_attrs['html']['scripts'].add(self.script)
 
+    @staticmethod
+    def add_arguments(parser):
+        group = parser.add_argument_group('Search extension', DESCRIPTION)
+        group.add_argument('--search-index-format', action='store',
+                           choices=INDEX_FORMATS, default=INDEX_FORMATS[0],
+                           dest='search_index_format',
+                           help='Format of the search index, "tokens" writes'
+                           ' one file per token, "sharded" writes gzipped'
+                           ' shards to be loaded with fetch()')
+        group.add_argument('--search-shard-size', action='store', type=int,
+                           default=DEFAULT_SHARD_SIZE,
+                           dest='search_shard_size',
+                           help='Maximum number of postings per shard of'
+                           ' the sharded search index')
+        group.add_argument('--search-fragments-format', action='store',
+                           choices=FRAGMENT_FORMATS,
+                           default=FRAGMENT_FORMATS[0],
+                           dest='search_fragments_format',
+                           help='Format of the search result snippets,'
+                           ' "sections" writes one file per section,'
+                           ' "pages" bundles the snippets of each page'
+                           ' in a single file')
+        group.add_argument('--search-vocabulary-format', action='store',
+                           choices=VOCABULARY_FORMATS,
+                           default=VOCABULARY_FORMATS[0],
+                           dest='search_vocabulary_format',
+                           help='Structure of the search vocabulary, "dawg"'
+                           ' shares the common suffixes of tokens for a'
+                           ' smaller download')
+
+    def parse_toplevel_config(self, config):
+        super(SearchExtension, self).parse_toplevel_config(config)
+        SearchExtension.index_format = config.get('search_index_format',
+                                                  INDEX_FORMATS[0])
+        SearchExtension.shard_size = config.get('search_shard_size',
+                                                DEFAULT_SHARD_SIZE)
+        SearchExtension.fragments_format = config.get(
+            'search_fragments_format', FRAGMENT_FORMATS[0])
+        SearchExtension.vocabulary_format = config.get(
+            'search_vocabulary_format', VOCABULARY_FORMATS[0])
+
 
 def get_extension_classes():
     return [SearchExtension]
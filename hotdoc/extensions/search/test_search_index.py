@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+import lxml.html
+
+from hotdoc.extensions.search.create_index import (
+    SearchIndex, shard_tokens, delta_encode, write_fragments)
+from hotdoc.extensions.search.trie import CompactTrie
+
+
+PAGE_TEMPLATE = '''
+<html><body><div id="main">
+<div id="%(name)s-section">
+<h1>The %(name)s page</h1>
+<p>Some text about %(text)s and shared_token.</p>
+</div>
+</div></body></html>
+'''
+
+
+def get_shard_id(manifest, token):
+    for length in range(len(token), 0, -1):
+        shard_id = manifest['shards'].get(token[:length])
+        if shard_id is not None:
+            return shard_id
+    return None
+
+
+def load_jsonp(path, callback):
+    with open(path) as _:
+        contents = _.read()
+    prefix = '%s(' % callback
+    assert contents.startswith(prefix) and contents.endswith(');')
+    return json.loads(contents[len(prefix):-2])
+
+
+def get_bundled_fragment(bundle, url):
+    # Offsets count UTF-16 code units, as in javascript
+    offset, length = bundle['sections'][url]
+    text = bundle['text'].encode('utf-16-le')
+    return text[offset * 2:(offset + length) * 2].decode('utf-16-le')
+
+
+def delta_decode(deltas):
+    res = []
+    previous = 0
+    for delta in deltas:
+        previous += delta
+        res.append(previous)
+    return res
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.__tmp_dir = tempfile.mkdtemp()
+        self.__html_dir = os.path.join(self.__tmp_dir, 'html')
+        self.__js_dir = os.path.join(self.__html_dir, 'assets', 'js')
+        self.__private_dir = os.path.join(self.__tmp_dir, 'private')
+        for dir_ in (self.__js_dir, self.__private_dir):
+            os.makedirs(dir_)
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmp_dir)
+
+    def __new_index(self, **kwargs):
+        return SearchIndex(self.__html_dir, self.__js_dir,
+                           self.__private_dir, **kwargs)
+
+    def __fill(self, index, name, text=None):
+        contents = PAGE_TEMPLATE % {'name': name, 'text': text or name}
+        path = os.path.join(self.__html_dir, '%s.html' % name)
+        with open(path, 'w') as _:
+            _.write(contents)
+        index.fill(path, lxml.html.fromstring(contents))
+
+    def __token_exists(self, token):
+        return os.path.exists(os.path.join(self.__js_dir, 'search', token))
+
+    def __load_gzipped(self, *path):
+        with gzip.open(os.path.join(self.__js_dir, 'search', *path)) as _:
+            return json.loads(_.read().decode())
+
+    def __lookup(self, token):
+        with open(os.path.join(self.__js_dir, 'search',
+                               'manifest.json')) as _:
+            manifest = json.load(_)
+        shard_id = get_shard_id(manifest, token)
+        if shard_id is None:
+            return None
+
+        shard = self.__load_gzipped('shards', '%d.json.gz' % shard_id)
+        if token not in shard:
+            return None
+
+        url_table = self.__load_gzipped('urls.json.gz')
+        entry = shard[token]
+        ids = delta_decode(entry['p']) + delta_decode(entry['u'])
+        contexts = entry.get('c', [0] * len(ids))
+        return [(url_table['urls'][id_], url_table['contexts'][context_id])
+                for id_, context_id in zip(ids, contexts)]
+
+    def test_shard_tokens(self):
+        tokens = sorted(['a', 'aa', 'ab', 'abc', 'b', 'ba', 'c'])
+        sizes = {token: 1 for token in tokens}
+        shards = shard_tokens(tokens, sizes, 2)
+
+        self.assertEqual(sorted(sum((group for _, group in shards), [])),
+                         tokens)
+        for _, group in shards:
+            self.assertLessEqual(len(group), 2)
+
+        manifest = {'shards': {prefix: i
+                               for i, (prefix, _) in enumerate(shards)}}
+        for i, (_, group) in enumerate(shards):
+            for token in group:
+                self.assertEqual(get_shard_id(manifest, token), i)
+
+    def test_delta_encode(self):
+        self.assertEqual(delta_encode([7, 2, 3]), [2, 1, 4])
+        self.assertEqual(delta_decode(delta_encode([7, 2, 3])), [2, 3, 7])
+
+    def test_sharded_save(self):
+        index = self.__new_index(index_format='sharded', shard_size=2)
+        for name in ('foo', 'bar', 'baz'):
+            self.__fill(index, name)
+        index.save()
+
+        default = {'gi-language': ['default']}
+        self.assertEqual(self.__lookup('foo'),
+                         [('foo.html#foo-section', default)])
+        self.assertEqual(
+            sorted(url for url, _ in self.__lookup('shared_token')),
+            ['bar.html#bar-section', 'baz.html#baz-section',
+             'foo.html#foo-section'])
+        self.assertIsNone(self.__lookup('nonexistent'))
+
+        # No file per token
+        self.assertFalse(os.path.exists(
+            os.path.join(self.__js_dir, 'search', 'foo')))
+
+    def test_incremental_save(self):
+        index = self.__new_index()
+        self.__fill(index, 'foo', 'old_token')
+        for name in ('bar', 'baz'):
+            self.__fill(index, name)
+        index.save()
+        self.assertTrue(self.__token_exists('old_token'))
+        self.assertTrue(self.__token_exists('bar'))
+
+        # foo is rewritten, bar is removed
+        index = self.__new_index(incremental=True)
+        self.__fill(index, 'foo', 'new_token')
+        os.unlink(os.path.join(self.__html_dir, 'bar.html'))
+        index.save()
+
+        self.assertFalse(self.__token_exists('old_token'))
+        self.assertTrue(self.__token_exists('new_token'))
+        self.assertFalse(self.__token_exists('bar'))
+        with open(os.path.join(self.__js_dir, 'search', 'shared_token')) as _:
+            contents = _.read()
+        self.assertIn('foo.html', contents)
+        self.assertIn('baz.html', contents)
+        self.assertNotIn('bar.html', contents)
+
+        trie = CompactTrie.from_file(
+            os.path.join(self.__private_dir, 'search.trie'))
+        self.assertTrue(trie.exists('new_token'))
+        self.assertTrue(trie.exists('baz'))
+        self.assertFalse(trie.exists('old_token'))
+        self.assertFalse(trie.exists('bar'))
+        self.assertFalse(os.path.exists(os.path.join(
+            self.__js_dir, 'search', 'hotdoc_fragments',
+            'bar.html-bar-section.fragment')))
+
+    def test_unchanged_vocabulary(self):
+        index = self.__new_index()
+        for name in ('foo', 'bar'):
+            self.__fill(index, name)
+        index.save()
+
+        trie_paths = [os.path.join(self.__private_dir, 'search.trie'),
+                      os.path.join(self.__js_dir, 'trie_index.js')]
+        for path in trie_paths:
+            os.utime(path, (0, 0))
+
+        # Same tokens, the trie is not built again
+        index = self.__new_index(incremental=True)
+        self.__fill(index, 'foo', 'bar')
+        index.save()
+        for path in trie_paths:
+            self.assertEqual(os.path.getmtime(path), 0)
+
+        index = self.__new_index(incremental=True)
+        self.__fill(index, 'foo', 'new_token')
+        index.save()
+        for path in trie_paths:
+            self.assertNotEqual(os.path.getmtime(path), 0)
+
+    def test_format_changed(self):
+        index = self.__new_index(index_format='sharded')
+        for name in ('foo', 'bar'):
+            self.__fill(index, name)
+        index.save()
+        self.assertFalse(self.__token_exists('bar'))
+
+        # bar is not indexed again, its tokens are still written out
+        index = self.__new_index(incremental=True)
+        self.__fill(index, 'foo')
+        index.save()
+        self.assertTrue(self.__token_exists('bar'))
+
+    def test_output_removed(self):
+        index = self.__new_index()
+        for name in ('foo', 'bar'):
+            self.__fill(index, name)
+        index.save()
+
+        shutil.rmtree(os.path.join(self.__js_dir, 'search'))
+        os.unlink(os.path.join(self.__js_dir, 'trie_index.js'))
+
+        index = self.__new_index(incremental=True)
+        self.__fill(index, 'foo')
+        index.save()
+        self.assertTrue(self.__token_exists('bar'))
+        self.assertTrue(os.path.exists(
+            os.path.join(self.__js_dir, 'trie_index.js')))
+
+    def __read_search_dir(self):
+        search_dir = os.path.join(self.__js_dir, 'search')
+        contents = {}
+        for name in os.listdir(search_dir):
+            path = os.path.join(search_dir, name)
+            if os.path.isfile(path):
+                with open(path) as _:
+                    contents[name] = _.read()
+        return contents
+
+    def test_parallel_process(self):
+        results = []
+        for jobs in (1, 3):
+            index = self.__new_index(jobs=jobs)
+            for i in range(20):
+                name = 'page%d' % i
+                contents = PAGE_TEMPLATE % {'name': name,
+                                            'text': 'Token%d' % (i % 3)}
+                path = os.path.join(self.__html_dir, '%s.html' % name)
+                with open(path, 'w') as _:
+                    _.write(contents)
+                index.process(path, lxml.html.fromstring(contents))
+            index.write()
+            results.append(self.__read_search_dir())
+
+        self.assertIn('Token1', results[0])
+        self.assertEqual(results[0], results[1])
+
+    def test_prioritized_first(self):
+        index = self.__new_index()
+        self.__fill(index, 'foo', 'bar')
+        self.__fill(index, 'bar')
+        index.save()
+
+        with open(os.path.join(self.__js_dir, 'search', 'bar')) as _:
+            contents = _.read()
+        # bar is in the title of the bar page only
+        self.assertLess(contents.index('bar.html#bar-section'),
+                        contents.index('foo.html#foo-section'))
+
+    def test_write_fragments_bundle(self):
+        fragments_dir = os.path.join(self.__js_dir, 'fragments')
+        fragments = [('sub/foo.html#a', 'caf\u00e9 \U0001f600 '),
+                     ('sub/foo.html#b', 'second section')]
+        write_fragments(fragments_dir, 'sub/foo.html', fragments,
+                        bundle=True)
+
+        self.assertEqual(os.listdir(os.path.join(fragments_dir, 'sub')),
+                         ['foo.html.fragments'])
+        bundle = load_jsonp(
+            os.path.join(fragments_dir, 'sub', 'foo.html.fragments'),
+            'fragments_downloaded_cb')
+        self.assertEqual(bundle['url'], 'sub/foo.html')
+        for url, text in fragments:
+            self.assertEqual(get_bundled_fragment(bundle, url), text)
+
+    def test_bundled_fragments(self):
+        fragments_dir = os.path.join(self.__js_dir, 'search',
+                                     'hotdoc_fragments')
+        index = self.__new_index(fragments_format='pages')
+        self.__fill(index, 'foo')
+        self.__fill(index, 'foo', 'bar')
+        index.save()
+
+        self.assertEqual(os.listdir(fragments_dir), ['foo.html.fragments'])
+        bundle = load_jsonp(os.path.join(fragments_dir, 'foo.html.fragments'),
+                            'fragments_downloaded_cb')
+        self.assertIn('bar',
+                      get_bundled_fragment(bundle, 'foo.html#foo-section'))
+
+    def test_non_ascii_tokens(self):
+        index = self.__new_index()
+        # Decomposed form of Café
+        self.__fill(index, 'foo', 'Grüße, Café and '
+                    '東京, also %s' % ('x' * 200))
+        index.save()
+
+        for token in ('Grüße', 'grüße', 'Café',
+                      'café', '東京'):
+            self.assertTrue(self.__token_exists(token))
+            contents = load_jsonp(
+                os.path.join(self.__js_dir, 'search', token),
+                'urls_downloaded_cb')
+            self.assertEqual(contents['token'], token)
+            self.assertEqual([url['url'] for url in contents['urls']],
+                             ['foo.html#foo-section'])
+        # Too long to be a file name
+        self.assertFalse(self.__token_exists('x' * 200))
+
+        trie = CompactTrie.from_file(
+            os.path.join(self.__private_dir, 'search.trie'))
+        self.assertTrue(trie.exists('grüße'))
+        self.assertTrue(trie.exists('東京'))
+
+        fragment = load_jsonp(
+            os.path.join(self.__js_dir, 'search', 'hotdoc_fragments',
+                         'foo.html-foo-section.fragment'),
+            'fragment_downloaded_cb')
+        self.assertIn('Grüße', fragment['fragment'])
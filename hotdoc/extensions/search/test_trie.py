@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+import unittest
+
+from hotdoc.extensions.search.trie import Trie, CompactTrie
+
+
+WORDS = ['foo', 'foobar', 'fo', 'bar', 'baz', 'b', 'gst_buffer_new']
+
+
+class TestCompactTrie(unittest.TestCase):
+    def test_words(self):
+        trie = CompactTrie.from_words(WORDS)
+        for word in WORDS:
+            self.assertTrue(trie.exists(word))
+        for word in ('f', 'ba', 'foobarbaz', 'qux', ''):
+            self.assertFalse(trie.exists(word))
+        self.assertEqual(trie.words(), sorted(WORDS))
+
+    def test_same_nodes_as_trie(self):
+        trie = Trie()
+        for word in WORDS:
+            trie.insert(word)
+
+        legacy_data, _ = trie.encode()
+        # The root and the unrolled nodes
+        self.assertEqual(len(CompactTrie.from_words(WORDS)),
+                         len(legacy_data) // 4)
+
+    def test_unicode(self):
+        words = ['café', 'caf', 'über', '\U0001f600x',
+                 '文档']
+        trie = CompactTrie.decode(CompactTrie.from_words(words).encode()[0])
+        self.assertEqual(trie.words(), sorted(words))
+        self.assertTrue(trie.exists('\U0001f600x'))
+        self.assertFalse(trie.exists('\U0001f600'))
+
+    def test_wide_alphabet(self):
+        words = [chr(0x4e00 + i) * 2 for i in range(300)]
+        trie = CompactTrie.from_words(words)
+        self.assertEqual(trie.letters.itemsize, 2)
+        trie = CompactTrie.decode(trie.encode()[0])
+        self.assertEqual(trie.words(), sorted(words))
+
+    def test_bad_format(self):
+        data, _ = CompactTrie.from_words(WORDS).encode()
+        with self.assertRaises(ValueError):
+            CompactTrie.decode(b'XXXX' + data[4:])
+
+    def test_minimize(self):
+        words = WORDS + ['car', 'cars', 'bars', 'tar', 'tars', 'caf\u00e9']
+        trie = CompactTrie.from_words(words)
+        dawg = CompactTrie.from_words(words, minimize=True)
+
+        self.assertLess(len(dawg), len(trie))
+        dawg = CompactTrie.decode(dawg.encode()[0])
+        self.assertTrue(dawg.minimized)
+        self.assertFalse(trie.minimized)
+        self.assertEqual(dawg.words(), sorted(words))
+        for word in ('ta', 'carsbars', 'ars'):
+            self.assertFalse(dawg.exists(word))
+
+    def test_search(self):
+        legacy = Trie()
+        for word in WORDS:
+            legacy.insert(word)
+
+        expected = sorted(legacy.search('fob', 2))
+        self.assertIn(('foo', 1), expected)
+        for minimize in (False, True):
+            trie = CompactTrie.from_words(WORDS, minimize=minimize)
+            self.assertEqual(trie.search('fob', 2), expected)
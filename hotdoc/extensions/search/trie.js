@@ -23,10 +23,31 @@ LETTER_MASK = 0x7F;
 FINAL_MASK = 1 << 7;
 BFT_LAST_MASK = 1 << 8;
 
-function TrieNode(trie, data) {
+/* Versioned format, written by CompactTrie in trie.py */
+TRIE_MAGIC = 'HDTR';
+TRIE_FORMAT_VERSION = 2;
+TRIE_HEADER_SIZE = 16;
+COMPACT_FINAL_MASK = 1;
+COMPACT_BFT_LAST_MASK = 1 << 1;
+COMPACT_CHILD_SHIFT = 2;
+
+/*
+ * @letter is only passed for the versioned format, where it is not
+ * part of @data
+ */
+function TrieNode(trie, data, letter) {
 	this.edges = undefined;
 	this.genitor = null;
 	this.trie = trie;
+
+	if (letter !== undefined) {
+		this.letter = letter;
+		this.is_final = (data & COMPACT_FINAL_MASK) != 0;
+		this.bft_last = (data & COMPACT_BFT_LAST_MASK) != 0;
+		this.first_child_id = data >>> COMPACT_CHILD_SHIFT;
+		return;
+	}
+
 	this.letter = String.fromCharCode((data & LETTER_MASK));
 
 	this.is_final = false;
@@ -102,14 +123,64 @@ function Trie(data, is_b64_encoded) {
 	if (is_b64_encoded) {
 		this.data = atob(data);
 	}
+
+	this.version = 1;
+	if (this.data.substring(0, 4) === TRIE_MAGIC) {
+		this.decode_compact();
+	}
+
 	this.root = this.get_node_by_index(0);
 }
 
+/*
+ * Minimized tries share children between nodes, each TrieNode is created
+ * while walking down from the root though, so genitor and get_word()
+ * still give the path that was followed.
+ */
+Trie.prototype.decode_compact = function() {
+	var bytes = new Uint8Array(this.data.length);
+	for (var i = 0; i < this.data.length; i++) {
+		bytes[i] = this.data.charCodeAt(i);
+	}
+
+	var view = new DataView(bytes.buffer);
+	this.version = view.getUint8(4);
+	if (this.version != TRIE_FORMAT_VERSION) {
+		throw new Error('Unsupported trie format ' + this.version);
+	}
+
+	var letter_width = view.getUint8(5);
+	var alphabet_size = view.getUint32(8);
+	var n_nodes = view.getUint32(12);
+	var offset = TRIE_HEADER_SIZE;
+
+	this.alphabet = [];
+	for (var i = 0; i < alphabet_size; i++, offset += 4) {
+		this.alphabet.push(String.fromCodePoint(view.getUint32(offset)));
+	}
+
+	this.node_words_offset = offset;
+	this.letters_offset = offset + n_nodes * 4;
+	this.letter_width = letter_width;
+	this.view = view;
+	this.data = null;
+};
+
 Trie.prototype.set_case_sensitive = function(case_sensitive) {
 	this.case_sensitive = case_sensitive;
 }
 
 Trie.prototype.get_node_by_index = function(idx) {
+	if (this.version != 1) {
+		var letter_offset = this.letters_offset + idx * this.letter_width;
+		var letter_id = this.letter_width == 1 ?
+			this.view.getUint8(letter_offset) :
+			this.view.getUint16(letter_offset);
+		return new TrieNode(this,
+				this.view.getUint32(this.node_words_offset + idx * 4),
+				this.alphabet[letter_id]);
+	}
+
 	var uint32be = 	bytes_to_uint32be(this.data, idx);
 	return new TrieNode(this, uint32be);
 };
@@ -127,6 +198,9 @@ Trie.prototype.lookup_node = function (word, start_node) {
 		node = start_node;
 	}
 
+	/* Iterate on code points rather than UTF-16 code units */
+	word = Array.from(word);
+
 	for (var i = 0; i < word.length; i++) {
 		var letter = word[i];
 
@@ -294,6 +368,7 @@ Trie.prototype.search_recursive = function (node, letter, word, previous_row, re
 
 Trie.prototype.search = function (word, max_cost) {
 	var corrections = {};
+	word = Array.from(word);
 	var current_row = my_range(word.length + 1);
 	var edges = this.root.get_edges();
 
@@ -22,12 +22,33 @@ has a list of edges to other nodes.
 """
 import base64
 import struct
+import sys
 import os
 
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+
 LETTER_MASK = 0x7F
 FINAL_MASK = 1 << 7
 BFT_LAST_MASK = 1 << 8
 
+# Format written by CompactTrie, Trie writes the unversioned format
+# limited to ASCII
+TRIE_MAGIC = b'HDTR'
+TRIE_FORMAT_VERSION = 2
+# magic, version, letter width, flags, alphabet size, node count
+TRIE_HEADER = struct.Struct('>4sBBHII')
+# Set when nodes with the same suffixes share their children
+TRIE_FLAG_MINIMIZED = 1
+
+# Node words of the versioned format, the letter is stored apart
+COMPACT_FINAL_MASK = 1
+COMPACT_BFT_LAST_MASK = 1 << 1
+COMPACT_CHILD_SHIFT = 2
+
+UINT32_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
 
 class TrieNode(object):
     """
@@ -150,24 +171,26 @@ class Trie(object):
 
     def remove(self, word):
         """
-        Remove a word from the trie
+        Remove a word from the trie, along with the nodes that only
+        led to it
         """
-        if (len(word)) == 0:
-            parent = None
-        else:
-            parent = self.lookup(word[:-1])
-
-        if not parent:
-            return False
-
-        node = parent.edges.get(word[-1])
+        path = [self.root]
+        for letter in word:
+            node = path[-1].edges.get(letter)
+            if node is None:
+                return False
+            path.append(node)
 
-        if not node:
+        node = path[-1]
+        if not word or not node.final:
             return False
 
         node.final = False
-        if not node.edges:
-            parent.edges.pop(word[-1])
+        for i in range(len(word), 0, -1):
+            node = path[i]
+            if node.final or node.edges:
+                break
+            path[i - 1].edges.pop(word[i - 1])
 
         return True
 
@@ -324,3 +347,311 @@ class Trie(object):
     def _encode_node(node, data):
         bin_node = node.to_binary()
         data.append(bin_node)
+
+
+def _to_big_endian(data):
+    if sys.byteorder == 'little':
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data.tobytes()
+
+
+def _from_big_endian(typecode, data):
+    res = array(typecode)
+    res.frombytes(data)
+    if sys.byteorder == 'little':
+        res.byteswap()
+    return res
+
+
+class CompactTrie(object):
+    """
+    A frozen trie, stored in flat arrays rather than one object per node.
+
+    Nodes are numbered in breadth-first order, the children of a node
+    are contiguous, each node word holds the id of the first child and
+    the final and last sibling flags, letters are indices in the
+    alphabet of the trie, so any unicode character can be stored.
+
+    Once minimized, nodes whose subtries are identical share the same
+    children, which makes it a directed acyclic word graph that can be
+    walked exactly like the trie.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, alphabet=None, node_words=None, letters=None,
+                 flags=0):
+        self.alphabet = alphabet or []
+        self.node_words = node_words or array(UINT32_TYPECODE, [0])
+        self.letters = letters or array('B', [0])
+        self.flags = flags
+        self.__letter_ids = None
+
+    def __len__(self):
+        return len(self.node_words)
+
+    @property
+    def minimized(self):
+        """
+        Whether nodes share their children
+        """
+        return bool(self.flags & TRIE_FLAG_MINIMIZED)
+
+    @classmethod
+    def from_words(cls, words, minimize=False):
+        """
+        Builds the trie of @words, level by level from the sorted words
+        rather than inserting them one by one, and minimizes it if
+        @minimize is True.
+        """
+        words = sorted(set(words))
+        alphabet = sorted(set(''.join(words)))
+        letter_ids = {letter: id_ for id_, letter in enumerate(alphabet)}
+
+        node_words = array(UINT32_TYPECODE, [0])
+        letters = array('B' if len(alphabet) <= 0x100 else 'H', [0])
+        if len(alphabet) > 0x10000:
+            raise OverflowError("Too many distinct letters to encode")
+
+        # The children of a node at depth d split its words where the
+        # common prefix of two consecutive words is d letters long
+        splits = defaultdict(list)
+        for i in range(1, len(words)):
+            splits[len(os.path.commonprefix(
+                (words[i - 1], words[i])))].append(i)
+
+        # Each node spans the words it prefixes
+        queue = deque([(0, 0, len(words), 0)])
+        while queue:
+            node_id, low, high, depth = queue.popleft()
+            # Sorting puts the word ending at this node first
+            if low < high and len(words[low]) == depth:
+                node_words[node_id] |= COMPACT_FINAL_MASK
+                low += 1
+
+            if low == high:
+                continue
+
+            node_words[node_id] |= len(node_words) << COMPACT_CHILD_SHIFT
+            depth_splits = splits[depth]
+            bounds = depth_splits[bisect_right(depth_splits, low):
+                                  bisect_left(depth_splits, high)]
+            bounds.append(high)
+            start = low
+            for end in bounds:
+                queue.append((len(node_words), start, end, depth + 1))
+                node_words.append(COMPACT_BFT_LAST_MASK if end == high
+                                  else 0)
+                letters.append(letter_ids[words[start][depth]])
+                start = end
+
+        if len(node_words) >= 1 << (32 - COMPACT_CHILD_SHIFT):
+            raise OverflowError("Too many nodes would need to be encoded")
+
+        res = cls(alphabet, node_words, letters)
+        if minimize:
+            res = res.minimize()
+        return res
+
+    # pylint: disable=too-many-locals
+    def minimize(self):
+        """
+        Returns an equivalent trie where children lists with the same
+        letters, final flags and grandchildren are stored once.
+        """
+        node_words = self.node_words
+        letters = self.letters
+
+        # Children come after their parent, so in reverse order the
+        # children lists of the children of a node are known before it
+        list_ids = array(UINT32_TYPECODE, bytes(4 * len(node_words)))
+        registry = {}
+        lists = [()]
+        for node_id in range(len(node_words) - 1, -1, -1):
+            children = tuple(
+                (letters[child_id],
+                 node_words[child_id] & COMPACT_FINAL_MASK,
+                 list_ids[child_id])
+                for child_id in self.__children(node_id))
+            if not children:
+                continue
+
+            list_id = registry.get(children)
+            if list_id is None:
+                list_id = registry[children] = len(lists)
+                lists.append(children)
+            list_ids[node_id] = list_id
+
+        # Lay the lists out breadth first from the root
+        offsets = {0: 0}
+        order = []
+        next_offset = 1
+        queue = deque([list_ids[0]])
+        while queue:
+            list_id = queue.popleft()
+            if list_id in offsets:
+                continue
+            offsets[list_id] = next_offset
+            next_offset += len(lists[list_id])
+            order.append(list_id)
+            queue.extend(child_list_id for _, _, child_list_id
+                         in lists[list_id])
+
+        new_words = array(UINT32_TYPECODE, [
+            (offsets[list_ids[0]] << COMPACT_CHILD_SHIFT) |
+            (node_words[0] & COMPACT_FINAL_MASK)])
+        new_letters = array(letters.typecode, [0])
+        for list_id in order:
+            children = lists[list_id]
+            for i, (letter, final, child_list_id) in enumerate(children):
+                word = offsets[child_list_id] << COMPACT_CHILD_SHIFT | final
+                if i == len(children) - 1:
+                    word |= COMPACT_BFT_LAST_MASK
+                new_words.append(word)
+                new_letters.append(letter)
+
+        return CompactTrie(self.alphabet, new_words, new_letters,
+                           self.flags | TRIE_FLAG_MINIMIZED)
+
+    @classmethod
+    def decode(cls, data):
+        """
+        Deserializes the trie from @data
+        """
+        magic, version, letter_width, flags, alphabet_size, n_nodes = \
+            TRIE_HEADER.unpack_from(data)
+        if magic != TRIE_MAGIC or version != TRIE_FORMAT_VERSION:
+            raise ValueError("Unsupported trie format")
+
+        offset = TRIE_HEADER.size
+        alphabet = [chr(code) for code in _from_big_endian(
+            UINT32_TYPECODE, data[offset:offset + alphabet_size * 4])]
+        offset += alphabet_size * 4
+        node_words = _from_big_endian(UINT32_TYPECODE,
+                                      data[offset:offset + n_nodes * 4])
+        offset += n_nodes * 4
+        letters = _from_big_endian(
+            'B' if letter_width == 1 else 'H',
+            data[offset:offset + n_nodes * letter_width])
+
+        return cls(alphabet, node_words, letters, flags)
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        Loads the trie dumped to @filename
+        """
+        with open(filename, 'rb') as _:
+            return cls.decode(_.read())
+
+    def encode(self):
+        """
+        Encode the trie
+        """
+        res = b''.join([
+            TRIE_HEADER.pack(TRIE_MAGIC, TRIE_FORMAT_VERSION,
+                             self.letters.itemsize, self.flags,
+                             len(self.alphabet),
+                             len(self.node_words)),
+            _to_big_endian(array(UINT32_TYPECODE,
+                                 [ord(letter) for letter in self.alphabet])),
+            _to_big_endian(self.node_words),
+            _to_big_endian(self.letters)])
+        return res, base64.b64encode(res)
+
+    def to_file(self, raw_filename, js_filename=None):
+        """
+        Dump the trie
+        """
+        data, b64_data = self.encode()
+        with open(raw_filename, 'wb') as _:
+            _.write(data)
+
+        if js_filename is not None:
+            with open(js_filename, 'wb') as _:
+                _.write(b'var trie_data="%s";' % b64_data)
+
+    def __children(self, node_id):
+        child_id = self.node_words[node_id] >> COMPACT_CHILD_SHIFT
+        while child_id:
+            yield child_id
+            if self.node_words[child_id] & COMPACT_BFT_LAST_MASK:
+                break
+            child_id += 1
+
+    def lookup(self, word):
+        """
+        Returns the id of the node reached with @word, or None
+        """
+        if self.__letter_ids is None:
+            self.__letter_ids = {letter: id_ for id_, letter
+                                 in enumerate(self.alphabet)}
+
+        node_id = 0
+        for letter in word:
+            letter_id = self.__letter_ids.get(letter)
+            if letter_id is None:
+                return None
+
+            for child_id in self.__children(node_id):
+                if self.letters[child_id] == letter_id:
+                    node_id = child_id
+                    break
+            else:
+                return None
+
+        return node_id
+
+    def exists(self, word):
+        """
+        Check if a word exists in the trie
+        """
+        node_id = self.lookup(word)
+        return (node_id is not None and
+                bool(self.node_words[node_id] & COMPACT_FINAL_MASK))
+
+    def words(self):
+        """
+        Returns all the words of the trie, sorted
+        """
+        res = []
+        stack = [(0, '')]
+        while stack:
+            node_id, prefix = stack.pop()
+            if self.node_words[node_id] & COMPACT_FINAL_MASK:
+                res.append(prefix)
+            for child_id in self.__children(node_id):
+                stack.append((child_id,
+                              prefix + self.alphabet[self.letters[child_id]]))
+
+        return sorted(res)
+
+    def search(self, word, max_cost):
+        """
+        Search for a word in the trie, with the levensthein algorithm
+        """
+        results = []
+        first_row = list(range(len(word) + 1))
+        stack = [(child_id, '', first_row)
+                 for child_id in self.__children(0)]
+
+        while stack:
+            node_id, prefix, previous_row = stack.pop()
+            letter = self.alphabet[self.letters[node_id]]
+            current_word = prefix + letter
+            current_row = [previous_row[0] + 1]
+            for column in range(1, len(word) + 1):
+                current_row.append(min(
+                    current_row[column - 1] + 1,
+                    previous_row[column] + 1,
+                    previous_row[column - 1] + (word[column - 1] != letter)))
+
+            if (current_row[-1] <= max_cost and
+                    self.node_words[node_id] & COMPACT_FINAL_MASK):
+                results.append((current_word, current_row[-1]))
+
+            if min(current_row) <= max_cost:
+                stack.extend((child_id, current_word, current_row)
+                             for child_id in self.__children(node_id))
+
+        return sorted(results)
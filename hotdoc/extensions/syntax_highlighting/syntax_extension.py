@@ -22,6 +22,7 @@ A syntax highlighting module
 import os
 
 from hotdoc.core.extension import Extension
+from hotdoc.core.formatter import Formatter
 
 from hotdoc.utils.utils import recursive_overwrite
 
@@ -43,7 +44,6 @@ class SyntaxHighlightingExtension(Extension):
 
     def __init__(self, app, project):
         Extension.__init__(self, app, project)
-        self.__asset_folders = set()
         self.activated = False
 
     def __formatting_page_cb(self, formatter, page):
@@ -58,14 +58,17 @@ class SyntaxHighlightingExtension(Extension):
         page.output_attrs['html']['scripts'].add(
             os.path.join(HERE, 'prism_autoloader_path_override.js'))
 
-        folder = os.path.join('html', 'assets', 'prism_components')
-        self.__asset_folders.add(folder)
-
     def __formatted_cb(self, project):
+        # Pages may have been formatted in other processes, look at
+        # the merged scripts to know whether prism was used
+        if os.path.join(HERE, 'prism', 'components', 'prism-core.js') \
+                not in Formatter.all_scripts:
+            return
+
         ipath = os.path.join(HERE, 'prism', 'components')
-        for folder in self.__asset_folders:
-            opath = os.path.join(self.app.output, folder)
-            recursive_overwrite(ipath, opath)
+        opath = os.path.join(self.app.output, 'html', 'assets',
+                             'prism_components')
+        recursive_overwrite(ipath, opath)
 
     def setup(self):
         super(SyntaxHighlightingExtension, self).setup()
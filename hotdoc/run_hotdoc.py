@@ -23,10 +23,13 @@
 import argparse
 import cProfile
 import json
+import multiprocessing
 import os
 import pickle
 import shutil
 import sys
+import threading
+import time
 import traceback
 
 from urllib.parse import urlparse
@@ -36,13 +39,15 @@ from hotdoc.core.project import Project, CoreExtension
 from hotdoc.core.config import Config, load_config_json
 from hotdoc.core.exceptions import HotdocException
 from hotdoc.core.filesystem import ChangeTracker
-from hotdoc.core.database import Database
+from hotdoc.core.database import Database, DATABASE_STORES
+from hotdoc.core.formatter import Formatter
 from hotdoc.core.links import LinkResolver, Link
 from hotdoc.utils.utils import all_subclasses, get_extension_classes, get_cat
 from hotdoc.utils.loggable import Logger, error, info
 from hotdoc.utils.setup_utils import VERSION
 from hotdoc.utils.configurable import Configurable
 from hotdoc.utils.signals import Signal
+from hotdoc.utils.watcher import create_watcher, get_modified_since
 
 
 class Application(Configurable):
@@ -63,6 +68,7 @@ class Application(Configurable):
         self.link_resolver = None
         self.dry = False
         self.incremental = False
+        self.jobs = 1
         self.config = None
         self.project = None
         self.formatted_signal = Signal()
@@ -82,16 +88,32 @@ class Application(Configurable):
                             dest="output",
                             help="where to output the rendered "
                             "documentation")
+        parser.add_argument('--database-store', action='store',
+                            dest='database_store',
+                            choices=sorted(DATABASE_STORES.keys()),
+                            default='sqlite',
+                            help='How symbols and comments are persisted '
+                            'in the private folder')
+        parser.add_argument('--jobs', action='store', type=int,
+                            dest='jobs', default=1,
+                            help='Number of workers to build with. It sizes '
+                            'the page formatting and search indexing '
+                            'processes, the C comment parsing processes, '
+                            'and the page write-out, clang parsing and '
+                            'file hashing threads')
 
     def parse_config(self, config):
         self.config = config
         self.output = config.get_path('output')
         self.dry = config.get('dry')
+        self.jobs = max(1, config.get('jobs', 1))
         self.project = Project(self)
         self.project.parse_name_from_config(self.config)
         self.private_folder = os.path.abspath(
             'hotdoc-private-%s' % self.project.sanitized_name)
-        self.__create_change_tracker(self.config.get('disable_incremental'))
+        self.__create_change_tracker(
+            self.config.get('disable_incremental'),
+            self.config.get('change_detection') == 'content')
         self.project.parse_config(self.config, toplevel=True)
 
         self.__setup_private_folder()
@@ -186,8 +208,10 @@ class Application(Configurable):
 
         info('Persisting database and private files', 'persisting')
 
+        Formatter.page_buffer.flush()
         project.persist()
         self.database.persist()
+        self.database.close()
         with open(os.path.join(self.private_folder,
                                'change_tracker.p'), 'wb') as _:
             _.write(pickle.dumps(self.change_tracker))
@@ -199,6 +223,23 @@ class Application(Configurable):
         """
         self.project.finalize()
 
+    def get_watched_paths(self):
+        """
+        Returns the set of input files a rebuild should be triggered for
+        """
+        paths = set(self.change_tracker.hard_deps_mtimes.keys())
+        for mtimes in self.change_tracker.mtimes.values():
+            paths |= set(mtimes.keys())
+
+        for project in self.__all_projects.values():
+            if project.sitemap_path:
+                paths.add(project.sitemap_path)
+
+        if self.config.conf_file:
+            paths.add(os.path.abspath(self.config.conf_file))
+
+        return paths
+
     def __setup_private_folder(self):
         if os.path.exists(self.private_folder):
             if not os.path.isdir(self.private_folder):
@@ -208,18 +249,29 @@ class Application(Configurable):
             os.mkdir(self.private_folder)
 
     def __setup_database(self):
-        self.database = Database(self.private_folder)
+        self.database = Database(self.private_folder,
+                                 self.config.get('database_store', 'sqlite'))
         self.link_resolver = LinkResolver(self.database)
 
-    def __create_change_tracker(self, disable_incremental):
+    def __create_change_tracker(self, disable_incremental, hash_contents):
         if not disable_incremental:
             try:
                 with open(os.path.join(self.private_folder,
                                        'change_tracker.p'), 'rb') as _:
                     self.change_tracker = pickle.loads(_.read())
 
+                # Files recorded with another mode will simply be stale
+                self.change_tracker.hash_contents = hash_contents
+                self.change_tracker.jobs = self.jobs
                 if self.change_tracker.hard_dependencies_are_stale():
                     raise IOError
+                # The stamps are meaningless without the entries they
+                # were recorded with, for example when a private folder
+                # written with another database store is reused
+                store = DATABASE_STORES[
+                    self.config.get('database_store', 'sqlite')]
+                if not store(self.private_folder).exists():
+                    raise IOError
                 self.incremental = True
                 info("Building incrementally")
             # pylint: disable=broad-except
@@ -229,7 +281,7 @@ class Application(Configurable):
         if not self.incremental:
             info("Building from scratch")
             shutil.rmtree(self.private_folder, ignore_errors=True)
-            self.change_tracker = ChangeTracker()
+            self.change_tracker = ChangeTracker(hash_contents, self.jobs)
 
 
 def check_path(init_dir, name):
@@ -295,6 +347,137 @@ def create_default_layout(config):
             pass
 
 
+def _build_in_child(config, ext_classes, conn):
+    res = 1
+    paths = set()
+    app = Application(ext_classes)
+    try:
+        # The configuration file may have been modified since the
+        # previous build
+        config = config.reload()
+        Logger.parse_config(config)
+        app.parse_config(config)
+        res = app.run()
+        paths = app.get_watched_paths()
+    except HotdocException:
+        res = len(Logger.get_issues())
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+    finally:
+        if app.project:
+            app.finalize()
+        conn.send((res, paths))
+        conn.close()
+
+
+def _build(config, ext_classes):
+    # Every build happens in a forked process: the extension modules
+    # and the theme stay loaded in this process, and the state
+    # extensions keep at the class level does not leak from one build
+    # to the next. The database, trees and formatters are loaded again
+    # from the private folder by each build.
+    context = multiprocessing.get_context('fork')
+    reader, writer = context.Pipe(duplex=False)
+    proc = context.Process(target=_build_in_child,
+                           args=(config, ext_classes, writer))
+    proc.start()
+    writer.close()
+    try:
+        res, paths = reader.recv()
+    except EOFError:
+        res, paths = 1, set()
+    proc.join()
+
+    return res, paths
+
+
+def _serve(output, port):
+    # Only needed by the serve command
+    import socketserver
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+    root = os.path.abspath(os.path.join(output, 'html'))
+
+    class _Handler(SimpleHTTPRequestHandler):
+        def translate_path(self, path):
+            # The base implementation serves the current directory
+            path = SimpleHTTPRequestHandler.translate_path(self, path)
+            return os.path.join(root, os.path.relpath(path, os.getcwd()))
+
+    class _Server(socketserver.ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    server = _Server(('localhost', port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print('Serving documentation at http://localhost:%d/' % port)
+    return server
+
+
+def watch(config, ext_classes, serve=False):
+    """
+    Builds the documentation, then rebuilds it incrementally whenever
+    one of its input files changes, until interrupted.
+
+    Each build runs in a forked process, which reloads the configuration
+    file and the incremental state saved in the private folder, as
+    `hotdoc run` would: only the startup of hotdoc and the loading of
+    the extensions are saved, the database, trees and formatters are
+    not kept in memory from one build to the next.
+
+    Args:
+        config: hotdoc.core.config.Config, the configuration.
+        ext_classes: list, the extension classes to use.
+        serve: bool, whether to also serve the output over http.
+    Returns:
+        int: the exit code
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        print('The watch and serve commands are not supported on this '
+              'platform')
+        return 1
+
+    watcher = create_watcher(config.get('watch_interval', 0.5))
+    server = None
+    res = 0
+
+    try:
+        while True:
+            start = time.perf_counter()
+            build_start = time.time()
+            res, paths = _build(config, ext_classes)
+            print('Built documentation in %.2f seconds%s' % (
+                time.perf_counter() - start,
+                ' with %d issues' % res if res else ''))
+
+            if serve and server is None and config.get_path('output'):
+                server = _serve(config.get_path('output'),
+                                 config.get('serve_port', 8000))
+
+            watcher.set_paths(paths)
+            # The files saved while the build was running
+            changed = get_modified_since(paths, build_start)
+            if not changed:
+                changed = watcher.wait()
+            # Give editors saving several files some time to finish
+            while True:
+                more = watcher.wait(timeout=0.1)
+                if not more:
+                    break
+                changed += more
+
+            print('%s changed, rebuilding' % ', '.join(
+                os.path.relpath(path) for path in sorted(set(changed))))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if server:
+            server.shutdown()
+
+    return res
+
+
 # pylint: disable=too-many-branches
 # pylint: disable=too-many-statements
 def execute_command(parser, config, ext_classes):
@@ -327,6 +510,8 @@ def execute_command(parser, config, ext_classes):
             res = 1
         finally:
             app.finalize()
+    elif cmd in ('watch', 'serve'):
+        res = watch(config, ext_classes, serve=cmd == 'serve')
     elif cmd == 'init':
         try:
             create_default_layout(config)
@@ -393,8 +578,17 @@ def run(args):
         return 1
 
     parser.add_argument('command', action="store",
-                        choices=('run', 'conf', 'init', 'help'),
+                        choices=('run', 'watch', 'serve', 'conf', 'init',
+                                 'help'),
                         nargs="?")
+    parser.add_argument('--watch-interval', type=float, default=0.5,
+                        dest='watch_interval',
+                        help='Interval in seconds at which the watch and '
+                        'serve commands poll for modifications, when '
+                        'inotify is not available')
+    parser.add_argument('--serve-port', type=int, default=8000,
+                        dest='serve_port',
+                        help='Port the serve command listens on')
     parser.add_argument('--output-conf-file',
                         help='Path where to save the updated conf'
                         ' file',
@@ -431,6 +625,12 @@ def run(args):
                         default=False,
                         dest="disable_incremental",
                         help="Disable incremental build")
+    parser.add_argument("--change-detection", action="store",
+                        choices=['mtime', 'content'], default='mtime',
+                        dest="change_detection",
+                        help="How modified files are detected in "
+                        "incremental builds, 'content' only considers "
+                        "files whose contents changed")
 
     add_args_methods = set()
 
@@ -55,6 +55,7 @@ class HotdocTest(unittest.TestCase):
         self.database = Database(self.private_folder)
         self.link_resolver = LinkResolver(self.database)
         self.incremental = False
+        self.jobs = 1
         self.sanitized_name = 'test-project-0.1'
         self.tree = Tree(self, self)
 
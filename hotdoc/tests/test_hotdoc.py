@@ -30,6 +30,7 @@ from contextlib import redirect_stdout
 from hotdoc.utils.utils import touch
 from hotdoc.utils.loggable import Logger
 from hotdoc.run_hotdoc import run
+from hotdoc.cli import run_introspection
 
 
 class TestHotdoc(unittest.TestCase):
@@ -107,6 +108,193 @@ class TestHotdoc(unittest.TestCase):
 
         self.assertOutput(1)
 
+    def test_incremental_write_out(self):
+        self.__create_md_file('index.markdown',
+                              "## A very simple index\n")
+        self.__create_md_file('foo.markdown', "## Foo\n")
+        self.__create_md_file('bar.markdown', "## Bar\n")
+
+        with open(os.path.join(self.__md_dir, 'sitemap.txt'), 'w') as _:
+            _.write('index.markdown\n\tfoo.markdown\n\tbar.markdown')
+
+        args = ['--index', os.path.join(self.__md_dir, 'index.markdown'),
+                '--output', self.__output_dir,
+                '--project-name', 'test-project',
+                '--project-version', '0.1',
+                '--sitemap', os.path.join(self.__md_dir, 'sitemap.txt'),
+                'run']
+        self.assertEqual(run(args), 0)
+        self.assertOutput(3)
+
+        html_dir = os.path.join(self.__output_dir, 'html')
+        for name in ('index.html', 'foo.html', 'bar.html'):
+            os.utime(os.path.join(html_dir, name), (0, 0))
+
+        touch(os.path.join(self.__md_dir, 'foo.markdown'))
+        self.assertEqual(run(args), 0)
+
+        # index lists foo as a subpage
+        self.assertNotEqual(
+            os.path.getmtime(os.path.join(html_dir, 'index.html')), 0)
+        self.assertNotEqual(
+            os.path.getmtime(os.path.join(html_dir, 'foo.html')), 0)
+        self.assertEqual(
+            os.path.getmtime(os.path.join(html_dir, 'bar.html')), 0)
+
+    def test_switch_database_store(self):
+        self.__create_md_file('index.markdown',
+                              "## A very simple index\n")
+        self.__create_md_file('foo.markdown', "## Foo\n")
+
+        with open(os.path.join(self.__md_dir, 'sitemap.txt'), 'w') as _:
+            _.write('index.markdown\n\tfoo.markdown')
+
+        args = ['--index', os.path.join(self.__md_dir, 'index.markdown'),
+                '--output', self.__output_dir,
+                '--project-name', 'test-project',
+                '--project-version', '0.1',
+                '--sitemap', os.path.join(self.__md_dir, 'sitemap.txt')]
+        self.assertEqual(
+            run(args + ['--database-store', 'folders', 'run']), 0)
+
+        html_dir = os.path.join(self.__output_dir, 'html')
+        os.utime(os.path.join(html_dir, 'foo.html'), (0, 0))
+
+        # Nothing changed, but the sqlite store is empty: the change
+        # tracker left by the previous run must not be trusted
+        self.assertEqual(
+            run(args + ['--database-store', 'sqlite', 'run']), 0)
+        self.assertOutput(2)
+        self.assertNotEqual(
+            os.path.getmtime(os.path.join(html_dir, 'foo.html')), 0)
+
+    def test_incremental_assets(self):
+        self.__create_md_file('index.markdown',
+                              "## A very simple index\n")
+        self.__create_md_file('foo.markdown', "## Foo\n")
+        self.__create_md_file('bar.markdown',
+                              "## Bar\n\n![An image](image.png)\n\n"
+                              "![A missing image](missing.png)\n")
+        with open(os.path.join(self.__md_dir, 'image.png'), 'wb') as _:
+            _.write(b'first')
+
+        with open(os.path.join(self.__md_dir, 'sitemap.txt'), 'w') as _:
+            _.write('index.markdown\n\tfoo.markdown\n\tbar.markdown')
+
+        args = ['--index', os.path.join(self.__md_dir, 'index.markdown'),
+                '--output', self.__output_dir,
+                '--project-name', 'test-project',
+                '--project-version', '0.1',
+                '--sitemap', os.path.join(self.__md_dir, 'sitemap.txt'),
+                'run']
+
+        def get_warnings(journal_start):
+            return [entry.code for entry in Logger.journal[journal_start:]
+                    if entry.code == 'bad-image-src']
+
+        journal_start = len(Logger.journal)
+        run(args)
+        self.assertEqual(get_warnings(journal_start), ['bad-image-src'])
+
+        html_dir = os.path.join(self.__output_dir, 'html')
+        with open(os.path.join(html_dir, 'image.png'), 'rb') as _:
+            self.assertEqual(_.read(), b'first')
+        os.utime(os.path.join(html_dir, 'bar.html'), (0, 0))
+
+        with open(os.path.join(self.__md_dir, 'image.png'), 'wb') as _:
+            _.write(b'second')
+        touch(os.path.join(self.__md_dir, 'foo.markdown'))
+
+        journal_start = len(Logger.journal)
+        run(args)
+
+        # bar was not written out again, its assets are still copied
+        # and its warnings still reported
+        self.assertEqual(
+            os.path.getmtime(os.path.join(html_dir, 'bar.html')), 0)
+        with open(os.path.join(html_dir, 'image.png'), 'rb') as _:
+            self.assertEqual(_.read(), b'second')
+        self.assertEqual(get_warnings(journal_start), ['bad-image-src'])
+
+    def test_parallel_format(self):
+        self.__create_md_file('index.markdown',
+                              "## A very simple index\n")
+        sitemap = 'index.markdown'
+        for i in range(8):
+            self.__create_md_file('page-%d.markdown' % i,
+                                  "## Page %d\n\nSee [the index]"
+                                  "(index.markdown)\n" % i)
+            sitemap += '\n\tpage-%d.markdown' % i
+
+        with open(os.path.join(self.__md_dir, 'sitemap.txt'), 'w') as _:
+            _.write(sitemap)
+
+        outputs = []
+        for jobs in ('1', '4'):
+            output = os.path.join(self._test_dir, 'html-jobs-%s' % jobs)
+            args = ['--index', os.path.join(self.__md_dir, 'index.markdown'),
+                    '--output', output,
+                    '--project-name', 'test-project',
+                    '--project-version', '0.1',
+                    '--sitemap', os.path.join(self.__md_dir, 'sitemap.txt'),
+                    '--disable-incremental-build',
+                    '--jobs', jobs,
+                    'run']
+            self.assertEqual(run(args), 0)
+            outputs.append(os.path.join(output, 'html'))
+
+        html_files = sorted(f for f in os.listdir(outputs[0])
+                            if f.endswith('.html'))
+        self.assertEqual(len(html_files), 9)
+        self.assertEqual(
+            html_files,
+            sorted(f for f in os.listdir(outputs[1]) if f.endswith('.html')))
+        for fname in html_files:
+            with open(os.path.join(outputs[0], fname), 'rb') as serial, \
+                    open(os.path.join(outputs[1], fname), 'rb') as parallel:
+                self.assertEqual(serial.read(), parallel.read())
+
+    def test_parallel_format_license(self):
+        index_path = self.__create_md_file('index.markdown',
+                                           "## A very simple index\n")
+        sitemap = 'index.markdown'
+        for i in range(4):
+            self.__create_md_file('page-%d.markdown' % i,
+                                  "## Page %d\n" % i)
+            sitemap += '\n\tpage-%d.markdown' % i
+        sitemap_path = self.__create_sitemap('sitemap.txt', sitemap)
+
+        outputs = []
+        # The parallel run goes first, assets installed by a serial run
+        # would otherwise be remembered
+        for jobs in (4, 1):
+            output = os.path.join(self._test_dir, 'html-jobs-%d' % jobs)
+            conf_path = self.__create_conf_file(
+                'hotdoc-jobs-%d.json' % jobs,
+                {'index': index_path,
+                 'output': output,
+                 'project_name': 'test-project',
+                 'project_version': '0.1',
+                 'sitemap': sitemap_path,
+                 'default-license': 'CC0-1.0',
+                 'disable_incremental': True,
+                 'jobs': jobs})
+            self.assertEqual(run(['run', '--conf-file', conf_path]), 0)
+            outputs.append(os.path.join(output, 'html'))
+
+        for fname in ('CC0-1.0.txt', 'CC0-1.0.png'):
+            for output in outputs:
+                self.assertTrue(
+                    os.path.exists(os.path.join(output, 'assets', fname)))
+
+        html_files = sorted(f for f in os.listdir(outputs[0])
+                            if f.endswith('.html'))
+        self.assertEqual(len(html_files), 5)
+        for fname in html_files:
+            with open(os.path.join(outputs[0], fname), 'rb') as parallel, \
+                    open(os.path.join(outputs[1], fname), 'rb') as serial:
+                self.assertEqual(serial.read(), parallel.read())
+
     def test_error(self):
         args = ['--index', os.path.join(self.__md_dir, 'index.markdown'),
                 '--output', self.__output_dir,
@@ -242,3 +430,65 @@ class TestHotdoc(unittest.TestCase):
         self.assertEqual(res, 0)
         path = f.getvalue().strip()
         self.assertTrue(os.path.basename(path).startswith('hotdoc-private'))
+
+    def test_introspection(self):
+        conf_file = self.__create_conf_file('hotdoc.json',
+                                            {'project_name': 'test-project',
+                                             'project_version': '0.1',
+                                             'output': 'html'})
+
+        for args in (['--version'],
+                     ['--conf-file', conf_file, '--get-conf-key',
+                      'project_name'],
+                     ['--conf-file', conf_file, '--get-conf-path', 'output'],
+                     ['--conf-file', conf_file, '--get-private-folder'],
+                     ['--has-extension', 'search-extension']):
+            f = io.StringIO()
+            with redirect_stdout(f):
+                res = run_introspection(args)
+            self.assertEqual(res, 0)
+
+            full = io.StringIO()
+            with redirect_stdout(full):
+                self.assertEqual(run(args), 0)
+            self.assertEqual(f.getvalue(), full.getvalue())
+
+        # Extension arguments need the full parser
+        self.assertIsNone(run_introspection(
+            ['--conf-file', conf_file, '--c-sources', 'foo.c',
+             '--get-conf-key', 'project_name']))
+        # Unknown keys may have a default only the full parser knows about
+        self.assertIsNone(run_introspection(
+            ['--conf-file', conf_file, '--get-conf-key', 'html_theme']))
+
+    def test_introspection_extra_extension_path(self):
+        ext_dir = os.path.join(self._test_dir, 'extra-extensions')
+        dist_dir = os.path.join(ext_dir, 'test_extra_ext-1.0.dist-info')
+        os.makedirs(dist_dir)
+        with open(os.path.join(ext_dir, 'test_extra_ext.py'), 'w') as _:
+            _.write('from hotdoc.core.extension import Extension\n\n\n'
+                    'class TestExtraExtension(Extension):\n'
+                    '    extension_name = "test-extra-extension"\n\n\n'
+                    'def get_extension_classes():\n'
+                    '    return [TestExtraExtension]\n')
+        with open(os.path.join(dist_dir, 'METADATA'), 'w') as _:
+            _.write('Metadata-Version: 2.1\nName: test-extra-ext\n'
+                    'Version: 1.0\n')
+        with open(os.path.join(dist_dir, 'entry_points.txt'), 'w') as _:
+            _.write('[hotdoc.extensions]\nget_extension_classes = '
+                    'test_extra_ext:get_extension_classes\n')
+
+        # The extension path is only listed in the configuration file
+        conf_file = self.__create_conf_file(
+            'hotdoc.json', {'extra_extension_path': [ext_dir]})
+        args = ['--conf-file', conf_file,
+                '--has-extension', 'test-extra-extension']
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            self.assertEqual(run_introspection(args), 0)
+
+        full = io.StringIO()
+        with redirect_stdout(full):
+            self.assertEqual(run(args), 0)
+        self.assertEqual(f.getvalue(), full.getvalue())
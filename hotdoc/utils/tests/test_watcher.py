@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015,2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2015,2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=missing-docstring
+# pylint: disable=invalid-name
+
+import unittest
+import os
+import shutil
+import threading
+import time
+
+from hotdoc.utils.watcher import (PollingWatcher, create_watcher,
+                                  get_modified_since)
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(__file__)
+        self.__dir = os.path.abspath(os.path.join(here, 'tmp-watched'))
+        shutil.rmtree(self.__dir, ignore_errors=True)
+        os.mkdir(self.__dir)
+        self.__paths = [self.__write(name, name) for name in ('a', 'b')]
+
+    def tearDown(self):
+        shutil.rmtree(self.__dir, ignore_errors=True)
+
+    def __write(self, name, contents):
+        path = os.path.join(self.__dir, name)
+        with open(path, 'w') as _:
+            _.write(contents)
+        return path
+
+    def __check_watcher(self, watcher):
+        watcher.set_paths(self.__paths)
+        self.assertEqual(watcher.wait(timeout=0.1), [])
+
+        timer = threading.Timer(0.1, self.__write, ('b', 'modified'))
+        timer.start()
+        self.assertEqual(watcher.wait(timeout=5), [self.__paths[1]])
+        timer.join()
+
+        # Editors often replace files through a rename
+        tmp_path = self.__write('a.tmp', 'replaced')
+        os.rename(tmp_path, self.__paths[0])
+        self.assertEqual(watcher.wait(timeout=5), [self.__paths[0]])
+
+        os.unlink(self.__paths[0])
+        self.assertEqual(watcher.wait(timeout=5), [self.__paths[0]])
+        watcher.close()
+
+    def test_polling(self):
+        self.__check_watcher(PollingWatcher(interval=0.01))
+
+    def test_default(self):
+        self.__check_watcher(create_watcher(interval=0.01))
+
+    def test_modified_since(self):
+        since = time.time() + 10
+        self.assertEqual(get_modified_since(self.__paths, since), [])
+
+        os.utime(self.__paths[1], (since, since))
+        missing = os.path.join(self.__dir, 'missing')
+        self.assertEqual(
+            get_modified_since(self.__paths + [missing], since),
+            [self.__paths[1]])
@@ -22,22 +22,22 @@ Toolbox
 
 import collections
 # pylint: disable=no-name-in-module
-from collections import OrderedDict, Callable
+from collections import OrderedDict, Callable, namedtuple
 import os
 import shutil
 import math
 import sys
 import re
+import json
 import pathlib
 import traceback
 
 from urllib.request import urlretrieve
 
-import pkg_resources
-from toposort import toposort_flatten
+import appdirs
 
 from hotdoc.core.exceptions import HotdocSourceException
-from hotdoc.utils.setup_utils import symlink
+from hotdoc.utils.setup_utils import symlink, VERSION
 from hotdoc.utils.loggable import error
 
 WIN32 = (sys.platform == 'win32')
@@ -129,6 +129,9 @@ def __get_extra_extension_classes(paths):
     """
     Banana banana
     """
+    # Importing pkg_resources scans all the installed distributions
+    import pkg_resources
+
     extra_classes = []
     wset = pkg_resources.WorkingSet([])
     distributions, _ = wset.find_plugins(pkg_resources.Environment(paths))
@@ -160,6 +163,10 @@ def get_extension_classes(sort, extra_extension_paths=None):
     """
     Banana banana
     """
+    # Importing pkg_resources scans all the installed distributions
+    import pkg_resources
+    from toposort import toposort_flatten
+
     all_classes = {}
     deps_map = {}
 
@@ -208,6 +215,72 @@ def get_extension_classes(sort, extra_extension_paths=None):
     sorted_classes = [klass_list[i] for i in sorted_class_indices]
     return sorted_classes
 
+
+ExtensionInfo = namedtuple('ExtensionInfo',
+                           ['extension_name', 'module', 'class_name'])
+
+
+def __get_manifest_key(extra_extension_paths):
+    # Installing or removing a distribution modifies the folder it
+    # is installed in. The current directory ('') is skipped, any file
+    # created there would invalidate the cache
+    key = [VERSION]
+    for path in sys.path + list(extra_extension_paths):
+        if not path:
+            continue
+        try:
+            key.append([path, os.stat(path).st_mtime_ns])
+        except OSError:
+            key.append([path, None])
+    return key
+
+
+def get_extension_manifest(extra_extension_paths=None):
+    """
+    Lists the available extensions without importing them.
+
+    The list is cached in the user cache directory, and only refreshed,
+    by importing all the extensions, when the installed distributions
+    or @extra_extension_paths were modified.
+
+    Returns:
+        list: a list of `ExtensionInfo`
+    """
+    extra_extension_paths = extra_extension_paths or []
+    key = __get_manifest_key(extra_extension_paths)
+    path = os.path.join(appdirs.user_cache_dir("hotdoc", "hotdoc"),
+                        'extensions-manifest.json')
+
+    try:
+        with open(path, 'r') as _:
+            manifest = json.load(_)
+        if manifest['key'] == key:
+            return [ExtensionInfo(*info) for info in manifest['extensions']]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    infos = [ExtensionInfo(klass.extension_name, klass.__module__,
+                           klass.__qualname__)
+             for klass in get_extension_classes(
+                 sort=False, extra_extension_paths=extra_extension_paths)]
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as _:
+            json.dump({'key': key, 'extensions': infos}, _)
+    except OSError:
+        pass
+
+    return infos
+
+
+def get_sanitized_project_name(project_name, project_version):
+    """
+    Returns the name used for the private folder and the output of
+    a project
+    """
+    return '%s-%s' % (re.sub(r'\W+', '-', project_name), project_version)
+
 # Recipe from http://code.activestate.com/recipes/576694/
 
 
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015,2016 Mathieu Duponchelle <mathieu.duponchelle@opencreed.com>
+# Copyright © 2015,2016 Collabora Ltd
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Utilities to watch a set of files for modifications, used by the
+`watch` and `serve` commands.
+"""
+
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+
+class PollingWatcher:
+    """
+    Watches files by polling their mtime and size every @interval seconds.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.__stamps = {}
+
+    @staticmethod
+    def __stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def set_paths(self, paths):
+        """
+        Replace the set of watched paths with @paths
+        """
+        self.__stamps = {path: self.__stat(path) for path in paths}
+
+    def wait(self, timeout=None):
+        """
+        Blocks until one of the watched paths is modified, created or
+        removed, or @timeout seconds have passed.
+
+        Returns:
+            list: the paths that changed, empty on timeout
+        """
+        start = time.monotonic()
+        while True:
+            changed = []
+            for path, stamp in self.__stamps.items():
+                new_stamp = self.__stat(path)
+                if new_stamp != stamp:
+                    self.__stamps[path] = new_stamp
+                    changed.append(path)
+
+            if changed:
+                return changed
+
+            if timeout is not None and time.monotonic() - start >= timeout:
+                return []
+
+            time.sleep(self.interval)
+
+    def close(self):
+        """
+        Banana banana
+        """
+        pass
+
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+INOTIFY_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                IN_CREATE | IN_DELETE)
+
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """
+    Watches files with inotify, Linux only.
+
+    The parent directories of the watched paths are watched, so that
+    files replaced by editors through a rename are still noticed.
+
+    Raises:
+        OSError: if inotify is not available
+    """
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError('libc not found')
+
+        self.__libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.__libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+
+        self.__fd = self.__libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.__paths = set()
+        self.__watches = {}
+
+    def set_paths(self, paths):
+        """
+        Replace the set of watched paths with @paths
+        """
+        self.__paths = {os.path.abspath(path) for path in paths}
+        dirs = {os.path.dirname(path) for path in self.__paths}
+
+        for wd, dirname in list(self.__watches.items()):
+            if dirname not in dirs:
+                self.__libc.inotify_rm_watch(self.__fd, wd)
+                del self.__watches[wd]
+
+        watched_dirs = set(self.__watches.values())
+        for dirname in dirs - watched_dirs:
+            wd = self.__libc.inotify_add_watch(
+                self.__fd, os.fsencode(dirname), INOTIFY_MASK)
+            if wd >= 0:
+                self.__watches[wd] = dirname
+
+    def __read_events(self):
+        changed = []
+        try:
+            data = os.read(self.__fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            dirname = self.__watches.get(wd)
+            if dirname is None or not name:
+                continue
+
+            path = os.path.join(dirname, os.fsdecode(name))
+            if path in self.__paths and path not in changed:
+                changed.append(path)
+
+        return changed
+
+    def wait(self, timeout=None):
+        """
+        Blocks until one of the watched paths is modified, created or
+        removed, or @timeout seconds have passed.
+
+        Returns:
+            list: the paths that changed, empty on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0, deadline - time.monotonic())
+
+            readable, _, _ = select.select([self.__fd], [], [], remaining)
+            if readable:
+                changed = self.__read_events()
+                if changed:
+                    return changed
+            elif deadline is not None:
+                return []
+
+    def close(self):
+        """
+        Banana banana
+        """
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
+
+
+def get_modified_since(paths, since):
+    """
+    Returns the paths in @paths modified after the @since timestamp,
+    as returned by `time.time`.
+    """
+    modified = []
+    for path in paths:
+        try:
+            if os.stat(path).st_mtime >= since:
+                modified.append(path)
+        except OSError:
+            pass
+    return modified
+
+
+def create_watcher(interval=0.5):
+    """
+    Returns an `InotifyWatcher` where available, a `PollingWatcher`
+    polling every @interval seconds otherwise.
+    """
+    try:
+        return InotifyWatcher()
+    except OSError:
+        return PollingWatcher(interval)
@@ -423,7 +423,7 @@ if __name__ == '__main__':
             'hotdoc.extensions': ('get_extension_classes = '
                                   'hotdoc.extensions:get_extension_classes'),
             'console_scripts': [
-                'hotdoc=hotdoc.run_hotdoc:main',
+                'hotdoc=hotdoc.cli:main',
                 'hotdoc_dep_printer=hotdoc.hotdoc_dep_printer:main']},
         classifiers=[
             "Programming Language :: Python :: 3",